@@ -1,61 +1,115 @@
+import base64
+import heapq
+import json
+import tempfile
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, desc
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, get_current_subject
-from app.core.ledger import compute_entry_hash
+from app.api.deps import get_db_session, get_read_db_session, get_current_subject
+from app.core.archive import archive
+from app.core.config import settings
+from app.core.events import action_event, event_hub
+from app.core.graph import link_graph, walk_sql
+from app.core.projection import action_rows_response, encode_action_lines, project_action_row, select_action_rows
+from app.core.ingest import IngestFormatError, iter_rows
+from app.core.ledger import to_naive_utc
+from app.core.rollups import apply_rollup_deltas, rollup_key
+from app.core.search import decode_cursor as decode_search_cursor, encode_cursor as encode_search_cursor, mark_voided, search_action_ids
+from app.core.sequencer import SequencerBusy, sequencer
+from app.core.snapshots import invalidate_snapshots, snapshot_target, state_as_of
+from app.db.session import ReadSessionLocal
 from app.models.action import Action, ActionLink
+from app.models.ledger import ArchivedVoid
 from app.models.user import User
-from app.schemas.action import ActionCreate, ActionRead, ActionLinkCreate
+from app.schemas.action import ActionCreate, ActionRead, ActionLinkCreate, LineageRead, TargetStateRead
 
 router = APIRouter(prefix="/actions", tags=["actions"])
 
 
-async def _get_prev_hash(db: AsyncSession) -> Optional[str]:
-	result = await db.execute(select(Action.entry_hash).order_by(desc(Action.id)).limit(1))
-	return result.scalar_one_or_none()
+@router.post("/", response_model=ActionRead)
+async def create_action(payload: ActionCreate, idempotency_key: Optional[str] = Header(default=None), subject: str = Depends(get_current_subject)):
+	# Retries with the same Idempotency-Key (or the same offline capture) get the original action back.
+	values = payload.model_dump()
+	values["created_by_user_id"] = int(subject)
+	values["idempotency_key"] = values["idempotency_key"] or idempotency_key
+	try:
+		return await sequencer.append(values)
+	except SequencerBusy:
+		raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Ledger is busy, retry shortly", headers={"Retry-After": "1"})
 
 
-@router.post("/", response_model=ActionRead)
-async def create_action(payload: ActionCreate, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+@router.post("/ingest")
+async def ingest_actions(request: Request, subject: str = Depends(get_current_subject)):
+	# Accepts a JSON array or NDJSON body and answers with one NDJSON result per
+	# row, in input order. Results are spooled so the upload is consumed before
+	# the response starts.
 	user_id = int(subject)
-	prev_hash = await _get_prev_hash(db)
-	payload_dict = payload.model_dump()
-	payload_dict.update({
-		"created_by_user_id": user_id,
-		"created_at": datetime.utcnow().isoformat(),
-	})
-	entry_hash = compute_entry_hash(payload_dict, prev_hash)
-	action = Action(
-		action_type=payload.action_type,
-		reference_key=payload.reference_key,
-		target_type=payload.target_type,
-		target_id=payload.target_id,
-		target_label=payload.target_label,
-		context_tags=payload.context_tags,
-		pre_state=payload.pre_state,
-		post_state=payload.post_state,
-		local_timestamp=payload.local_timestamp,
-		department_id=payload.department_id,
-		is_offline_capture=payload.is_offline_capture,
-		device_id=payload.device_id,
-		created_by_user_id=user_id,
-		prev_hash=prev_hash,
-		entry_hash=entry_hash,
-	)
-	db.add(action)
-	await db.commit()
-	await db.refresh(action)
-	return action
+	results = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+	chunk: list[tuple[int, dict]] = []
+	# Rows rejected since the last flush, emitted with the chunk they fell in.
+	rejected: list[tuple[int, dict]] = []
+
+	def emit(result: dict) -> None:
+		results.write(json.dumps(result).encode("utf-8") + b"\n")
+
+	async def flush() -> None:
+		appended = await sequencer.append_many([values for _, values in chunk], return_exceptions=True) if chunk else []
+		done = list(rejected)
+		for (index, _), action in zip(chunk, appended):
+			if isinstance(action, SequencerBusy):
+				done.append((index, {"index": index, "error": "Ledger is busy, retry shortly", "retry": True}))
+			elif isinstance(action, BaseException):
+				done.append((index, {"index": index, "error": str(action)}))
+			else:
+				done.append((index, {"index": index, "id": action.id, "sequence": action.sequence, "entry_hash": action.entry_hash}))
+		for _, result in sorted(done, key=lambda item: item[0]):
+			emit(result)
+		chunk.clear()
+		rejected.clear()
+
+	try:
+		async for index, row in iter_rows(request.stream(), settings.ingest_max_row_bytes):
+			if isinstance(row, ValueError):
+				rejected.append((index, {"index": index, "error": f"Invalid JSON: {row}"}))
+				continue
+			try:
+				values = ActionCreate.model_validate(row).model_dump()
+			except ValidationError as exc:
+				rejected.append((index, {"index": index, "error": exc.errors(include_url=False, include_context=False, include_input=False)}))
+				continue
+			values["created_by_user_id"] = user_id
+			chunk.append((index, values))
+			if len(chunk) >= settings.ingest_chunk_size:
+				await flush()
+		await flush()
+	except IngestFormatError as exc:
+		await flush()
+		emit({"error": str(exc)})
+	results.seek(0)
+
+	def stream_results():
+		with results:
+			yield from results
+
+	return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
 @router.post("/link", status_code=201)
 async def link_actions(link: ActionLinkCreate, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
 	if link.source_action_id == link.target_action_id:
 		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot link an action to itself")
+	# Links carry no foreign keys, since either end may be archived.
+	ids = {link.source_action_id, link.target_action_id}
+	missing = ids - set((await db.execute(select(Action.id).where(Action.id.in_(ids)))).scalars())
+	if missing and len(await archive.rows_by_id(db, missing)) < len(missing):
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
 	link_row = ActionLink(
 		source_action_id=link.source_action_id,
 		target_action_id=link.target_action_id,
@@ -63,27 +117,249 @@ async def link_actions(link: ActionLinkCreate, db: AsyncSession = Depends(get_db
 	)
 	db.add(link_row)
 	await db.commit()
+	await link_graph.refresh(db)
 	return {"status": "linked"}
 
 
+async def _walk_links(action_id: int, upstream: bool, depth: int, link_type: Optional[list[str]], expand: bool, db: AsyncSession) -> LineageRead:
+	depth = min(depth, settings.lineage_max_depth)
+	link_types = set(link_type) if link_type else None
+	if link_graph.warm:
+		await link_graph.refresh(db)
+		walk = link_graph.walk(action_id, upstream, depth, link_types)
+	else:
+		walk = await walk_sql(db, action_id, upstream, depth, link_types)
+	lineage = LineageRead(**walk)
+	if expand:
+		ids = [action_id] + [node.action_id for node in lineage.nodes]
+		result = await db.execute(select(Action).where(Action.id.in_(ids)).order_by(Action.sequence))
+		actions = [ActionRead.model_validate(action) for action in result.scalars()]
+		missing = set(ids) - {action.id for action in actions}
+		if missing:
+			actions.extend(ActionRead.model_validate(row) for row in (await archive.rows_by_id(db, missing)).values())
+			actions.sort(key=lambda action: action.sequence)
+		lineage.actions = actions
+	return lineage
+
+
+@router.get("/{action_id}/lineage", response_model=LineageRead)
+async def get_lineage(action_id: int, depth: int = Query(default=5, ge=1), link_type: Optional[list[str]] = Query(default=None), expand: bool = False, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	return await _walk_links(action_id, True, depth, link_type, expand, db)
+
+
+@router.get("/{action_id}/impact", response_model=LineageRead)
+async def get_impact(action_id: int, depth: int = Query(default=5, ge=1), link_type: Optional[list[str]] = Query(default=None), expand: bool = False, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	return await _walk_links(action_id, False, depth, link_type, expand, db)
+
+
+def _already_voided() -> HTTPException:
+	return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Action already voided")
+
+
 @router.post("/{action_id}/void", response_model=ActionRead)
-async def void_action(action_id: int, reason: str, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
-	result = await db.execute(select(Action).where(Action.id == action_id))
-	action = result.scalar_one_or_none()
-	if action is None:
-		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
-	if action.voided:
-		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Action already voided")
-	action.voided = True
-	action.void_reason = reason
-	action.voided_by_user_id = int(subject)
-	action.voided_at = datetime.utcnow()
+async def void_action(action_id: int, reason: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	# The void is claimed by a conditional update (or the archived_voids primary
+	# key) before any rollup delta, so concurrent voids apply them only once.
+	voided_by_user_id, voided_at = int(subject), datetime.utcnow()
+	result = await db.execute(
+		update(Action)
+		.where(Action.id == action_id, Action.voided.is_(False))
+		.values(voided=True, void_reason=reason, voided_by_user_id=voided_by_user_id, voided_at=voided_at)
+	)
+	archived = result.rowcount != 1
+	if not archived:
+		action = (await db.execute(select(Action).where(Action.id == action_id))).scalar_one()
+	else:
+		if (await db.execute(select(Action.id).where(Action.id == action_id))).scalar_one_or_none() is not None:
+			raise _already_voided()
+		# Archived rows are immutable; their void is recorded alongside.
+		row = (await archive.rows_by_id(db, [action_id])).get(action_id)
+		if row is None:
+			raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+		action = ActionRead.model_validate(row)
+		if action.voided:
+			raise _already_voided()
+		action.voided, action.void_reason, action.voided_by_user_id, action.voided_at = True, reason, voided_by_user_id, voided_at
+		db.add(ArchivedVoid(action_id=action.id, void_reason=reason, voided_by_user_id=voided_by_user_id, voided_at=voided_at))
+		try:
+			await db.flush()
+		except IntegrityError:
+			await db.rollback()
+			raise _already_voided()
+	await apply_rollup_deltas(db, {
+		rollup_key(action.created_at, action.department_id, action.action_type, False): -1,
+		rollup_key(action.created_at, action.department_id, action.action_type, True): 1,
+	})
+	await mark_voided(db, action.id)
+	invalidated = await invalidate_snapshots(db, action.target_type, action.target_id, action.sequence)
 	await db.commit()
-	await db.refresh(action)
-	return action
+	if invalidated:
+		background_tasks.add_task(snapshot_target, action.target_type, action.target_id)
+	if archived:
+		voided = action
+	else:
+		await db.refresh(action)
+		voided = ActionRead.model_validate(action)
+	event = action_event(voided, "void")
+	if event is not None:
+		event_hub.publish([event])
+	return voided
+
+
+@router.get("/search", response_model=list[ActionRead])
+async def search_actions(
+	q: str,
+	cursor: Optional[str] = None,
+	limit: Optional[int] = Query(default=None, ge=1),
+	include_voided: bool = False,
+	db: AsyncSession = Depends(get_read_db_session),
+	subject: str = Depends(get_current_subject),
+):
+	limit = min(limit or settings.timeline_default_limit, settings.timeline_max_limit)
+	if cursor is not None:
+		try:
+			decode_search_cursor(cursor)
+		except ValueError:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+	hits = await search_action_ids(db, q, limit + 1, cursor, include_voided)
+	headers = {}
+	if len(hits) > limit:
+		hits = hits[:limit]
+		last_id, last_rank = hits[-1]
+		headers["X-Next-Cursor"] = encode_search_cursor(last_rank, last_id)
+	if not hits:
+		return []
+	result = await db.execute(select_action_rows().where(Action.id.in_([action_id for action_id, _ in hits])))
+	rows = {row.id: row for row in result}
+	missing = [action_id for action_id, _ in hits if action_id not in rows]
+	if missing:
+		rows.update((action_id, project_action_row(row)) for action_id, row in (await archive.rows_by_id(db, missing)).items())
+	return action_rows_response((rows[action_id] for action_id, _ in hits if action_id in rows), headers=headers)
+
+
+def _encode_cursor(action) -> str:
+	raw = f"{action.created_at.isoformat()}|{action.sequence}"
+	return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+	try:
+		created_at, sequence = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+		return datetime.fromisoformat(created_at), int(sequence)
+	except ValueError:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.get("/state/{target_type}/{target_id:path}", response_model=TargetStateRead)
+async def get_target_state(
+	target_type: str,
+	target_id: str,
+	at: Optional[datetime] = None,
+	sequence: Optional[int] = Query(default=None, ge=1),
+	db: AsyncSession = Depends(get_read_db_session),
+	subject: str = Depends(get_current_subject),
+):
+	# State of the target as of at (inclusive) and/or sequence, folding its
+	# non-voided actions' pre/post state from the nearest snapshot on.
+	return await state_as_of(db, target_type, target_id, to_naive_utc(at), sequence)
 
 
 @router.get("/timeline/{reference_key}", response_model=list[ActionRead])
-async def get_timeline(reference_key: str, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
-	result = await db.execute(select(Action).where(Action.reference_key == reference_key).order_by(Action.created_at.asc()))
-	return list(result.scalars().all())
\ No newline at end of file
+async def get_timeline(
+	reference_key: str,
+	cursor: Optional[str] = None,
+	limit: Optional[int] = Query(default=None, ge=1),
+	voided: Optional[bool] = None,
+	action_type: Optional[str] = None,
+	since: Optional[datetime] = None,
+	until: Optional[datetime] = None,
+	stream: bool = False,
+	db: AsyncSession = Depends(get_read_db_session),
+	subject: str = Depends(get_current_subject),
+):
+	since, until = to_naive_utc(since), to_naive_utc(until)
+	after = _decode_cursor(cursor) if cursor is not None else None
+	stmt = select_action_rows().where(Action.reference_key == reference_key)
+	if voided is not None:
+		stmt = stmt.where(Action.voided == voided)
+	if action_type is not None:
+		stmt = stmt.where(Action.action_type == action_type)
+	if since is not None:
+		stmt = stmt.where(Action.created_at >= since)
+	if until is not None:
+		stmt = stmt.where(Action.created_at < until)
+	if after is not None:
+		stmt = stmt.where(tuple_(Action.created_at, Action.sequence) > tuple_(*after))
+	stmt = stmt.order_by(Action.created_at.asc(), Action.sequence.asc())
+	archived_query = (reference_key, voided, action_type, since, until, after)
+
+	if stream:
+		if limit is not None:
+			stmt = stmt.limit(limit)
+		return StreamingResponse(_stream_timeline(stmt, archived_query, limit), media_type="application/x-ndjson")
+
+	limit = min(limit or settings.timeline_default_limit, settings.timeline_max_limit)
+	archived = await _archived_timeline(db, *archived_query)
+	result = await db.execute(stmt.limit(limit + 1))
+	rows = result.all()
+	if archived:
+		rows = list(heapq.merge(archived[:limit + 1], rows, key=_timeline_key))[:limit + 1]
+	headers = {}
+	if len(rows) > limit:
+		rows = rows[:limit]
+		headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+	return action_rows_response(rows, headers=headers)
+
+
+def _timeline_key(row) -> tuple:
+	return row.created_at, row.sequence
+
+
+async def _archived_timeline(db: AsyncSession, reference_key: str, voided: Optional[bool], action_type: Optional[str], since: Optional[datetime], until: Optional[datetime], after: Optional[tuple]) -> list:
+	# Timeline rows that were moved to archive segments, filtered and ordered
+	# like the hot query so the two can be merged.
+	created_from = since
+	if after is not None and (created_from is None or after[0] > created_from):
+		created_from = after[0]
+	rows = await archive.reference_rows(db, [reference_key], created_from=created_from, created_before=until)
+	archived = [
+		project_action_row(row) for row in rows
+		if (voided is None or row["voided"] == voided)
+		and (action_type is None or row["action_type"] == action_type)
+		and (since is None or row["created_at"] >= since)
+		and (until is None or row["created_at"] < until)
+		and (after is None or (row["created_at"], row["sequence"]) > after)
+	]
+	archived.sort(key=_timeline_key)
+	return archived
+
+
+async def _stream_timeline(stmt, archived_query: tuple, limit: Optional[int]):
+	# Uses its own session so rows keep flowing from the server-side cursor
+	# after the request handler has returned; the archive lookup shares its
+	# snapshot so rows being cut over to a segment are seen exactly once.
+	async with ReadSessionLocal() as db:
+		archived = await _archived_timeline(db, *archived_query)
+		remaining = limit
+		position = 0
+		result = await db.stream(stmt.execution_options(yield_per=500))
+		async for partition in result.partitions():
+			if archived:
+				merged = []
+				for row in partition:
+					key = _timeline_key(row)
+					while position < len(archived) and _timeline_key(archived[position]) < key:
+						merged.append(archived[position])
+						position += 1
+					merged.append(row)
+				partition = merged
+			if remaining is not None:
+				partition = partition[:remaining]
+				remaining -= len(partition)
+			if partition:
+				yield encode_action_lines(partition)
+			if remaining == 0:
+				return
+		tail = archived[position:] if remaining is None else archived[position:position + remaining]
+		if tail:
+			yield encode_action_lines(tail)
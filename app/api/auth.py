@@ -1,41 +1,78 @@
+from typing import Annotated
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.config import settings
+from app.core.security import PasswordHasherBusy, create_access_token, password_hasher, revocation_list
+from app.db.session import session_scope
 from app.models.user import User
 from app.schemas.user import UserCreate, UserRead, Token
-from app.api.deps import get_db_session
+from app.api.deps import decode_token, oauth2_scheme
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _busy() -> HTTPException:
+	return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Authentication is busy, retry shortly", headers={"Retry-After": "1"})
+
+
+def _email_taken() -> HTTPException:
+	return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+
+
+# Both handlers hash outside any session: bcrypt runs for tens of milliseconds,
+# and holding a pooled connection across it lets a login burst starve the pool.
 @router.post("/register", response_model=UserRead)
-async def register_user(payload: UserCreate, db: AsyncSession = Depends(get_db_session)):
-	existing = await db.execute(select(User).where(User.email == payload.email))
-	if existing.scalar_one_or_none() is not None:
-		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+async def register_user(payload: UserCreate):
+	async with session_scope() as db:
+		existing = await db.execute(select(User.id).where(User.email == payload.email))
+		if existing.scalar_one_or_none() is not None:
+			raise _email_taken()
+	try:
+		hashed_password = await password_hasher.hash(payload.password)
+	except PasswordHasherBusy:
+		raise _busy()
 	user = User(
 		email=payload.email,
 		full_name=payload.full_name,
-		hashed_password=hash_password(payload.password),
+		hashed_password=hashed_password,
 		is_active=True,
 		is_superuser=False,
 		department_id=payload.department_id,
 		role_id=payload.role_id,
 	)
-	db.add(user)
-	await db.commit()
-	await db.refresh(user)
+	async with session_scope() as db:
+		db.add(user)
+		try:
+			await db.commit()
+		except IntegrityError:
+			raise _email_taken()
+		await db.refresh(user)
 	return user
 
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db_session)):
-	result = await db.execute(select(User).where(User.email == form_data.username))
-	user = result.scalar_one_or_none()
-	if user is None or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+	async with session_scope() as db:
+		result = await db.execute(select(User.id, User.hashed_password).where(User.email == form_data.username))
+		user = result.first()
+	try:
+		valid = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+	except PasswordHasherBusy:
+		raise _busy()
+	if not valid:
 		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
 	token = create_access_token(subject=str(user.id))
-	return Token(access_token=token)
\ No newline at end of file
+	return Token(access_token=token)
+
+
+@router.post("/logout", status_code=204)
+async def logout(token: Annotated[str, Depends(oauth2_scheme)]):
+	if not settings.token_revocation_enabled:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Token revocation is disabled")
+	payload = decode_token(token)
+	if payload.get("jti") is not None:
+		await revocation_list.revoke(payload["jti"], payload["exp"])
\ No newline at end of file
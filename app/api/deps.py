@@ -1,27 +1,62 @@
-from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from typing import Annotated, AsyncIterator
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_session
+from app.core.security import ALGORITHM, revocation_list, token_cache
+from app.db.session import read_session_scope, session_scope
+from app.models.user import User
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
-async def get_db_session() -> AsyncSession:
-	async for session in get_session():
-		return session
+async def get_db_session() -> AsyncIterator[AsyncSession]:
+	async with session_scope() as session:
+		yield session
 
 
-async def get_current_subject(token: Annotated[str, Depends(oauth2_scheme)]) -> str:
+async def get_read_db_session() -> AsyncIterator[AsyncSession]:
+	async with read_session_scope() as session:
+		yield session
+
+
+def decode_token(token: str) -> dict:
 	try:
-		payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-		subject: str = payload.get("sub")
-		if subject is None:
-			raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-		return subject
+		payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
 	except JWTError:
-		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
\ No newline at end of file
+		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+	if payload.get("sub") is None:
+		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+	return payload
+
+
+def _revoked() -> HTTPException:
+	return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+
+async def get_current_subject(request: Request, token: Annotated[str, Depends(oauth2_scheme)]) -> str:
+	cached = token_cache.get(token)
+	if cached is None:
+		payload = decode_token(token)
+		cached = payload["sub"], payload.get("jti")
+		if settings.token_revocation_enabled and await revocation_list.check(cached[1], payload["exp"]):
+			raise _revoked()
+		token_cache.put(token, cached[0], cached[1], payload.get("exp"))
+	subject, jti = cached
+	if settings.token_revocation_enabled and revocation_list.is_revoked(jti):
+		raise _revoked()
+	# Read back by AccessLogMiddleware once the response starts.
+	request.state.subject = subject
+	return subject
+
+
+async def get_current_superuser(subject: Annotated[str, Depends(get_current_subject)]) -> str:
+	async with read_session_scope() as session:
+		is_superuser = (await session.execute(select(User.is_superuser).where(User.id == int(subject), User.is_active.is_(True)))).scalar_one_or_none()
+	if not is_superuser:
+		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges")
+	return subject
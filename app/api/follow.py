@@ -0,0 +1,120 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db_session, get_read_db_session, get_current_subject
+from app.core.archive import archive
+from app.core.config import settings
+from app.core.events import RESYNC, action_event, event_hub
+from app.db.session import ReadSessionLocal
+from app.models.action import Action, FollowSubscription
+from app.schemas.action import ActionRead, FollowRead
+
+router = APIRouter(prefix="/follow", tags=["follow"])
+
+
+@router.post("/{reference_key}", response_model=FollowRead)
+async def follow_reference(reference_key: str, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(FollowSubscription).where(FollowSubscription.user_id == int(subject), FollowSubscription.reference_key == reference_key))
+	follow = result.scalar_one_or_none()
+	if follow is None:
+		follow = FollowSubscription(user_id=int(subject), reference_key=reference_key)
+		db.add(follow)
+		await db.commit()
+		await db.refresh(follow)
+	return follow
+
+
+@router.delete("/{reference_key}", status_code=204)
+async def unfollow_reference(reference_key: str, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	await db.execute(delete(FollowSubscription).where(FollowSubscription.user_id == int(subject), FollowSubscription.reference_key == reference_key))
+	await db.commit()
+
+
+@router.get("/", response_model=list[FollowRead])
+async def list_follows(db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(FollowSubscription).where(FollowSubscription.user_id == int(subject)).order_by(FollowSubscription.id))
+	return list(result.scalars().all())
+
+
+@router.get("/events")
+async def followed_events(last_sequence: Optional[int] = None, last_event_id: Optional[str] = Header(default=None), db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(FollowSubscription.reference_key).where(FollowSubscription.user_id == int(subject)))
+	keys = set(result.scalars())
+	if not keys:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not following any references")
+	return _event_stream(keys, _resume_from(last_sequence, last_event_id))
+
+
+@router.get("/{reference_key}/events")
+async def reference_events(reference_key: str, last_sequence: Optional[int] = None, last_event_id: Optional[str] = Header(default=None), subject: str = Depends(get_current_subject)):
+	return _event_stream({reference_key}, _resume_from(last_sequence, last_event_id))
+
+
+def _resume_from(last_sequence: Optional[int], last_event_id: Optional[str]) -> Optional[int]:
+	if last_sequence is not None:
+		return last_sequence
+	if last_event_id:
+		try:
+			return int(last_event_id)
+		except ValueError:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+	return None
+
+
+def _event_stream(keys: set[str], resume_from: Optional[int]) -> StreamingResponse:
+	return StreamingResponse(
+		_sse(keys, resume_from),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
+
+
+async def _sse(keys: set[str], resume_from: Optional[int]):
+	# Subscribe before replaying so nothing committed in between is missed;
+	# live events already covered by the replay are skipped by sequence.
+	subscription = event_hub.subscribe(keys)
+	try:
+		replayed_through = resume_from or 0
+		if resume_from is not None:
+			async with ReadSessionLocal() as db:
+				# Archive segments hold a sequence prefix, so they replay first.
+				archived = (await archive.reference_rows(db, keys, after_sequence=resume_from))[:settings.events_replay_limit]
+				for row in archived:
+					event = action_event(ActionRead.model_validate(row))
+					replayed_through = event.sequence
+					yield event.sse()
+				stmt = (
+					select(Action)
+					.where(Action.reference_key.in_(keys), Action.sequence > resume_from)
+					.order_by(Action.sequence)
+					.limit(settings.events_replay_limit - len(archived))
+					.execution_options(yield_per=500)
+				)
+				replayed = len(archived)
+				async for action in await db.stream_scalars(stmt):
+					event = action_event(ActionRead.model_validate(action))
+					replayed_through = event.sequence
+					replayed += 1
+					yield event.sse()
+			if replayed >= settings.events_replay_limit:
+				yield RESYNC.sse()
+				return
+		yield b": connected\n\n"
+		while True:
+			try:
+				event = await asyncio.wait_for(subscription.queue.get(), settings.events_keepalive_seconds)
+			except asyncio.TimeoutError:
+				yield b": keepalive\n\n"
+				continue
+			if event.type == "action" and event.sequence <= replayed_through:
+				continue
+			yield event.sse()
+			if event is RESYNC:
+				return
+	finally:
+		event_hub.unsubscribe(subscription)
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_read_db_session, get_current_subject, get_current_superuser
+from app.core.export import EXPORT_MEDIA_TYPES, export_stream
+from app.core.merkle import inclusion_proof
+from app.core.verify import verify_chain, verify_reports
+
+router = APIRouter(prefix="/ledger", tags=["ledger"])
+
+
+@router.get("/verify")
+async def verify_ledger(subject: str = Depends(get_current_subject)):
+	# Read-only: rehashes the rows after the latest checkpoint without moving
+	# it, at most once per VERIFY_REPORT_CACHE_SECONDS across all callers.
+	return await verify_reports.report()
+
+
+@router.post("/verify")
+async def record_verification(full: bool = False, subject: str = Depends(get_current_superuser)):
+	# Stores a checkpoint for each verified partition; full re-verifies from genesis.
+	return await verify_chain(full=full)
+
+
+@router.get("/proof/{action_id}")
+async def get_inclusion_proof(action_id: int, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	proof = await inclusion_proof(db, action_id)
+	if proof is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+	return proof
+
+
+@router.get("/export")
+async def export_ledger(
+	format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+	after_sequence: int = Query(default=0, ge=0),
+	last_sequence: Optional[int] = Query(default=None, ge=1),
+	since: Optional[datetime] = None,
+	until: Optional[datetime] = None,
+	accept_encoding: Optional[str] = Header(default=None),
+	subject: str = Depends(get_current_subject),
+):
+	# Chunked stream in sequence order; resume an interrupted export with
+	# after_sequence set to the last sequence received.
+	compress = accept_encoding is not None and "gzip" in accept_encoding.lower()
+	headers = {"Content-Disposition": f'attachment; filename="actions-{after_sequence + 1}.{format}"', "Vary": "Accept-Encoding"}
+	if compress:
+		headers["Content-Encoding"] = "gzip"
+	return StreamingResponse(
+		export_stream(format, compress, after_sequence=after_sequence, last_sequence=last_sequence, since=since, until=until),
+		media_type=EXPORT_MEDIA_TYPES[format],
+		headers=headers,
+	)
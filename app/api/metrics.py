@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.access_log import access_log_writer
+from app.core.events import event_hub
+from app.core.metrics import Counter, Gauge, registry
+from app.core.sequencer import sequencer
+from app.db.session import pool_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+def _pool(field: str):
+	return lambda: {(pool["engine"],): pool[field] for pool in pool_metrics()}
+
+
+Gauge("ual_db_pool_checked_out", "Connections currently checked out of the pool", ("engine",), callback=_pool("checked_out"))
+Counter("ual_db_pool_checkouts_total", "Connection checkouts", ("engine",), callback=_pool("checkouts"))
+Counter("ual_db_pool_connects_total", "New DBAPI connections opened", ("engine",), callback=_pool("connects"))
+Counter("ual_db_pool_wait_seconds_total", "Time request sessions spent waiting for a connection", ("engine",), callback=_pool("wait_seconds_total"))
+Gauge("ual_ledger_chain_head_sequence", "partition_sequence of each loaded chain partition's head", ("partition",), callback=lambda: {(str(partition),): head for partition, head in sequencer.heads().items()})
+Gauge("ual_ledger_pending_appends", "Appends queued behind the chain head", callback=lambda: {(): sequencer.pending})
+Gauge("ual_events_subscribers", "Open follow event streams", callback=lambda: {(): event_hub.subscriber_count})
+Counter("ual_events_delivered_total", "Follow events queued to subscribers", callback=lambda: {(): event_hub.delivered})
+Counter("ual_events_dropped_subscribers_total", "Follow streams closed for falling behind", callback=lambda: {(): event_hub.dropped_subscribers})
+Gauge("ual_access_log_queue_depth", "Access log entries waiting to be written", callback=lambda: {(): access_log_writer.depth})
+Counter("ual_access_log_written_total", "Access log entries written", callback=lambda: {(): access_log_writer.written})
+Counter("ual_access_log_dropped_total", "Access log entries dropped because the queue was full", callback=lambda: {(): access_log_writer.dropped})
+Counter("ual_access_log_failed_total", "Access log entries lost to failed batch inserts", callback=lambda: {(): access_log_writer.failed})
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+	return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from app.core.access_log import access_log_writer
+from app.core.config import settings
+from app.core.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+from app.core.profiler import requested_profiler
+
+logger = logging.getLogger(__name__)
+
+
+# Plain ASGI middleware: records per-route latency, status counts and
+# in-flight requests. The route template comes from the scope FastAPI fills
+# in during routing, so path parameters do not multiply label sets.
+class MetricsMiddleware:
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		method = scope["method"]
+		profiler = requested_profiler(scope["headers"]) if settings.profiling_enabled else None
+		status_code = 500
+
+		async def send_wrapper(message):
+			nonlocal status_code
+			if message["type"] == "http.response.start":
+				status_code = message["status"]
+				if profiler is not None:
+					message["headers"] = [*message.get("headers", []), (b"x-profile-id", profiler.id.encode("ascii"))]
+			await send(message)
+
+		in_flight = (method,)
+		HTTP_IN_FLIGHT.inc(labels=in_flight)
+		if profiler is not None:
+			profiler.start()
+		started = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			elapsed = time.perf_counter() - started
+			HTTP_IN_FLIGHT.dec(labels=in_flight)
+			route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+			HTTP_REQUESTS.inc(labels=(method, route, str(status_code)))
+			HTTP_LATENCY.observe(elapsed, (method, route))
+			if profiler is not None:
+				profiler.stop()
+				try:
+					path = await asyncio.to_thread(profiler.write, f"{method} {route} {status_code} {elapsed * 1000:.1f}ms")
+					logger.info("Wrote request profile %s", path)
+				except OSError:
+					logger.exception("Failed to write request profile")
+
+
+# Queues one AccessLog entry per authenticated request when the response
+# starts (so long-lived streams are logged up front); the subject is the one
+# get_current_subject left on the request state.
+class AccessLogMiddleware:
+	def __init__(self, app):
+		self.app = app
+		methods = {method.strip().upper() for method in settings.access_log_methods.split(",") if method.strip()}
+		self.methods = None if "*" in methods else methods
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http" or (self.methods is not None and scope["method"] not in self.methods):
+			await self.app(scope, receive, send)
+			return
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				subject = scope.get("state", {}).get("subject")
+				if subject is not None:
+					access_log_writer.record(_access_entry(scope, int(subject)))
+			await send(message)
+
+		await self.app(scope, receive, send_wrapper)
+
+
+def _access_entry(scope, user_id: int) -> dict:
+	target = scope["path"]
+	if scope.get("query_string"):
+		target += "?" + scope["query_string"].decode("latin-1")
+	user_agent = None
+	for name, value in scope["headers"]:
+		if name == b"user-agent":
+			user_agent = value.decode("latin-1")[:256]
+			break
+	client = scope.get("client")
+	return {
+		"user_id": user_id,
+		"action": scope["method"],
+		"target": target[:512],
+		"created_at": datetime.utcnow(),
+		"ip_address": client[0][:64] if client else None,
+		"user_agent": user_agent,
+	}
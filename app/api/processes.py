@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.api.deps import get_db_session, get_read_db_session, get_current_subject
+from app.core.process import OPEN_STATUSES, process_engine
+from app.models.blueprint import Blueprint, BlueprintStep, ProcessInstance, ProcessStepInstance
+from app.schemas.process import BlueprintCreate, BlueprintRead, ProcessStart, ProcessStatus, ProcessStepStatus
+
+router = APIRouter(prefix="/process", tags=["process"])
+
+
+@router.post("/blueprints", response_model=BlueprintRead)
+async def create_blueprint(payload: BlueprintCreate, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	blueprint = Blueprint(
+		name=payload.name,
+		description=payload.description,
+		owner_user_id=int(subject),
+		steps=[BlueprintStep(**step.model_dump()) for step in payload.steps],
+	)
+	db.add(blueprint)
+	await db.commit()
+	result = await db.execute(select(Blueprint).where(Blueprint.id == blueprint.id).options(selectinload(Blueprint.steps)))
+	return result.scalar_one()
+
+
+@router.get("/blueprints", response_model=list[BlueprintRead])
+async def list_blueprints(db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(Blueprint).options(selectinload(Blueprint.steps)).order_by(Blueprint.id))
+	return list(result.scalars().all())
+
+
+@router.post("/", response_model=ProcessStatus)
+async def start_process(payload: ProcessStart, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(Blueprint).where(Blueprint.id == payload.blueprint_id).options(selectinload(Blueprint.steps)))
+	blueprint = result.scalar_one_or_none()
+	if blueprint is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blueprint not found")
+	now = datetime.utcnow()
+	blueprint_steps = sorted(blueprint.steps, key=lambda step: step.order_index)
+	process = ProcessInstance(
+		blueprint_id=blueprint.id,
+		reference_key=payload.reference_key,
+		created_by_user_id=int(subject),
+		status="active" if blueprint_steps else "completed",
+	)
+	for index, step in enumerate(blueprint_steps):
+		due_at = now + timedelta(hours=step.sla_hours) if index == 0 and step.sla_hours else None
+		process.steps.append(ProcessStepInstance(blueprint_step_id=step.id, status="waiting" if index == 0 else "pending", due_at=due_at))
+	db.add(process)
+	await db.commit()
+	result = await db.execute(select(ProcessInstance).where(ProcessInstance.id == process.id).options(selectinload(ProcessInstance.steps)))
+	process = result.scalar_one()
+	if process.status == "active":
+		process_engine.track(process, {step.id: step for step in blueprint_steps})
+	return _process_status(blueprint, process)
+
+
+@router.get("/{blueprint_id}/status/{reference_key}", response_model=ProcessStatus)
+async def get_process_status(blueprint_id: int, reference_key: str, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(Blueprint).where(Blueprint.id == blueprint_id).options(selectinload(Blueprint.steps)))
+	blueprint = result.scalar_one_or_none()
+	if blueprint is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blueprint not found")
+	result = await db.execute(
+		select(ProcessInstance)
+		.where(ProcessInstance.blueprint_id == blueprint_id, ProcessInstance.reference_key == reference_key)
+		.order_by(desc(ProcessInstance.id))
+		.limit(1)
+		.options(selectinload(ProcessInstance.steps))
+	)
+	process = result.scalar_one_or_none()
+	if process is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Process not found")
+	return _process_status(blueprint, process)
+
+
+def _process_status(blueprint: Blueprint, process: ProcessInstance) -> ProcessStatus:
+	blueprint_steps = {step.id: step for step in blueprint.steps}
+	steps = sorted(
+		(
+			ProcessStepStatus(
+				id=step.id,
+				step_name=blueprint_steps[step.blueprint_step_id].step_name,
+				order_index=blueprint_steps[step.blueprint_step_id].order_index,
+				expected_action_type=blueprint_steps[step.blueprint_step_id].expected_action_type,
+				status=step.status,
+				due_at=step.due_at,
+				completed_action_id=step.completed_action_id,
+			)
+			for step in process.steps
+		),
+		key=lambda step: step.order_index,
+	)
+	current = next((step for step in steps if step.status in OPEN_STATUSES), None)
+	now = datetime.utcnow()
+	estimated_completion = None
+	if current is not None and current.due_at is not None:
+		sla_hours = {step.id: blueprint_steps[step.blueprint_step_id].sla_hours or 0 for step in process.steps}
+		remaining = sum(sla_hours[step.id] for step in steps if step.status == "pending")
+		estimated_completion = current.due_at + timedelta(hours=remaining)
+	return ProcessStatus(
+		process_id=process.id,
+		blueprint_id=blueprint.id,
+		blueprint_name=blueprint.name,
+		reference_key=process.reference_key,
+		status=process.status,
+		total_steps=len(steps),
+		completed_steps=sum(1 for step in steps if step.status == "completed"),
+		current_step=current.step_name if current else None,
+		is_overdue=current is not None and (current.status == "breached" or (current.due_at is not None and current.due_at < now)),
+		estimated_completion=estimated_completion,
+		steps=steps,
+	)
@@ -1,7 +1,12 @@
 from fastapi import APIRouter
 
-from app.api import auth, actions
+from app.api import auth, actions, follow, ledger, processes, rules, stats
 
 api_router = APIRouter()
 api_router.include_router(auth.router)
-api_router.include_router(actions.router)
\ No newline at end of file
+api_router.include_router(actions.router)
+api_router.include_router(ledger.router)
+api_router.include_router(rules.router)
+api_router.include_router(processes.router)
+api_router.include_router(stats.router)
+api_router.include_router(follow.router)
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db_session, get_read_db_session, get_current_subject
+from app.core.rules import rule_engine, run_escalations
+from app.models.rule import EscalationEvent, Rule
+from app.schemas.rule import EscalationEventRead, RuleCreate, RuleRead, RuleUpdate
+
+router = APIRouter(prefix="/rules", tags=["rules"])
+
+
+@router.post("/", response_model=RuleRead)
+async def create_rule(payload: RuleCreate, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	rule = Rule(**payload.model_dump())
+	db.add(rule)
+	await db.commit()
+	await db.refresh(rule)
+	await rule_engine.reload()
+	return rule
+
+
+@router.get("/", response_model=list[RuleRead])
+async def list_rules(active: Optional[bool] = None, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	stmt = select(Rule).order_by(Rule.id)
+	if active is not None:
+		stmt = stmt.where(Rule.active == active)
+	result = await db.execute(stmt)
+	return list(result.scalars().all())
+
+
+@router.patch("/{rule_id}", response_model=RuleRead)
+async def update_rule(rule_id: int, payload: RuleUpdate, db: AsyncSession = Depends(get_db_session), subject: str = Depends(get_current_subject)):
+	result = await db.execute(select(Rule).where(Rule.id == rule_id))
+	rule = result.scalar_one_or_none()
+	if rule is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+	for field, value in payload.model_dump(exclude_unset=True).items():
+		setattr(rule, field, value)
+	await db.commit()
+	await db.refresh(rule)
+	await rule_engine.reload()
+	return rule
+
+
+@router.post("/run")
+async def run_rules_now(subject: str = Depends(get_current_subject)):
+	return {"escalations": await run_escalations()}
+
+
+@router.get("/escalations", response_model=list[EscalationEventRead])
+async def list_escalations(reference_key: Optional[str] = None, limit: int = 100, db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	stmt = select(EscalationEvent).order_by(desc(EscalationEvent.id)).limit(min(limit, 1000))
+	if reference_key is not None:
+		stmt = stmt.where(EscalationEvent.reference_key == reference_key)
+	result = await db.execute(stmt)
+	return list(result.scalars().all())
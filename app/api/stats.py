@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_read_db_session, get_current_subject
+from app.db.session import pool_metrics
+from app.models.stats import ActionRollup
+from app.schemas.stats import DashboardStats, PoolStats
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("", response_model=DashboardStats)
+async def get_stats(db: AsyncSession = Depends(get_read_db_session), subject: str = Depends(get_current_subject)):
+	today = datetime.utcnow().date()
+	totals = await db.execute(select(ActionRollup.voided, func.sum(ActionRollup.count)).group_by(ActionRollup.voided))
+	totals_by_voided = {voided: total or 0 for voided, total in totals.tuples()}
+	rows = await db.execute(
+		select(ActionRollup.department_id, ActionRollup.action_type, ActionRollup.count)
+		.where(ActionRollup.day == today, ActionRollup.voided.is_(False))
+	)
+	department_breakdown: dict[str, int] = {}
+	action_type_breakdown: dict[str, int] = {}
+	for department_id, action_type, count in rows.tuples():
+		if not count:
+			continue
+		department_key = str(department_id) if department_id else "unassigned"
+		department_breakdown[department_key] = department_breakdown.get(department_key, 0) + count
+		action_type_breakdown[action_type] = action_type_breakdown.get(action_type, 0) + count
+	return DashboardStats(
+		total_actions=totals_by_voided.get(False, 0),
+		voided_actions=totals_by_voided.get(True, 0),
+		actions_today=sum(action_type_breakdown.values()),
+		department_breakdown=department_breakdown,
+		action_type_breakdown=action_type_breakdown,
+	)
+
+
+@router.get("/pool", response_model=list[PoolStats])
+async def get_pool_stats(subject: str = Depends(get_current_subject)):
+	return pool_metrics()
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.batching import drain_batches
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.user import AccessLog
+
+logger = logging.getLogger(__name__)
+
+
+# Access log entries are queued in memory and written in size/time bounded
+# batches by one background task, so requests never wait on the insert. When
+# the queue is full new entries are dropped and counted rather than applying
+# backpressure to requests.
+class AccessLogWriter:
+	def __init__(self, max_queue: int, batch_size: int, flush_ms: float):
+		self.max_queue = max_queue
+		self.batch_size = batch_size
+		self.flush_interval = flush_ms / 1000
+		self.queue: Optional[asyncio.Queue] = None
+		self.written = 0
+		self.dropped = 0
+		self.failed = 0
+		self._task: Optional[asyncio.Task] = None
+		self._stopping = False
+
+	@property
+	def depth(self) -> int:
+		return self.queue.qsize() if self.queue is not None else 0
+
+	async def start(self) -> None:
+		if self._task is not None:
+			return
+		self._stopping = False
+		self.queue = asyncio.Queue(self.max_queue)
+		self._task = asyncio.create_task(drain_batches(self.queue, self.batch_size, self.flush_interval, self._write))
+
+	async def stop(self) -> None:
+		# Refuses new entries, then waits for everything queued to be written.
+		if self._task is None:
+			return
+		self._stopping = True
+		await self.queue.put(None)
+		await self._task
+		self._task = None
+
+	def record(self, entry: Dict[str, Any]) -> bool:
+		if self._task is None or self._stopping:
+			self.dropped += 1
+			return False
+		try:
+			self.queue.put_nowait(entry)
+		except asyncio.QueueFull:
+			self.dropped += 1
+			return False
+		return True
+
+	async def _write(self, batch: List[Dict[str, Any]]) -> None:
+		try:
+			async with AsyncSessionLocal() as db:
+				await db.execute(insert(AccessLog), batch)
+				await db.commit()
+		except Exception:
+			self.failed += len(batch)
+			logger.exception("Failed to write %s access log entries", len(batch))
+			return
+		self.written += len(batch)
+
+
+access_log_writer = AccessLogWriter(settings.access_log_queue_size, settings.access_log_batch_size, settings.access_log_flush_ms)
@@ -0,0 +1,104 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.ledger import anchor_root, compute_anchor_hash, sign_anchor
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+from app.models.ledger import ChainAnchor
+
+logger = logging.getLogger(__name__)
+
+Head = Tuple[int, int, str]
+
+
+def _signing_key() -> str:
+	return settings.merkle_signing_key or settings.secret_key
+
+
+async def partition_heads(db: AsyncSession) -> List[Head]:
+	latest = select(Action.chain_partition, func.max(Action.partition_sequence).label("head")).group_by(Action.chain_partition).subquery()
+	result = await db.execute(
+		select(Action.chain_partition, Action.partition_sequence, Action.entry_hash)
+		.join(latest, (Action.chain_partition == latest.c.chain_partition) & (Action.partition_sequence == latest.c.head))
+		.order_by(Action.chain_partition)
+	)
+	return [tuple(row) for row in result]
+
+
+async def create_anchor() -> Optional[ChainAnchor]:
+	# Anchors the committed head of every partition; skipped when nothing moved.
+	async with AsyncSessionLocal() as db:
+		heads = await partition_heads(db)
+		if not heads:
+			return None
+		previous = (await db.execute(select(ChainAnchor).order_by(desc(ChainAnchor.anchor_index)).limit(1))).scalar_one_or_none()
+		if previous is not None and sorted(map(tuple, previous.heads)) == heads:
+			return None
+		anchor_index = previous.anchor_index + 1 if previous is not None else 0
+		prev_anchor_hash = previous.anchor_hash if previous is not None else None
+		created_at = datetime.utcnow()
+		root = anchor_root(heads)
+		anchor_hash = compute_anchor_hash(prev_anchor_hash, root, created_at)
+		anchor = ChainAnchor(
+			anchor_index=anchor_index,
+			heads=[list(head) for head in heads],
+			root=root,
+			prev_anchor_hash=prev_anchor_hash,
+			anchor_hash=anchor_hash,
+			signature=sign_anchor(_signing_key(), anchor_index, anchor_hash),
+			created_at=created_at,
+		)
+		db.add(anchor)
+		try:
+			await db.commit()
+		except IntegrityError:
+			# Another worker anchored the same index first.
+			logger.info("Chain anchor %s already written", anchor_index)
+			return None
+		return anchor
+
+
+async def verify_anchors(db: AsyncSession, full: bool) -> Dict[str, Any]:
+	# Checks the anchor chain (all anchors, or only the latest link when not full)
+	# and that every head in the latest anchor is still in its partition chain.
+	stmt = select(ChainAnchor).order_by(desc(ChainAnchor.anchor_index))
+	anchors = list((await db.execute(stmt if full else stmt.limit(2))).scalars())[::-1]
+	report: Dict[str, Any] = {"anchors_checked": len(anchors), "latest_anchor": None, "broken": None}
+	if not anchors:
+		return report
+	previous = None
+	for anchor in anchors:
+		expected_prev = previous.anchor_hash if previous is not None else (None if full else anchor.prev_anchor_hash)
+		reason = None
+		if anchor.prev_anchor_hash != expected_prev:
+			reason = "anchor link mismatch"
+		elif anchor_root(map(tuple, anchor.heads)) != anchor.root:
+			reason = "anchor root mismatch"
+		elif compute_anchor_hash(anchor.prev_anchor_hash, anchor.root, anchor.created_at) != anchor.anchor_hash:
+			reason = "anchor hash mismatch"
+		elif sign_anchor(_signing_key(), anchor.anchor_index, anchor.anchor_hash) != anchor.signature:
+			reason = "anchor signature mismatch"
+		if reason is not None:
+			report["broken"] = {"anchor_index": anchor.anchor_index, "reason": reason}
+			return report
+		previous = anchor
+	latest = anchors[-1]
+	heads = [tuple(head) for head in latest.heads]
+	result = await db.execute(
+		select(Action.chain_partition, Action.partition_sequence, Action.entry_hash).where(
+			tuple_(Action.chain_partition, Action.partition_sequence).in_([(partition, sequence) for partition, sequence, _ in heads])
+		)
+	)
+	stored = {(partition, sequence): entry_hash for partition, sequence, entry_hash in result}
+	for partition, sequence, entry_hash in heads:
+		if stored.get((partition, sequence)) != entry_hash:
+			report["broken"] = {"anchor_index": latest.anchor_index, "partition": partition, "partition_sequence": sequence, "reason": "anchored head mismatch"}
+			return report
+	report["latest_anchor"] = {"anchor_index": latest.anchor_index, "anchor_hash": latest.anchor_hash, "created_at": latest.created_at.isoformat()}
+	return report
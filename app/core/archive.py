@@ -0,0 +1,536 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import DateTime, delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.ledger import compute_entry_hash, entry_payload
+from app.db.session import AsyncSessionLocal, json_loads
+from app.models import user  # noqa: F401  (resolves Action relationships when run standalone)
+from app.models.action import Action
+from app.models.ledger import ArchivedVoid, ArchiveSegment, ChainAnchor, ChainCheckpoint, MerkleRoot
+
+logger = logging.getLogger(__name__)
+
+
+# Cold actions are moved, a contiguous range of `sequence` at a time, into
+# two files per segment under ARCHIVE_DIR:
+#   <name>.seg  magic, then zlib-compressed blocks of JSON lines (one row each)
+#   <name>.idx  header, one fixed-width entry per block (sequence range, id
+#               range, offset, length), then sorted (reference hash, block)
+#               and (target hash, block) pairs; it is memory-mapped and
+#               binary searched in place. Version 1 indexes have no targets.
+# Files are written once and never modified; voids that land after archival
+# are kept in `archived_voids` and applied when rows are read back. Nothing
+# references actions.id by foreign key: links, escalation events, process
+# steps and search rows keep the ids of archived actions, and readers resolve
+# ids missing from the hot table through ArchiveStore.
+SEGMENT_MAGIC = b"UALSEG1\n"
+INDEX_MAGIC_V1 = b"UALIDX1\n"
+INDEX_MAGIC = b"UALIDX2\n"
+_HEADER_V1 = struct.Struct("<8sII")
+_HEADER = struct.Struct("<8sIII")  # magic, blocks, references, targets
+_BLOCK = struct.Struct("<qqqqQI")  # first_sequence, last_sequence, min_id, max_id, offset, length
+_REFERENCE = struct.Struct("<QI")  # reference or target hash, block
+
+ARCHIVE_COLUMNS = tuple(column.name for column in Action.__table__.columns)
+_DATETIME_COLUMNS = tuple(column.name for column in Action.__table__.columns if isinstance(column.type, DateTime))
+
+
+def reference_hash(reference_key: str) -> int:
+	return int.from_bytes(hashlib.blake2b(reference_key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def target_hash(target_type: str, target_id: str) -> int:
+	return reference_hash(f"{target_type}\0{target_id}")
+
+
+def _encode_default(value: Any) -> Any:
+	if isinstance(value, datetime):
+		return value.isoformat()
+	raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+def _encode_row(row: Dict[str, Any]) -> bytes:
+	# Same JSON dialect the database columns use, so NaN and big ints survive
+	# the round trip and archived rows rehash to their stored entry_hash.
+	return json.dumps([row[column] for column in ARCHIVE_COLUMNS], default=_encode_default, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _decode_row(line: bytes) -> Dict[str, Any]:
+	row = dict(zip(ARCHIVE_COLUMNS, json_loads(line)))
+	for column in _DATETIME_COLUMNS:
+		if row[column] is not None:
+			row[column] = datetime.fromisoformat(row[column])
+	return row
+
+
+def _paths(name: str) -> tuple:
+	base = os.path.join(settings.archive_dir, name)
+	return base + ".seg", base + ".idx"
+
+
+def _fsync_replace(path: str, data: Iterable[bytes]) -> None:
+	with open(path + ".tmp", "wb") as handle:
+		for chunk in data:
+			handle.write(chunk)
+		handle.flush()
+		os.fsync(handle.fileno())
+	os.replace(path + ".tmp", path)
+
+
+def write_segment(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+	# rows are in sequence order; returns the ArchiveSegment values.
+	name = f"{rows[0]['sequence']:012d}-{rows[-1]['sequence']:012d}"
+	data_path, index_path = _paths(name)
+	os.makedirs(settings.archive_dir, exist_ok=True)
+	block_rows = settings.archive_block_rows
+	blocks, payloads, references, targets = [], [], set(), set()
+	offset = len(SEGMENT_MAGIC)
+	digest = hashlib.sha256(SEGMENT_MAGIC)
+	for start in range(0, len(rows), block_rows):
+		chunk = rows[start:start + block_rows]
+		payload = zlib.compress(b"".join(_encode_row(row) for row in chunk), settings.archive_compression_level)
+		ids = [row["id"] for row in chunk]
+		blocks.append((chunk[0]["sequence"], chunk[-1]["sequence"], min(ids), max(ids), offset, len(payload)))
+		references.update((reference_hash(row["reference_key"]), len(blocks) - 1) for row in chunk if row["reference_key"] is not None)
+		targets.update(
+			(target_hash(row["target_type"], row["target_id"]), len(blocks) - 1) for row in chunk
+			if row["target_type"] is not None and row["target_id"] is not None
+		)
+		payloads.append(payload)
+		digest.update(payload)
+		offset += len(payload)
+	boundaries: Dict[str, list] = {}
+	for row in rows:
+		boundary = boundaries.get(str(row["chain_partition"]))
+		if boundary is None:
+			boundaries[str(row["chain_partition"])] = [row["partition_sequence"], row["prev_hash"], row["partition_sequence"], row["entry_hash"]]
+		else:
+			boundary[2:] = [row["partition_sequence"], row["entry_hash"]]
+	_fsync_replace(data_path, [SEGMENT_MAGIC, *payloads])
+	index = [_HEADER.pack(INDEX_MAGIC, len(blocks), len(references), len(targets))]
+	index.extend(_BLOCK.pack(*block) for block in blocks)
+	index.extend(_REFERENCE.pack(*reference) for reference in sorted(references))
+	index.extend(_REFERENCE.pack(*target) for target in sorted(targets))
+	_fsync_replace(index_path, index)
+	created = [row["created_at"] for row in rows]
+	return {
+		"name": name,
+		"first_sequence": rows[0]["sequence"],
+		"last_sequence": rows[-1]["sequence"],
+		"min_id": min(row["id"] for row in rows),
+		"max_id": max(row["id"] for row in rows),
+		"row_count": len(rows),
+		"min_created_at": min(created),
+		"max_created_at": max(created),
+		"boundaries": boundaries,
+		"digest": digest.hexdigest(),
+		"size_bytes": offset,
+	}
+
+
+class SegmentReader:
+	def __init__(self, name: str):
+		self.name = name
+		data_path, index_path = _paths(name)
+		self._fd = os.open(data_path, os.O_RDONLY)
+		with open(index_path, "rb") as handle:
+			self._index = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+		magic = self._index[:len(INDEX_MAGIC)]
+		if magic == INDEX_MAGIC:
+			_, self.block_count, self.reference_count, self.target_count = _HEADER.unpack_from(self._index, 0)
+			header_size = _HEADER.size
+		elif magic == INDEX_MAGIC_V1:
+			_, self.block_count, self.reference_count = _HEADER_V1.unpack_from(self._index, 0)
+			self.target_count, header_size = None, _HEADER_V1.size
+		else:
+			raise ValueError(f"{index_path} is not a segment index")
+		self._blocks_at = header_size
+		self._references_at = header_size + self.block_count * _BLOCK.size
+		self._targets_at = self._references_at + self.reference_count * _REFERENCE.size
+
+	def close(self) -> None:
+		self._index.close()
+		os.close(self._fd)
+
+	def block(self, block: int) -> tuple:
+		return _BLOCK.unpack_from(self._index, self._blocks_at + block * _BLOCK.size)
+
+	def read_block(self, block: int) -> List[Dict[str, Any]]:
+		_, _, _, _, offset, length = self.block(block)
+		return [_decode_row(line) for line in zlib.decompress(os.pread(self._fd, length, offset)).splitlines()]
+
+	def _hash_blocks(self, at: int, count: int, wanted: int) -> List[int]:
+		lo, hi = 0, count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if _REFERENCE.unpack_from(self._index, at + mid * _REFERENCE.size)[0] < wanted:
+				lo = mid + 1
+			else:
+				hi = mid
+		blocks = []
+		while lo < count:
+			key, block = _REFERENCE.unpack_from(self._index, at + lo * _REFERENCE.size)
+			if key != wanted:
+				break
+			blocks.append(block)
+			lo += 1
+		return blocks
+
+	def reference_blocks(self, reference_key: str) -> List[int]:
+		return self._hash_blocks(self._references_at, self.reference_count, reference_hash(reference_key))
+
+	def target_blocks(self, target_type: str, target_id: str) -> Sequence[int]:
+		# Version 1 indexes carry no targets, so every block is a candidate.
+		if self.target_count is None:
+			return range(self.block_count)
+		return self._hash_blocks(self._targets_at, self.target_count, target_hash(target_type, target_id))
+
+	def sequence_blocks(self, after_sequence: int) -> range:
+		lo, hi = 0, self.block_count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self.block(mid)[1] <= after_sequence:
+				lo = mid + 1
+			else:
+				hi = mid
+		return range(lo, self.block_count)
+
+	def id_blocks(self, ids: Sequence[int]) -> List[int]:
+		# Ids follow commit order, which can interleave across chain partitions,
+		# so every block carries its own id range.
+		blocks = []
+		for block in range(self.block_count):
+			_, _, min_id, max_id, _, _ = self.block(block)
+			if any(min_id <= action_id <= max_id for action_id in ids):
+				blocks.append(block)
+		return blocks
+
+
+class ArchiveStore:
+	def __init__(self, cache_size: int):
+		self.cache_size = cache_size
+		self._readers: Dict[str, SegmentReader] = {}
+		self._blocks: OrderedDict = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _reader(self, name: str) -> SegmentReader:
+		with self._lock:
+			reader = self._readers.get(name)
+			if reader is None:
+				reader = self._readers[name] = SegmentReader(name)
+			return reader
+
+	def block_rows(self, name: str, block: int) -> List[Dict[str, Any]]:
+		# Decoded blocks are cached LRU; callers copy rows before mutating them.
+		key = (name, block)
+		with self._lock:
+			rows = self._blocks.get(key)
+			if rows is not None:
+				self._blocks.move_to_end(key)
+				return rows
+		rows = self._reader(name).read_block(block)
+		with self._lock:
+			self._blocks[key] = rows
+			while len(self._blocks) > self.cache_size:
+				self._blocks.popitem(last=False)
+		return rows
+
+	def close(self) -> None:
+		with self._lock:
+			for reader in self._readers.values():
+				reader.close()
+			self._readers.clear()
+			self._blocks.clear()
+
+	@staticmethod
+	async def segments(db: AsyncSession) -> List[ArchiveSegment]:
+		# Read in the caller's transaction, so the segment list and the hot rows
+		# come from the same snapshot while a segment is being cut over.
+		return list((await db.execute(select(ArchiveSegment).order_by(ArchiveSegment.first_sequence))).scalars())
+
+	def _scan_references(self, names: List[str], keys: List[str], after_sequence: Optional[int]) -> List[Dict[str, Any]]:
+		wanted = set(keys)
+		rows = []
+		for name in names:
+			reader = self._reader(name)
+			blocks = sorted({block for key in keys for block in reader.reference_blocks(key)})
+			for block in blocks:
+				rows.extend(
+					dict(row) for row in self.block_rows(name, block)
+					if row["reference_key"] in wanted and (after_sequence is None or row["sequence"] > after_sequence)
+				)
+		return rows
+
+	def _scan_ids(self, names: List[str], ids: List[int]) -> List[Dict[str, Any]]:
+		wanted = set(ids)
+		rows = []
+		for name in names:
+			for block in self._reader(name).id_blocks(ids):
+				rows.extend(dict(row) for row in self.block_rows(name, block) if row["id"] in wanted)
+		return rows
+
+	def _scan_target(self, names: List[str], target_type: str, target_id: str, after_sequence: int, through_sequence: Optional[int]) -> List[Dict[str, Any]]:
+		rows = []
+		for name in names:
+			reader = self._reader(name)
+			for block in reader.target_blocks(target_type, target_id):
+				first_sequence, last_sequence = reader.block(block)[:2]
+				if last_sequence <= after_sequence or (through_sequence is not None and first_sequence > through_sequence):
+					continue
+				rows.extend(
+					dict(row) for row in self.block_rows(name, block)
+					if row["target_type"] == target_type and row["target_id"] == target_id and row["sequence"] > after_sequence
+					and (through_sequence is None or row["sequence"] <= through_sequence)
+				)
+		return rows
+
+	def _scan_partition(self, names: List[str], partition: int, first: int, last: int) -> List[Dict[str, Any]]:
+		rows = []
+		for name in names:
+			reader = self._reader(name)
+			for block in range(reader.block_count):
+				rows.extend(
+					dict(row) for row in self.block_rows(name, block)
+					if row["chain_partition"] == partition and first <= row["partition_sequence"] <= last
+				)
+		return rows
+
+	@staticmethod
+	async def _apply_voids(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		if rows:
+			result = await db.execute(select(ArchivedVoid).where(ArchivedVoid.action_id.in_([row["id"] for row in rows])))
+			voids = {void.action_id: void for void in result.scalars()}
+			for row in rows:
+				void = voids.get(row["id"])
+				if void is not None:
+					row.update(voided=True, void_reason=void.void_reason, voided_by_user_id=void.voided_by_user_id, voided_at=void.voided_at)
+		return rows
+
+	async def reference_rows(
+		self,
+		db: AsyncSession,
+		keys: Iterable[str],
+		after_sequence: Optional[int] = None,
+		created_from: Optional[datetime] = None,
+		created_before: Optional[datetime] = None,
+	) -> List[Dict[str, Any]]:
+		# Archived rows for the reference keys in sequence order; segments outside
+		# the sequence or created_at window are skipped without being opened.
+		names = [
+			segment.name for segment in await self.segments(db)
+			if (after_sequence is None or segment.last_sequence > after_sequence)
+			and (created_from is None or segment.max_created_at >= created_from)
+			and (created_before is None or segment.min_created_at < created_before)
+		]
+		if not names:
+			return []
+		rows = await asyncio.to_thread(self._scan_references, names, list(keys), after_sequence)
+		rows.sort(key=lambda row: row["sequence"])
+		return await self._apply_voids(db, rows)
+
+	async def rows_by_id(self, db: AsyncSession, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+		ids = list(ids)
+		names = [segment.name for segment in await self.segments(db) if any(segment.min_id <= action_id <= segment.max_id for action_id in ids)]
+		if not names:
+			return {}
+		rows = await asyncio.to_thread(self._scan_ids, names, ids)
+		return {row["id"]: row for row in await self._apply_voids(db, rows)}
+
+	async def target_rows(self, db: AsyncSession, target_type: str, target_id: str, after_sequence: int = 0, through_sequence: Optional[int] = None) -> List[Dict[str, Any]]:
+		# Archived rows of one target in sequence order; only the blocks the
+		# target index points at are decompressed.
+		names = [
+			segment.name for segment in await self.segments(db)
+			if segment.last_sequence > after_sequence and (through_sequence is None or segment.first_sequence <= through_sequence)
+		]
+		if not names:
+			return []
+		rows = await asyncio.to_thread(self._scan_target, names, target_type, target_id, after_sequence, through_sequence)
+		rows.sort(key=lambda row: row["sequence"])
+		return await self._apply_voids(db, rows)
+
+	async def partition_rows(self, db: AsyncSession, partition: int, first: int, last: int) -> List[Dict[str, Any]]:
+		# Rows first..last (partition_sequence) of one chain partition, e.g. the
+		# leaves of a sealed Merkle block.
+		names = []
+		for segment in await self.segments(db):
+			boundary = segment.boundaries.get(str(partition))
+			if boundary is not None and boundary[0] <= last and boundary[2] >= first:
+				names.append(segment.name)
+		if not names:
+			return []
+		rows = await asyncio.to_thread(self._scan_partition, names, partition, first, last)
+		rows.sort(key=lambda row: row["partition_sequence"])
+		return await self._apply_voids(db, rows)
+
+	async def iter_rows(
+		self,
+		db: AsyncSession,
+		after_sequence: int = 0,
+		created_from: Optional[datetime] = None,
+		created_before: Optional[datetime] = None,
+		cached: bool = True,
+	) -> AsyncIterator[List[Dict[str, Any]]]:
+		# Every archived row after after_sequence, one decoded block at a time;
+		# bulk readers pass cached=False so they do not evict the hot blocks.
+		for segment in await self.segments(db):
+			if segment.last_sequence <= after_sequence:
+				continue
+			if (created_from is not None and segment.max_created_at < created_from) or (created_before is not None and segment.min_created_at >= created_before):
+				continue
+			reader = await asyncio.to_thread(self._reader, segment.name)
+			for block in reader.sequence_blocks(after_sequence):
+				if cached:
+					decoded = await asyncio.to_thread(self.block_rows, segment.name, block)
+				else:
+					decoded = await asyncio.to_thread(reader.read_block, block)
+				rows = [dict(row) for row in decoded if row["sequence"] > after_sequence]
+				yield await self._apply_voids(db, rows)
+
+
+archive = ArchiveStore(settings.archive_block_cache_size)
+
+
+def verify_archive_segment(name: str, digest: str, first_sequence: int, last_sequence: int, boundaries: Dict[str, list]) -> Dict[str, Any]:
+	# Rehashes every row of a segment file against the boundaries recorded when
+	# it was cut; runs in a verify worker process.
+	result = {"segment": name, "count": 0, "broken": None}
+
+	def broken(partition, row, sequence, reason):
+		result["broken"] = {"partition": partition, "sequence": sequence, "action_id": row["id"] if row is not None else None, "reason": reason, "segment": name}
+		return result
+
+	data_path, _ = _paths(name)
+	try:
+		file_digest = hashlib.sha256()
+		with open(data_path, "rb") as handle:
+			for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+				file_digest.update(chunk)
+		reader = SegmentReader(name)
+	except (OSError, ValueError) as exc:
+		return broken(None, None, first_sequence, f"archive segment unreadable: {exc}")
+	try:
+		if file_digest.hexdigest() != digest:
+			return broken(None, None, first_sequence, "archive segment digest mismatch")
+		chains = {int(partition): [boundary[0], boundary[1]] for partition, boundary in boundaries.items()}
+		previous_sequence = first_sequence - 1
+		for block in range(reader.block_count):
+			for row in reader.read_block(block):
+				partition = row["chain_partition"]
+				chain = chains.get(partition)
+				if chain is None:
+					return broken(partition, row, row["partition_sequence"], "partition missing from segment boundaries")
+				if row["sequence"] <= previous_sequence or row["sequence"] > last_sequence:
+					return broken(partition, row, row["partition_sequence"], "archived sequence out of range")
+				if row["partition_sequence"] != chain[0]:
+					return broken(partition, row, chain[0], "missing sequence")
+				if row["prev_hash"] != chain[1]:
+					return broken(partition, row, chain[0], "prev_hash mismatch")
+				version = row["hash_version"]
+				if compute_entry_hash(entry_payload(row, version), chain[1], version) != row["entry_hash"]:
+					return broken(partition, row, chain[0], "entry_hash mismatch")
+				chain[0], chain[1] = chain[0] + 1, row["entry_hash"]
+				previous_sequence = row["sequence"]
+				result["count"] += 1
+		for partition, boundary in boundaries.items():
+			if chains[int(partition)] != [boundary[2] + 1, boundary[3]]:
+				return broken(int(partition), None, boundary[2], "archive segment boundary mismatch")
+	finally:
+		reader.close()
+	return result
+
+
+async def _archivable_through(db: AsyncSession) -> int:
+	# Highest sequence that can be archived: every partition only gives up
+	# rows inside sealed Merkle blocks and strictly below both its latest
+	# verify checkpoint and its latest anchored head, so heads, checkpoints and
+	# anchors keep resolving against the hot table.
+	heads = dict((await db.execute(select(Action.chain_partition, func.max(Action.partition_sequence)).group_by(Action.chain_partition))).tuples().all())
+	sealed = dict((await db.execute(select(MerkleRoot.chain_partition, func.max(MerkleRoot.last_sequence)).group_by(MerkleRoot.chain_partition))).tuples().all())
+	checkpoints = dict((await db.execute(select(ChainCheckpoint.chain_partition, func.max(ChainCheckpoint.sequence)).group_by(ChainCheckpoint.chain_partition))).tuples().all())
+	anchor = (await db.execute(select(ChainAnchor).order_by(ChainAnchor.anchor_index.desc()).limit(1))).scalar_one_or_none()
+	anchored = {partition: sequence for partition, sequence, _ in anchor.heads} if anchor is not None else {}
+	bounds = []
+	for partition in heads:
+		limit = min(sealed.get(partition, 0), checkpoints.get(partition, 0) - 1, anchored.get(partition, heads[partition] + 1) - 1)
+		bounds.append(
+			select(func.min(Action.sequence)).where(Action.chain_partition == partition, Action.partition_sequence > limit).scalar_subquery()
+		)
+	cutoff = datetime.utcnow() - timedelta(days=settings.archive_min_age_days)
+	bounds.append(select(func.min(Action.sequence)).where(Action.created_at >= cutoff).scalar_subquery())
+	first_kept = [value for value in (await db.execute(select(*bounds))).one() if value is not None]
+	if not first_kept:
+		return 0
+	return min(first_kept) - 1
+
+
+async def archive_cold_segments(max_segments: Optional[int] = None) -> int:
+	# Cuts full ARCHIVE_SEGMENT_ROWS segments off the cold end of the table.
+	archived = 0
+	while max_segments is None or max_segments > 0:
+		async with AsyncSessionLocal() as db:
+			watermark = (await db.execute(select(func.max(ArchiveSegment.last_sequence)))).scalar_one_or_none() or 0
+			through = await _archivable_through(db)
+			if through - watermark < settings.archive_segment_rows:
+				break
+			result = await db.execute(
+				select(*Action.__table__.columns)
+				.where(Action.sequence > watermark, Action.sequence <= through)
+				.order_by(Action.sequence)
+				.limit(settings.archive_segment_rows)
+			)
+			rows = [dict(row) for row in result.mappings()]
+		if len(rows) < settings.archive_segment_rows:
+			break
+		values = await asyncio.to_thread(write_segment, rows)
+		async with AsyncSessionLocal() as db:
+			try:
+				deleted = await db.execute(
+					delete(Action)
+					.where(Action.sequence.between(values["first_sequence"], values["last_sequence"]))
+					.returning(Action.id, Action.voided)
+					.execution_options(synchronize_session=False)
+				)
+			except IntegrityError:
+				# Schemas created before archival still carry foreign keys to actions.id.
+				await db.rollback()
+				logger.error("Archive segment %s not cut over: drop the foreign keys referencing actions.id", values["name"])
+				break
+			if dict(deleted.tuples().all()) != {row["id"]: row["voided"] for row in rows}:
+				# A void landed while the segment was being written; retry next run.
+				await db.rollback()
+				logger.warning("Archive segment %s changed while writing; skipped", values["name"])
+				break
+			await db.execute(insert(ArchiveSegment), [values])
+			await db.commit()
+		logger.info("Archived %s actions into segment %s", values["row_count"], values["name"])
+		archived += values["row_count"]
+		if max_segments is not None:
+			max_segments -= 1
+	return archived
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Move cold actions into compressed archive segments")
+	parser.add_argument("--max-segments", type=int, default=None)
+	args = parser.parse_args()
+	print(f"Archived {asyncio.run(archive_cold_segments(args.max_segments))} actions")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+
+async def drain_batches(queue: asyncio.Queue, max_size: int, max_wait: float, flush: Callable[[List[Any]], Awaitable[None]]) -> None:
+	# Group-commit loop shared by the background writers: a batch starts with
+	# the first queued item and closes at max_size items or max_wait seconds
+	# later, whichever comes first. A None item flushes what is batched and
+	# stops the loop.
+	loop = asyncio.get_running_loop()
+	stopping = False
+	while not stopping:
+		item = await queue.get()
+		if item is None:
+			break
+		batch = [item]
+		deadline = loop.time() + max_wait
+		while len(batch) < max_size:
+			try:
+				item = queue.get_nowait()
+			except asyncio.QueueEmpty:
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					item = await asyncio.wait_for(queue.get(), timeout)
+				except asyncio.TimeoutError:
+					break
+			if item is None:
+				stopping = True
+				break
+			batch.append(item)
+		await flush(batch)
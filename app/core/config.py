@@ -8,9 +8,75 @@ class Settings(BaseSettings):
 	secret_key: str = Field(default="change-this-secret")
 	access_token_expire_minutes: int = Field(default=60 * 24)
 	database_url: str = Field(default="sqlite+aiosqlite:///./ual.db")
+	database_read_url: Optional[str] = Field(default=None)
+	db_pool_size: int = Field(default=10)
+	db_max_overflow: int = Field(default=20)
+	db_pool_timeout: float = Field(default=30.0)
+	db_pool_recycle: int = Field(default=1800)
+	db_pool_pre_ping: bool = Field(default=False)
+	sqlite_synchronous: str = Field(default="NORMAL")
+	sqlite_busy_timeout_ms: int = Field(default=5000)
+	sqlite_cache_size: int = Field(default=-64_000)  # negative = KiB
+	sqlite_mmap_size: int = Field(default=256 * 1024 * 1024)
 	enable_docs: bool = Field(default=True)
 	environment: str = Field(default="dev")
 	scheduler_timezone: str = Field(default="UTC")
+	ledger_batch_max_size: int = Field(default=256)
+	ledger_batch_max_wait_ms: float = Field(default=5.0)
+	ledger_queue_max_size: int = Field(default=10_000)
+	ingest_chunk_size: int = Field(default=500)
+	ingest_max_row_bytes: int = Field(default=1024 * 1024)
+	verify_segment_size: int = Field(default=250_000)
+	verify_workers: Optional[int] = Field(default=None)
+	verify_report_cache_seconds: int = Field(default=60)
+	merkle_block_size: int = Field(default=1024)
+	merkle_signing_key: Optional[str] = Field(default=None)
+	chain_partitioning: str = Field(default="none")  # none | department | reference
+	chain_partitions: int = Field(default=16)
+	chain_anchor_interval_seconds: int = Field(default=300)
+	archive_enabled: bool = Field(default=False)
+	archive_dir: str = Field(default="./archive")
+	archive_min_age_days: int = Field(default=90)
+	archive_segment_rows: int = Field(default=50_000)
+	archive_block_rows: int = Field(default=256)
+	archive_compression_level: int = Field(default=6)
+	archive_block_cache_size: int = Field(default=256)
+	archive_interval_seconds: int = Field(default=3600)
+	idempotency_bloom_capacity: int = Field(default=1_000_000)
+	idempotency_bloom_error_rate: float = Field(default=0.001)
+	idempotency_cache_size: int = Field(default=100_000)
+	state_snapshot_every: int = Field(default=256)
+	state_snapshot_interval_seconds: int = Field(default=300)
+	export_page_size: int = Field(default=50_000)
+	export_batch_size: int = Field(default=1000)
+	export_gzip_level: int = Field(default=6)
+	timeline_default_limit: int = Field(default=100)
+	timeline_max_limit: int = Field(default=1000)
+	escalation_interval_seconds: int = Field(default=60)
+	escalation_batch_size: int = Field(default=500)
+	rule_reload_seconds: int = Field(default=60)
+	password_hash_workers: int = Field(default=4)
+	password_hash_max_pending: int = Field(default=64)
+	token_cache_size: int = Field(default=10_000)
+	token_cache_ttl_seconds: int = Field(default=300)
+	token_revocation_enabled: bool = Field(default=False)
+	lineage_max_depth: int = Field(default=20)
+	events_backend: str = Field(default="local")
+	events_queue_size: int = Field(default=256)
+	events_keepalive_seconds: float = Field(default=15.0)
+	events_replay_limit: int = Field(default=10_000)
+	metrics_enabled: bool = Field(default=True)
+	metrics_sql_max_length: int = Field(default=200)
+	access_log_enabled: bool = Field(default=True)
+	access_log_methods: str = Field(default="GET,HEAD")  # comma separated; "*" logs every method
+	access_log_queue_size: int = Field(default=10_000)
+	access_log_batch_size: int = Field(default=500)
+	access_log_flush_ms: float = Field(default=1000.0)
+	profiling_enabled: bool = Field(default=False)
+	profiling_header: str = Field(default="X-Profile")
+	profiling_token: Optional[str] = Field(default=None)
+	profiling_interval_ms: float = Field(default=1.0)
+	profiling_dir: str = Field(default="./profiles")
 
 	class Config:
 		env_file = ".env"
@@ -0,0 +1,135 @@
+import asyncio
+import importlib
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from app.core.config import settings
+from app.schemas.action import ActionRead
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerEvent(NamedTuple):
+	type: str  # "action" or "void"
+	reference_key: str
+	sequence: int
+	data: str  # ActionRead JSON, rendered once per event
+
+	def sse(self) -> bytes:
+		# Only appends advance the SSE id, so Last-Event-ID is always a ledger sequence.
+		event_id = f"id: {self.sequence}\n" if self.type == "action" else ""
+		return f"{event_id}event: {self.type}\ndata: {self.data}\n\n".encode("utf-8")
+
+
+def action_event(action: ActionRead, event_type: str = "action") -> Optional[LedgerEvent]:
+	if action.reference_key is None:
+		return None
+	return LedgerEvent(event_type, action.reference_key, action.sequence, action.model_dump_json())
+
+
+RESYNC = LedgerEvent("resync", "", 0, "{}")
+
+
+class Subscription:
+	def __init__(self, keys: Set[str], maxsize: int):
+		self.keys = keys
+		self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+		self.closed = False
+
+	def offer(self, event: LedgerEvent) -> bool:
+		if self.closed:
+			return False
+		try:
+			self.queue.put_nowait(event)
+			return True
+		except asyncio.QueueFull:
+			# Slow consumer: drop what is queued and tell the client to reconnect
+			# with Last-Event-ID, which replays the gap from the database.
+			self.closed = True
+			while not self.queue.empty():
+				self.queue.get_nowait()
+			self.queue.put_nowait(RESYNC)
+			return False
+
+
+class EventHub:
+	def __init__(self, queue_size: int):
+		self.queue_size = queue_size
+		self.backend: Optional["LocalBackend"] = None
+		self.dropped_subscribers = 0
+		self.delivered = 0
+		self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+
+	@property
+	def subscriber_count(self) -> int:
+		return len({id(sub) for subs in self._subscriptions.values() for sub in subs})
+
+	def subscribe(self, keys: Iterable[str]) -> Subscription:
+		subscription = Subscription(set(keys), self.queue_size)
+		for key in subscription.keys:
+			self._subscriptions[key].add(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription: Subscription) -> None:
+		for key in subscription.keys:
+			subs = self._subscriptions.get(key)
+			if subs is not None:
+				subs.discard(subscription)
+				if not subs:
+					del self._subscriptions[key]
+
+	def dispatch(self, events: Iterable[LedgerEvent]) -> None:
+		# Called by the backend with events committed on any worker.
+		for event in events:
+			for subscription in list(self._subscriptions.get(event.reference_key, ())):
+				if subscription.offer(event):
+					self.delivered += 1
+				elif subscription.closed:
+					self.dropped_subscribers += 1
+					self.unsubscribe(subscription)
+
+	def publish(self, events: List[LedgerEvent]) -> None:
+		if events and self.backend is not None:
+			self.backend.publish(events)
+
+	def on_actions(self, actions: List[ActionRead]) -> None:
+		# Sequencer listener.
+		self.publish([event for event in map(action_event, actions) if event is not None])
+
+	async def start(self) -> None:
+		self.backend = load_backend(settings.events_backend)(self)
+		await self.backend.start()
+
+	async def stop(self) -> None:
+		if self.backend is not None:
+			await self.backend.stop()
+			self.backend = None
+
+
+# Backends fan events out to every worker's hub. The local backend only
+# reaches this process; a shared backend (e.g. Redis or Postgres
+# LISTEN/NOTIFY) implements the same three methods and is selected with
+# EVENTS_BACKEND="package.module:Class".
+class LocalBackend:
+	def __init__(self, hub: EventHub):
+		self.hub = hub
+
+	async def start(self) -> None:
+		pass
+
+	async def stop(self) -> None:
+		pass
+
+	def publish(self, events: List[LedgerEvent]) -> None:
+		self.hub.dispatch(events)
+
+
+def load_backend(path: str):
+	if path == "local":
+		return LocalBackend
+	module, _, name = path.partition(":")
+	return getattr(importlib.import_module(module), name)
+
+
+event_hub = EventHub(settings.events_queue_size)
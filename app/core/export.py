@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import zlib
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
+
+import orjson
+
+from app.core.archive import archive
+from app.core.config import settings
+from app.core.ledger import to_naive_utc
+from app.core.projection import ACTION_READ_FIELDS, encode_action_lines, project_action_row, select_action_rows
+from app.db.session import ReadSessionLocal
+from app.models.action import Action
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def export_batches(
+	after_sequence: int = 0,
+	last_sequence: Optional[int] = None,
+	since: Optional[datetime] = None,
+	until: Optional[datetime] = None,
+) -> AsyncIterator[List[Sequence]]:
+	# Yields ActionRead-shaped rows in sequence order, archived segments first.
+	# Each page of EXPORT_PAGE_SIZE rows is read in its own short transaction,
+	# so long exports do not pin a snapshot, and the archive watermark and hot
+	# rows of a page always come from the same one. Resume from the sequence of
+	# the last row received.
+	since, until = to_naive_utc(since), to_naive_utc(until)
+	page_size = settings.export_page_size
+	while last_sequence is None or after_sequence < last_sequence:
+		read = 0
+		async with ReadSessionLocal() as db:
+			segments = await archive.segments(db)
+			watermark = segments[-1].last_sequence if segments else 0
+			if after_sequence < watermark:
+				async with aclosing(archive.iter_rows(db, after_sequence, since, until, cached=False)) as blocks:
+					async for rows in blocks:
+						if not rows:
+							continue
+						after_sequence = rows[-1]["sequence"]
+						batch = [
+							project_action_row(row) for row in rows
+							if (last_sequence is None or row["sequence"] <= last_sequence)
+							and (since is None or row["created_at"] >= since)
+							and (until is None or row["created_at"] < until)
+						]
+						if batch:
+							read += len(batch)
+							yield batch
+						if read >= page_size or (last_sequence is not None and after_sequence >= last_sequence):
+							break
+					else:
+						# Segments outside the date range are skipped unread.
+						after_sequence = max(after_sequence, watermark)
+				continue
+			stmt = select_action_rows().where(Action.sequence > after_sequence)
+			if last_sequence is not None:
+				stmt = stmt.where(Action.sequence <= last_sequence)
+			if since is not None:
+				stmt = stmt.where(Action.created_at >= since)
+			if until is not None:
+				stmt = stmt.where(Action.created_at < until)
+			stmt = stmt.order_by(Action.sequence).limit(page_size).execution_options(yield_per=settings.export_batch_size)
+			result = await db.stream(stmt)
+			async for partition in result.partitions():
+				read += len(partition)
+				after_sequence = partition[-1].sequence
+				yield partition
+		if read < page_size:
+			return
+
+
+def _csv_value(value):
+	if value is None:
+		return ""
+	if isinstance(value, bool):
+		return "true" if value else "false"
+	if isinstance(value, datetime):
+		return value.isoformat()
+	if isinstance(value, (dict, list)):
+		return orjson.dumps(value).decode("utf-8")
+	return value
+
+
+def encode_csv_rows(rows: Iterable[Sequence]) -> bytes:
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	writer.writerows([_csv_value(value) for value in row] for row in rows)
+	return buffer.getvalue().encode("utf-8")
+
+
+def encode_csv_header() -> bytes:
+	return encode_csv_rows([ACTION_READ_FIELDS])
+
+
+def encode_batch(rows: Sequence[Sequence], format: str) -> bytes:
+	return encode_action_lines(rows) if format == "ndjson" else encode_csv_rows(rows)
+
+
+async def export_stream(format: str, compress: bool, **ranges) -> AsyncIterator[bytes]:
+	# One chunk per batch; gzip output is sync-flushed per batch so clients
+	# can decode everything received so far.
+	compressor = zlib.compressobj(settings.export_gzip_level, zlib.DEFLATED, 31) if compress else None
+	if format == "csv":
+		header = encode_csv_header()
+		yield compressor.compress(header) if compressor else header
+	async for batch in export_batches(**ranges):
+		data = encode_batch(batch, format)
+		yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+	if compressor:
+		yield compressor.flush()
+
+
+def _save_progress(path: str, progress: dict) -> None:
+	with open(path + ".tmp", "w", encoding="utf-8") as handle:
+		json.dump(progress, handle)
+	os.replace(path + ".tmp", path)
+
+
+async def export_to_file(path: str, format: str, compress: bool, resume: bool, after_sequence: int = 0, last_sequence: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+	# <path>.progress records the last exported sequence and the file size at
+	# that point; --resume truncates back to it and carries on. Gzip output is
+	# written as one gzip member per batch, so every recorded size is a valid
+	# end of file.
+	progress_path = path + ".progress"
+	offset = 0
+	if resume and os.path.exists(progress_path):
+		with open(progress_path, encoding="utf-8") as handle:
+			progress = json.load(handle)
+		if progress["format"] != format or progress["gzip"] != compress:
+			raise SystemExit(f"{progress_path} was written for a different format")
+		if progress["complete"]:
+			return 0
+		after_sequence, offset = progress["sequence"], progress["offset"]
+	exported = 0
+	with open(path, "r+b" if offset else "wb") as out:
+		out.truncate(offset)
+		out.seek(offset)
+
+		def write(data: bytes) -> None:
+			out.write(gzip.compress(data, settings.export_gzip_level) if compress else data)
+			out.flush()
+
+		if offset == 0 and format == "csv":
+			write(encode_csv_header())
+		progress = {"format": format, "gzip": compress, "sequence": after_sequence, "offset": out.tell(), "complete": False}
+		async for batch in export_batches(after_sequence, last_sequence, since, until):
+			write(encode_batch(batch, format))
+			exported += len(batch)
+			progress.update(sequence=batch[-1].sequence, offset=out.tell())
+			_save_progress(progress_path, progress)
+		progress["complete"] = True
+		_save_progress(progress_path, progress)
+	return exported
+
+
+async def export_to_stdout(format: str, **ranges) -> int:
+	out = sys.stdout.buffer
+	exported = 0
+	if format == "csv":
+		out.write(encode_csv_header())
+	async for batch in export_batches(**ranges):
+		out.write(encode_batch(batch, format))
+		exported += len(batch)
+	out.flush()
+	return exported
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Stream actions, with chain hashes and void metadata, as NDJSON or CSV")
+	parser.add_argument("--format", choices=sorted(EXPORT_MEDIA_TYPES), default="ndjson")
+	parser.add_argument("--output", default="-", help="file path, or - for stdout")
+	parser.add_argument("--gzip", action="store_true", help="gzip the output file")
+	parser.add_argument("--resume", action="store_true", help="continue an interrupted export to --output")
+	parser.add_argument("--after-sequence", type=int, default=0)
+	parser.add_argument("--last-sequence", type=int, default=None)
+	parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+	parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+	args = parser.parse_args()
+	ranges = {"after_sequence": args.after_sequence, "last_sequence": args.last_sequence, "since": args.since, "until": args.until}
+	if args.output == "-":
+		exported = asyncio.run(export_to_stdout(args.format, **ranges))
+	else:
+		exported = asyncio.run(export_to_file(args.output, args.format, args.gzip, args.resume, **ranges))
+	print(f"Exported {exported} actions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+	main()
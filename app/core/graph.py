@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.action import ActionLink
+
+
+Edge = Tuple[int, int, str]
+
+# Link ids are allocated before commit, so a lower id can become visible after
+# a higher one; skipped ids are re-checked for this long before being treated
+# as rolled back.
+GAP_RECHECK_SECONDS = 300.0
+
+
+def _walk_result(start: int, depths: Dict[int, int], edges: List[Edge]) -> dict:
+	return {
+		"root": start,
+		"nodes": [{"action_id": node, "depth": depth} for node, depth in sorted(depths.items(), key=lambda item: (item[1], item[0])) if node != start],
+		"edges": [{"source_action_id": source, "target_action_id": target, "link_type": link_type} for source, target, link_type in edges],
+	}
+
+
+# In-memory adjacency lists for ActionLink. Links created through any worker
+# are picked up by a cheap max(id) check before each traversal, plus a lookup
+# of recently skipped ids that may still commit.
+class LinkGraph:
+	def __init__(self):
+		self._forward: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+		self._backward: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+		self._max_link_id = 0
+		self._gaps: Dict[int, float] = {}  # missing link id -> when it was first skipped
+		self.warm = False
+		self._lock = asyncio.Lock()
+
+	def add(self, link_id: int, source: int, target: int, link_type: str) -> None:
+		if link_id <= self._max_link_id:
+			if self._gaps.pop(link_id, None) is None:
+				return
+		else:
+			now = time.monotonic()
+			self._gaps.update((gap, now) for gap in range(self._max_link_id + 1, link_id))
+			self._max_link_id = link_id
+		self._forward[source].append((target, link_type))
+		self._backward[target].append((source, link_type))
+
+	async def refresh(self, db: AsyncSession) -> None:
+		async with self._lock:
+			if self._gaps:
+				expired = time.monotonic() - GAP_RECHECK_SECONDS
+				self._gaps = {gap: skipped for gap, skipped in self._gaps.items() if skipped > expired}
+			latest = (await db.execute(select(func.max(ActionLink.id)))).scalar_one_or_none() or 0
+			if latest <= self._max_link_id and not self._gaps:
+				return
+			pending = ActionLink.id > self._max_link_id
+			if self._gaps:
+				pending = pending | ActionLink.id.in_(list(self._gaps))
+			result = await db.stream(
+				select(ActionLink.id, ActionLink.source_action_id, ActionLink.target_action_id, ActionLink.link_type)
+				.where(pending)
+				.order_by(ActionLink.id)
+				.execution_options(yield_per=10_000)
+			)
+			async for partition in result.partitions():
+				for link_id, source, target, link_type in partition:
+					self.add(link_id, source, target, link_type)
+
+	async def warm_up(self) -> None:
+		async with AsyncSessionLocal() as db:
+			await self.refresh(db)
+		self.warm = True
+
+	def walk(self, start: int, upstream: bool, max_depth: int, link_types: Optional[Set[str]] = None, max_nodes: int = 10_000) -> dict:
+		adjacency = self._backward if upstream else self._forward
+		depths = {start: 0}
+		edges: List[Edge] = []
+		queue = deque([start])
+		while queue and len(depths) <= max_nodes:
+			node = queue.popleft()
+			depth = depths[node]
+			if depth >= max_depth:
+				continue
+			for neighbour, link_type in adjacency.get(node, ()):
+				if link_types and link_type not in link_types:
+					continue
+				edges.append((neighbour, node, link_type) if upstream else (node, neighbour, link_type))
+				# Visited nodes are never re-queued, which also breaks cycles.
+				if neighbour not in depths:
+					depths[neighbour] = depth + 1
+					queue.append(neighbour)
+		return _walk_result(start, depths, edges)
+
+
+async def walk_sql(db: AsyncSession, start: int, upstream: bool, max_depth: int, link_types: Optional[Set[str]] = None) -> dict:
+	# Recursive CTE fallback; the depth bound guarantees termination on cycles
+	# and each node keeps its shallowest depth.
+	near, far = (ActionLink.target_action_id, ActionLink.source_action_id) if upstream else (ActionLink.source_action_id, ActionLink.target_action_id)
+	base = select(literal(start).label("node"), literal(0).label("depth")).cte("walk", recursive=True)
+	step = select(far.label("node"), (base.c.depth + 1).label("depth")).join(base, near == base.c.node).where(base.c.depth < max_depth)
+	if link_types:
+		step = step.where(ActionLink.link_type.in_(link_types))
+	walk = base.union(step)
+	result = await db.execute(select(walk.c.node, func.min(walk.c.depth)).group_by(walk.c.node))
+	depths = dict(result.tuples().all())
+	stmt = select(ActionLink.source_action_id, ActionLink.target_action_id, ActionLink.link_type).where(
+		near.in_([node for node, depth in depths.items() if depth < max_depth])
+	)
+	if link_types:
+		stmt = stmt.where(ActionLink.link_type.in_(link_types))
+	edges = list((await db.execute(stmt)).tuples())
+	return _walk_result(start, depths, edges)
+
+
+link_graph = LinkGraph()
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.archive import archive
+from app.core.config import settings
+from app.core.ledger import HASHED_FIELDS, canonical_encode
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action, IdempotencyKey
+from app.schemas.action import ActionRead
+
+
+def idempotency_key(values: Mapping[str, Any]) -> Optional[str]:
+	# A client-supplied key is scoped to its user; offline captures without one
+	# are keyed by device, local timestamp and a digest of the whole payload.
+	client_key = values.get("idempotency_key")
+	if client_key:
+		material = b"key\0%d\0%s" % (values["created_by_user_id"], client_key.encode("utf-8"))
+	elif values.get("is_offline_capture") and values.get("device_id") and values.get("local_timestamp") is not None:
+		material = b"device\0" + canonical_encode({field: values.get(field) for field in HASHED_FIELDS if field != "created_at"})
+	else:
+		return None
+	return hashlib.blake2b(material, digest_size=16).hexdigest()
+
+
+class BloomFilter:
+	def __init__(self, capacity: int, error_rate: float):
+		self.capacity = capacity
+		self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+		self.hashes = max(1, round(self.size / capacity * math.log(2)))
+		self.bits = bytearray((self.size + 7) // 8)
+		self.count = 0
+
+	def _positions(self, key: str) -> List[int]:
+		# Keys are already blake2b digests; split into two halves for double hashing.
+		digest = bytes.fromhex(key)
+		first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+		return [(first + i * second) % self.size for i in range(self.hashes)]
+
+	def add(self, key: str) -> None:
+		for position in self._positions(key):
+			self.bits[position >> 3] |= 1 << (position & 7)
+		self.count += 1
+
+	def __contains__(self, key: str) -> bool:
+		return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+# Answers "was this key appended before?" without touching idempotency_keys in
+# the common case: recent keys map to their action id in an LRU, keys the
+# Bloom filter has never seen are new, and only filter hits are looked up.
+# Replays always read the action row itself, so a void committed by any
+# worker shows in the replayed action. The primary key on idempotency_keys
+# stays the source of truth, so keys appended by other processes are caught
+# at insert time.
+class IdempotencyIndex:
+	def __init__(self, capacity: int, error_rate: float, cache_size: int):
+		self.capacity = capacity
+		self.error_rate = error_rate
+		self.cache_size = cache_size
+		self.bloom: Optional[BloomFilter] = None
+		self._recent: "OrderedDict[str, int]" = OrderedDict()
+		self._lock: Optional[asyncio.Lock] = None
+
+	async def load(self) -> None:
+		if self.bloom is not None:
+			return
+		if self._lock is None:
+			self._lock = asyncio.Lock()
+		async with self._lock:
+			if self.bloom is not None:
+				return
+			async with AsyncSessionLocal() as db:
+				count = (await db.execute(select(func.count()).select_from(IdempotencyKey))).scalar_one()
+				bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+				result = await db.stream_scalars(select(IdempotencyKey.key).execution_options(yield_per=10_000))
+				async for key in result:
+					bloom.add(key)
+			self.bloom = bloom
+
+	async def resolve(self, keys: Iterable[str]) -> Dict[str, ActionRead]:
+		await self.load()
+		cached: Dict[str, int] = {}
+		maybe = []
+		for key in keys:
+			action_id = self._recent.get(key)
+			if action_id is not None:
+				self._recent.move_to_end(key)
+				cached[key] = action_id
+			elif key in self.bloom:
+				maybe.append(key)
+		found: Dict[str, ActionRead] = {}
+		if cached:
+			async with AsyncSessionLocal() as db:
+				found.update(await self._actions(db, cached))
+			metrics.IDEMPOTENT_REPLAYS.inc(len(cached), ("cache",))
+		if maybe:
+			fetched = await self.fetch(maybe)
+			metrics.IDEMPOTENCY_LOOKUPS.inc(len(fetched), ("hit",))
+			metrics.IDEMPOTENCY_LOOKUPS.inc(len(maybe) - len(fetched), ("false_positive",))
+			metrics.IDEMPOTENT_REPLAYS.inc(len(fetched), ("database",))
+			found.update(fetched)
+		return found
+
+	async def fetch(self, keys: List[str]) -> Dict[str, ActionRead]:
+		async with AsyncSessionLocal() as db:
+			result = await db.execute(select(IdempotencyKey.key, IdempotencyKey.action_id).where(IdempotencyKey.key.in_(keys)))
+			action_ids = dict(result.tuples().all())
+			if not action_ids:
+				return {}
+			found = await self._actions(db, action_ids)
+		self.remember(found.items())
+		return found
+
+	@staticmethod
+	async def _actions(db: AsyncSession, action_ids: Dict[str, int]) -> Dict[str, ActionRead]:
+		# Current rows for key -> action id, hot or archived.
+		rows: Dict[int, Any] = {action.id: action for action in (await db.execute(select(Action).where(Action.id.in_(action_ids.values())))).scalars()}
+		missing = [action_id for action_id in action_ids.values() if action_id not in rows]
+		if missing:
+			rows.update(await archive.rows_by_id(db, missing))
+		return {key: ActionRead.model_validate(rows[action_id]) for key, action_id in action_ids.items() if action_id in rows}
+
+	def remember(self, entries: Iterable[Tuple[str, ActionRead]]) -> None:
+		for key, action in entries:
+			if self.bloom is not None:
+				self.bloom.add(key)
+			self._recent[key] = action.id
+			self._recent.move_to_end(key)
+		while len(self._recent) > self.cache_size:
+			self._recent.popitem(last=False)
+		if self.bloom is not None and self.bloom.count > self.bloom.capacity:
+			# Past capacity the false positive rate climbs; rebuild at twice the size.
+			self.bloom = None
+
+
+idempotency = IdempotencyIndex(settings.idempotency_bloom_capacity, settings.idempotency_bloom_error_rate, settings.idempotency_cache_size)
@@ -0,0 +1,123 @@
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Tuple
+
+
+class IngestFormatError(ValueError):
+	pass
+
+
+_STRUCTURAL = re.compile(r'[\[\]{}",]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_row_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+	buffer = b""
+	index = 0
+	async for chunk in chunks:
+		buffer += chunk
+		*lines, buffer = buffer.split(b"\n")
+		for line in lines:
+			if not line.strip():
+				continue
+			yield index, _loads(line)
+			index += 1
+		if len(buffer) > max_row_bytes:
+			raise IngestFormatError(f"Row {index} exceeds {max_row_bytes} bytes")
+	if buffer.strip():
+		yield index, _loads(buffer)
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], max_row_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+	decode = codecs.getincrementaldecoder("utf-8")().decode
+	buffer = ""
+	pos = 0
+	index = 0
+	opened = False
+	closed = False
+	async for chunk in chunks:
+		buffer = buffer[pos:] + decode(chunk)
+		pos = 0
+		while not closed:
+			pos = _skip(buffer, pos, opened)
+			if pos >= len(buffer):
+				break
+			if not opened:
+				if buffer[pos] != "[":
+					raise IngestFormatError("Expected a JSON array")
+				opened = True
+				pos += 1
+				continue
+			if buffer[pos] == "]":
+				closed = True
+				break
+			# Each element is cut at its closing delimiter before decoding, so a
+			# malformed row is reported like an NDJSON one and the next row parses.
+			end = _element_end(buffer, pos)
+			if end < 0:
+				if len(buffer) - pos > max_row_bytes:
+					raise IngestFormatError(f"Row {index} exceeds {max_row_bytes} bytes")
+				break
+			end = max(end, pos + 1)
+			yield index, _loads(buffer[pos:end])
+			index += 1
+			pos = end
+	if not closed:
+		raise IngestFormatError(f"Unterminated JSON array after row {index}")
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], max_row_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+	first = b""
+	async for chunk in chunks:
+		first = chunk.lstrip()
+		if first:
+			break
+	if not first:
+		return
+
+	async def replay() -> AsyncIterator[bytes]:
+		yield first
+		async for chunk in chunks:
+			yield chunk
+
+	parser = iter_json_array if first.startswith(b"[") else iter_ndjson
+	async for row in parser(replay(), max_row_bytes):
+		yield row
+
+
+def _skip(buffer: str, pos: int, in_array: bool) -> int:
+	while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ",")):
+		pos += 1
+	return pos
+
+
+def _element_end(buffer: str, pos: int) -> int:
+	# Index of the "," or "]" ending the array element at pos, or -1 when the
+	# buffer stops first. Brackets inside strings are skipped.
+	depth = 0
+	while True:
+		match = _STRUCTURAL.search(buffer, pos)
+		if match is None:
+			return -1
+		char, pos = match.group(), match.start()
+		if char == '"':
+			string = _STRING.match(buffer, pos)
+			if string is None:
+				return -1
+			pos = string.end()
+			continue
+		if char in "[{":
+			depth += 1
+		elif depth == 0:
+			return pos
+		elif char != ",":
+			depth -= 1
+		pos += 1
+
+
+def _loads(line: bytes | str) -> Any:
+	try:
+		return json.loads(line)
+	except ValueError as exc:
+		return exc
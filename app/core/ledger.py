@@ -1,12 +1,173 @@
 import hashlib
+import hmac
 import json
-from typing import Any, Dict
+import zlib
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
 
+import orjson
 
-def compute_entry_hash(payload: Dict[str, Any], prev_hash: str | None) -> str:
+
+# Version 1 hashes json.dumps of {"prev_hash", "payload"}; version 2 hashes a
+# fixed prefix, the prev_hash and the canonical orjson encoding of the payload.
+HASH_VERSION = 2
+
+
+HASHED_FIELDS = (
+	"action_type",
+	"reference_key",
+	"target_type",
+	"target_id",
+	"target_label",
+	"context_tags",
+	"pre_state",
+	"post_state",
+	"local_timestamp",
+	"department_id",
+	"is_offline_capture",
+	"device_id",
+	"created_by_user_id",
+	"created_at",
+)
+
+
+def to_naive_utc(value: datetime | None) -> datetime | None:
+	if value is not None and value.tzinfo is not None:
+		value = value.astimezone(timezone.utc).replace(tzinfo=None)
+	return value
+
+
+def entry_payload(values: Mapping[str, Any], version: int = HASH_VERSION) -> Dict[str, Any]:
+	payload = {}
+	for field in HASHED_FIELDS:
+		value = values.get(field)
+		if isinstance(value, datetime):
+			value = to_naive_utc(value)
+			if version == 1:
+				value = value.isoformat()
+		payload[field] = value
+	return payload
+
+
+_CANONICAL_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+_V2_PREFIX = hashlib.sha256(b"ual-entry:v2\n")
+
+
+def _canonical_default(value: Any) -> Any:
+	if isinstance(value, datetime):
+		return to_naive_utc(value).isoformat(timespec="microseconds")
+	if isinstance(value, date):
+		return value.isoformat()
+	if isinstance(value, Decimal):
+		return format(value.normalize(), "f")
+	raise TypeError(f"Cannot canonically encode {type(value).__name__}")
+
+
+def canonical_encode(payload: Dict[str, Any]) -> bytes:
+	return orjson.dumps(payload, default=_canonical_default, option=_CANONICAL_OPTIONS)
+
+
+def _hash_v1(payload: Dict[str, Any], prev_hash: str | None) -> str:
 	data = {
 		"prev_hash": prev_hash or "",
 		"payload": payload,
 	}
 	encoded = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
-	return hashlib.sha256(encoded).hexdigest()
\ No newline at end of file
+	return hashlib.sha256(encoded).hexdigest()
+
+
+def _hash_v2(payload: Dict[str, Any], prev_hash: str | None) -> str:
+	digest = _V2_PREFIX.copy()
+	digest.update((prev_hash or "").encode("ascii"))
+	digest.update(b"\n")
+	digest.update(canonical_encode(payload))
+	return digest.hexdigest()
+
+
+_HASHERS = {1: _hash_v1, 2: _hash_v2}
+
+
+def compute_entry_hash(payload: Dict[str, Any], prev_hash: str | None, version: int = HASH_VERSION) -> str:
+	return _HASHERS[version](payload, prev_hash)
+
+
+def compute_chain_hashes(payloads: List[Dict[str, Any]], prev_hash: str | None, version: int = HASH_VERSION) -> List[str]:
+	hasher = _HASHERS[version]
+	hashes = []
+	for payload in payloads:
+		prev_hash = hasher(payload, prev_hash)
+		hashes.append(prev_hash)
+	return hashes
+
+
+def _leaf_hash(entry_hash: str) -> bytes:
+	return hashlib.sha256(b"\x00" + bytes.fromhex(entry_hash)).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+	return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _merkle_levels(entry_hashes: List[str]) -> List[List[bytes]]:
+	level = [_leaf_hash(entry_hash) for entry_hash in entry_hashes]
+	levels = [level]
+	while len(level) > 1:
+		# An unpaired node is promoted unchanged rather than duplicated.
+		level = [_node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+		levels.append(level)
+	return levels
+
+
+def merkle_root(entry_hashes: List[str]) -> str:
+	return _merkle_levels(entry_hashes)[-1][0].hex()
+
+
+def merkle_proof(entry_hashes: List[str], index: int) -> List[Dict[str, str]]:
+	proof = []
+	for level in _merkle_levels(entry_hashes)[:-1]:
+		sibling = index ^ 1
+		if sibling < len(level):
+			proof.append({"hash": level[sibling].hex(), "position": "left" if sibling < index else "right"})
+		index //= 2
+	return proof
+
+
+def verify_inclusion(entry_hash: str, proof: List[Dict[str, str]], root: str) -> bool:
+	node = _leaf_hash(entry_hash)
+	for step in proof:
+		sibling = bytes.fromhex(step["hash"])
+		node = _node_hash(sibling, node) if step["position"] == "left" else _node_hash(node, sibling)
+	return hmac.compare_digest(node.hex(), root)
+
+
+def sign_merkle_root(key: str, block_index: int, first_sequence: int, last_sequence: int, root: str, partition: int = 0) -> str:
+	# Partition 0 keeps the unprefixed message so roots signed before partitioning still verify.
+	prefix = f"p{partition}:" if partition else ""
+	message = f"{prefix}{block_index}:{first_sequence}:{last_sequence}:{root}".encode("utf-8")
+	return hmac.new(key.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def chain_partition(values: Mapping[str, Any], mode: str, partitions: int) -> int:
+	if mode == "department":
+		return values.get("department_id") or 0
+	if mode == "reference":
+		# crc32 rather than hash() so every process maps a key to the same chain.
+		return zlib.crc32((values.get("reference_key") or "").encode("utf-8")) % partitions
+	return 0
+
+
+def anchor_root(heads: Iterable[Tuple[int, int, str]]) -> str:
+	# heads are (partition, partition_sequence, entry_hash); leaves are ordered by partition.
+	leaves = [hashlib.sha256(f"{partition}:{sequence}:{entry_hash}".encode("utf-8")).hexdigest() for partition, sequence, entry_hash in sorted(heads)]
+	return merkle_root(leaves)
+
+
+def compute_anchor_hash(prev_anchor_hash: str | None, root: str, created_at: datetime) -> str:
+	hasher = hashlib.sha256(b"ual-anchor:v1\n")
+	hasher.update(f"{prev_anchor_hash or ''}\n{root}\n{created_at.isoformat(timespec='microseconds')}".encode("utf-8"))
+	return hasher.hexdigest()
+
+
+def sign_anchor(key: str, anchor_index: int, anchor_hash: str) -> str:
+	return hmac.new(key.encode("utf-8"), f"anchor:{anchor_index}:{anchor_hash}".encode("utf-8"), hashlib.sha256).hexdigest()
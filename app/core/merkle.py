@@ -0,0 +1,118 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.archive import archive
+from app.core.config import settings
+from app.core.ledger import merkle_proof, merkle_root, sign_merkle_root
+from app.models.action import Action
+from app.models.ledger import MerkleRoot
+
+
+def _signing_key() -> str:
+	return settings.merkle_signing_key or settings.secret_key
+
+
+def block_bounds(block_index: int, block_size: int) -> Tuple[int, int]:
+	return block_index * block_size + 1, (block_index + 1) * block_size
+
+
+async def _block_hashes(db: AsyncSession, partition: int, first_sequence: int, last_sequence: int) -> List[str]:
+	result = await db.execute(
+		select(Action.entry_hash)
+		.where(Action.chain_partition == partition, Action.partition_sequence.between(first_sequence, last_sequence))
+		.order_by(Action.partition_sequence)
+	)
+	return list(result.scalars())
+
+
+def seal_block(block_index: int, block_size: int, entry_hashes: List[str], partition: int = 0) -> Dict[str, Any]:
+	first_sequence, last_sequence = block_bounds(block_index, block_size)
+	root = merkle_root(entry_hashes)
+	return {
+		"chain_partition": partition,
+		"block_index": block_index,
+		"first_sequence": first_sequence,
+		"last_sequence": last_sequence,
+		"root": root,
+		"signature": sign_merkle_root(_signing_key(), block_index, first_sequence, last_sequence, root, partition),
+		"created_at": datetime.utcnow(),
+	}
+
+
+# Keeps the entry hashes of a partition's open block in memory; blocks are
+# aligned on partition_sequence so block k always covers k*size+1 .. (k+1)*size.
+class MerkleAccumulator:
+	def __init__(self, block_size: int, partition: int = 0):
+		self.block_size = block_size
+		self.partition = partition
+		self.leaves: List[str] = []
+
+	def plan(self, appended: List[Tuple[int, str]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+		# Returns the new open block and any sealed roots without mutating state,
+		# so a failed commit leaves the accumulator untouched.
+		leaves = list(self.leaves)
+		sealed = []
+		for sequence, entry_hash in appended:
+			leaves.append(entry_hash)
+			if sequence % self.block_size == 0:
+				sealed.append(seal_block(sequence // self.block_size - 1, self.block_size, leaves, self.partition))
+				leaves = []
+		return leaves, sealed
+
+	async def load(self, db: AsyncSession, head_sequence: int) -> None:
+		# Seal any complete blocks that predate the accumulator, then reload the open block.
+		sealed_through = (
+			await db.execute(select(func.max(MerkleRoot.block_index)).where(MerkleRoot.chain_partition == self.partition))
+		).scalar_one_or_none()
+		next_block = 0 if sealed_through is None else sealed_through + 1
+		complete_blocks = head_sequence // self.block_size
+		for block_index in range(next_block, complete_blocks):
+			hashes = await _block_hashes(db, self.partition, *block_bounds(block_index, self.block_size))
+			db.add(MerkleRoot(**seal_block(block_index, self.block_size, hashes, self.partition)))
+		if next_block < complete_blocks:
+			await db.commit()
+		self.leaves = await _block_hashes(db, self.partition, complete_blocks * self.block_size + 1, head_sequence)
+
+
+async def inclusion_proof(db: AsyncSession, action_id: int) -> Optional[Dict[str, Any]]:
+	action = (
+		await db.execute(select(Action.id, Action.sequence, Action.chain_partition, Action.partition_sequence, Action.entry_hash).where(Action.id == action_id))
+	).first()
+	if action is None:
+		archived = (await archive.rows_by_id(db, [action_id])).get(action_id)
+		if archived is None:
+			return None
+		action = SimpleNamespace(**archived)
+	block_size = settings.merkle_block_size
+	block_index = (action.partition_sequence - 1) // block_size
+	root = (
+		await db.execute(select(MerkleRoot).where(MerkleRoot.chain_partition == action.chain_partition, MerkleRoot.block_index == block_index))
+	).scalar_one_or_none()
+	proof = {
+		"action_id": action.id,
+		"sequence": action.sequence,
+		"chain_partition": action.chain_partition,
+		"partition_sequence": action.partition_sequence,
+		"entry_hash": action.entry_hash,
+		"block_index": block_index,
+		"sealed": root is not None,
+	}
+	if root is None:
+		return proof
+	# The archived prefix of a partition can end inside a block.
+	hashes = [row["entry_hash"] for row in await archive.partition_rows(db, action.chain_partition, root.first_sequence, root.last_sequence)]
+	hashes += await _block_hashes(db, action.chain_partition, root.first_sequence + len(hashes), root.last_sequence)
+	leaf_index = action.partition_sequence - root.first_sequence
+	proof.update(
+		leaf_index=leaf_index,
+		root=root.root,
+		signature=root.signature,
+		first_sequence=root.first_sequence,
+		last_sequence=root.last_sequence,
+		proof=merkle_proof(hashes, leaf_index),
+	)
+	return proof
@@ -0,0 +1,191 @@
+import math
+import re
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+
+# Minimal Prometheus text-format metrics. Values live in plain dicts keyed by
+# label tuples and are only formatted when /metrics is scraped, so recording
+# is a dict lookup and an add.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+	if not names:
+		return ""
+	return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		registry.register(self)
+
+	def header(self) -> List[str]:
+		return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], Dict[Labels, float]]] = None):
+		super().__init__(name, documentation, labelnames)
+		self._values: Dict[Labels, float] = {}
+		self._callback = callback
+
+	def inc(self, amount: float = 1.0, labels: Labels = ()) -> None:
+		self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def value(self, labels: Labels = ()) -> float:
+		return self._values.get(labels, 0.0)
+
+	def collect(self) -> List[str]:
+		values = self._callback() if self._callback is not None else self._values
+		return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values.items()]
+
+
+class Gauge(_Metric):
+	kind = "gauge"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], Dict[Labels, float]]] = None):
+		super().__init__(name, documentation, labelnames)
+		self._values: Dict[Labels, float] = {}
+		self._callback = callback
+
+	def set(self, value: float, labels: Labels = ()) -> None:
+		self._values[labels] = value
+
+	def inc(self, amount: float = 1.0, labels: Labels = ()) -> None:
+		self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def dec(self, amount: float = 1.0, labels: Labels = ()) -> None:
+		self._values[labels] = self._values.get(labels, 0.0) - amount
+
+	def collect(self) -> List[str]:
+		values = self._callback() if self._callback is not None else self._values
+		return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values.items()]
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+		super().__init__(name, documentation, labelnames)
+		self.buckets = tuple(buckets)
+		# labels -> [count per bucket (+Inf last), sum]
+		self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, labels: Labels = ()) -> None:
+		entry = self._values.get(labels)
+		if entry is None:
+			entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+		entry[0][bisect_left(self.buckets, value)] += 1
+		entry[1][0] += value
+
+	def count(self, labels: Labels = ()) -> int:
+		entry = self._values.get(labels)
+		return sum(entry[0]) if entry else 0
+
+	def collect(self) -> List[str]:
+		lines = []
+		names = self.labelnames + ("le",)
+		for labels, (counts, total) in self._values.items():
+			cumulative = 0
+			for bound, count in zip(self.buckets + (math.inf,), counts):
+				cumulative += count
+				lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+			lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total[0])}")
+			lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+		return lines
+
+
+class Registry:
+	def __init__(self):
+		self._metrics: List[_Metric] = []
+
+	def register(self, metric: _Metric) -> None:
+		self._metrics.append(metric)
+
+	def render(self) -> str:
+		lines: List[str] = []
+		for metric in self._metrics:
+			lines.extend(metric.header())
+			lines.extend(metric.collect())
+		return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = Counter("ual_http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("ual_http_request_duration_seconds", "HTTP request latency by method and route template", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("ual_http_requests_in_flight", "HTTP requests currently being served", ("method",))
+DB_STATEMENT_LATENCY = Histogram("ual_db_statement_duration_seconds", "SQL statement execution time by normalized statement", ("engine", "statement"))
+LEDGER_APPENDS = Counter("ual_ledger_appends_total", "Actions appended to the hash chain")
+LEDGER_APPEND_FAILURES = Counter("ual_ledger_append_failures_total", "Actions rejected by the append sequencer")
+LEDGER_APPENDS_BUSY = Counter("ual_ledger_appends_busy_total", "Appends refused because their chain writer queue was full")
+LEDGER_BATCHES = Histogram("ual_ledger_append_batch_size", "Actions per group commit", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+LEDGER_HASH_SECONDS = Histogram("ual_ledger_hash_seconds", "Time spent hashing each group commit")
+LEDGER_HEAD_LAG = Histogram("ual_ledger_chain_head_lag_seconds", "Time from append() until the entry is committed as the chain head")
+IDEMPOTENT_REPLAYS = Counter("ual_idempotency_replays_total", "Appends answered with an earlier action by where the key was found", ("source",))
+IDEMPOTENCY_LOOKUPS = Counter("ual_idempotency_lookups_total", "Keys looked up in the database after a Bloom filter hit", ("result",))
+
+
+_PLACEHOLDER_GROUP = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,?)+\)")
+_REPEATED_GROUPS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_normalized: Dict[str, str] = {}
+
+
+def normalize_sql(statement: str) -> str:
+	# Collapses literals, IN-lists and multi-row VALUES so the label set stays
+	# bounded; results are memoised because statements are few and repeat.
+	normalized = _normalized.get(statement)
+	if normalized is None:
+		normalized = _WHITESPACE.sub(" ", statement).strip()
+		normalized = _LITERAL.sub("?", normalized)
+		normalized = _PLACEHOLDER_GROUP.sub("(?)", normalized)
+		normalized = _REPEATED_GROUPS.sub(r"\1, ...", normalized)[: settings.metrics_sql_max_length]
+		if len(_normalized) < 4096:
+			_normalized[statement] = normalized
+	return normalized
+
+
+def instrument_engine(engine, name: str) -> None:
+	sync_engine = engine.sync_engine
+
+	@event.listens_for(sync_engine, "before_cursor_execute")
+	def _before(conn, cursor, statement, parameters, context, executemany):
+		conn.info.setdefault("ual_query_start", []).append(time.perf_counter())
+
+	@event.listens_for(sync_engine, "after_cursor_execute")
+	def _after(conn, cursor, statement, parameters, context, executemany):
+		started = conn.info["ual_query_start"].pop()
+		DB_STATEMENT_LATENCY.observe(time.perf_counter() - started, (name, normalize_sql(statement)))
+
+	@event.listens_for(sync_engine, "handle_error")
+	def _error(context):
+		starts = context.connection.info.get("ual_query_start") if context.connection is not None else None
+		if starts:
+			starts.pop()
@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.db.session import AsyncSessionLocal
+from app.models.blueprint import BlueprintStep, ProcessInstance, ProcessStepInstance
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("waiting", "breached")
+
+
+class _StepState:
+	__slots__ = ("id", "order_index", "expected_action_type", "sla_hours", "status", "due_at", "completed_action_id")
+
+	def __init__(self, step: ProcessStepInstance, blueprint_step: BlueprintStep):
+		self.id = step.id
+		self.order_index = blueprint_step.order_index
+		self.expected_action_type = blueprint_step.expected_action_type
+		self.sla_hours = blueprint_step.sla_hours
+		self.status = step.status
+		self.due_at = step.due_at
+		self.completed_action_id = step.completed_action_id
+
+
+class _ProcessState:
+	__slots__ = ("id", "reference_key", "status", "steps")
+
+	def __init__(self, process: ProcessInstance, steps: List[_StepState]):
+		self.id = process.id
+		self.reference_key = process.reference_key
+		self.status = process.status
+		self.steps = sorted(steps, key=lambda step: step.order_index)
+
+
+async def _load_active(db: AsyncSession, *criteria, lock: bool = False) -> List[_ProcessState]:
+	stmt = select(ProcessInstance).where(ProcessInstance.status == "active", *criteria).options(selectinload(ProcessInstance.steps)).order_by(ProcessInstance.id)
+	if lock:
+		stmt = stmt.with_for_update()
+	processes = list((await db.execute(stmt)).scalars())
+	if not processes:
+		return []
+	step_ids = {step.blueprint_step_id for process in processes for step in process.steps}
+	result = await db.execute(select(BlueprintStep).where(BlueprintStep.id.in_(step_ids)))
+	blueprint_steps = {step.id: step for step in result.scalars()}
+	return [_ProcessState(process, [_StepState(step, blueprint_steps[step.blueprint_step_id]) for step in process.steps]) for process in processes]
+
+
+# Step progress is decided inside the append transaction (advance), so a
+# completion commits with the action that caused it and every worker sees it.
+# In memory the engine keeps the active instances it knows of and a min-heap
+# of due_at deadlines that drives a timer flagging breaches as they happen;
+# breaches are written in the background and only apply to steps that are
+# still waiting with the same deadline.
+class ProcessEngine:
+	def __init__(self):
+		self._processes: Dict[int, _ProcessState] = {}
+		self._steps: Dict[int, Tuple[_ProcessState, _StepState]] = {}
+		self._deadlines: List[Tuple[datetime, int]] = []
+		self._wake: Optional[asyncio.Event] = None
+		self._writes: Optional[asyncio.Queue] = None
+		self._tasks: List[asyncio.Task] = []
+
+	async def start(self) -> None:
+		self._wake = asyncio.Event()
+		self._writes = asyncio.Queue()
+		await self.rebuild()
+		self._tasks = [asyncio.create_task(self._run_timer()), asyncio.create_task(self._run_writer())]
+
+	async def stop(self) -> None:
+		if not self._tasks:
+			return
+		timer, writer = self._tasks
+		timer.cancel()
+		self._writes.put_nowait(None)
+		await asyncio.gather(timer, writer, return_exceptions=True)
+		self._tasks = []
+
+	async def rebuild(self) -> None:
+		self._processes.clear()
+		self._steps.clear()
+		self._deadlines.clear()
+		async with AsyncSessionLocal() as db:
+			processes = await _load_active(db)
+		for process in processes:
+			self._track(process)
+
+	def track(self, process: ProcessInstance, blueprint_steps: Dict[int, BlueprintStep]) -> None:
+		self._track(_ProcessState(process, [_StepState(step, blueprint_steps[step.blueprint_step_id]) for step in process.steps]))
+
+	def _track(self, state: _ProcessState) -> None:
+		previous = self._processes.pop(state.id, None)
+		if previous is not None:
+			for step in previous.steps:
+				self._steps.pop(step.id, None)
+		if state.status != "active":
+			return
+		self._processes[state.id] = state
+		for step in state.steps:
+			self._steps[step.id] = (state, step)
+			if step.status == "waiting" and step.due_at is not None:
+				if not self._deadlines or step.due_at < self._deadlines[0][0]:
+					if self._wake is not None:
+						self._wake.set()
+				heapq.heappush(self._deadlines, (step.due_at, step.id))
+
+	async def advance(self, db: AsyncSession, actions: List[Dict[str, Any]]) -> List[_ProcessState]:
+		# Runs in the sequencer's append transaction with the rows just inserted
+		# (in sequence order, with ids): completes the open steps they match by
+		# (reference_key, expected_action_type) and opens the next ones. A step
+		# without an expected_action_type is completed by any action on the
+		# reference. The common case, no active process for the batch's
+		# references, is one indexed query.
+		keys = {row["reference_key"] for row in actions if row["reference_key"] is not None}
+		if not keys:
+			return []
+		result = await db.execute(
+			select(ProcessInstance.id).distinct()
+			.join(ProcessStepInstance, ProcessStepInstance.process_id == ProcessInstance.id)
+			.join(BlueprintStep, BlueprintStep.id == ProcessStepInstance.blueprint_step_id)
+			.where(
+				ProcessInstance.status == "active",
+				ProcessInstance.reference_key.in_(keys),
+				ProcessStepInstance.status.in_(OPEN_STATUSES),
+				or_(BlueprintStep.expected_action_type.in_({row["action_type"] for row in actions}), BlueprintStep.expected_action_type.is_(None)),
+			)
+		)
+		process_ids = list(result.scalars())
+		if not process_ids:
+			return []
+		processes = await _load_active(db, ProcessInstance.id.in_(process_ids), lock=True)
+		open_steps: Dict[Tuple[str, Optional[str]], Deque[Tuple[_ProcessState, _StepState]]] = defaultdict(deque)
+		for process in processes:
+			for step in process.steps:
+				if step.status in OPEN_STATUSES:
+					open_steps[(process.reference_key, step.expected_action_type)].append((process, step))
+		changed: Dict[int, _ProcessState] = {}
+		step_updates: List[Dict[str, Any]] = []
+		for action in actions:
+			queue = open_steps.get((action["reference_key"], action["action_type"])) or open_steps.get((action["reference_key"], None))
+			if not queue:
+				continue
+			process, step = queue.popleft()
+			changed[process.id] = process
+			step.status = "completed"
+			step.completed_action_id = action["id"]
+			step_updates.append({"id": step.id, "status": step.status, "completed_action_id": action["id"]})
+			next_step = next((candidate for candidate in process.steps if candidate.status == "pending"), None)
+			if next_step is None:
+				process.status = "completed"
+				continue
+			next_step.status = "waiting"
+			next_step.due_at = action["created_at"] + timedelta(hours=next_step.sla_hours) if next_step.sla_hours else None
+			step_updates.append({"id": next_step.id, "status": next_step.status, "due_at": next_step.due_at})
+			open_steps[(process.reference_key, next_step.expected_action_type)].append((process, next_step))
+		# Rows are applied in order so later changes to a step win.
+		for row in step_updates:
+			await db.execute(update(ProcessStepInstance).where(ProcessStepInstance.id == row["id"]).values(**{k: v for k, v in row.items() if k != "id"}))
+		completed = [{"id": process.id, "status": process.status} for process in changed.values() if process.status != "active"]
+		if completed:
+			await db.execute(update(ProcessInstance), completed)
+		return list(changed.values())
+
+	def applied(self, processes: List[_ProcessState]) -> None:
+		# Called once the append transaction that advanced them has committed.
+		for process in processes:
+			self._track(process)
+
+	def _breach_due(self, now: datetime) -> None:
+		while self._deadlines and self._deadlines[0][0] <= now:
+			due_at, step_id = heapq.heappop(self._deadlines)
+			entry = self._steps.get(step_id)
+			# Heap entries are never removed eagerly; skip ones that went stale.
+			if entry is None or entry[1].status != "waiting" or entry[1].due_at != due_at:
+				continue
+			entry[1].status = "breached"
+			self._writes.put_nowait((step_id, due_at))
+
+	async def _run_timer(self) -> None:
+		while True:
+			self._wake.clear()
+			timeout = None
+			if self._deadlines:
+				timeout = max((self._deadlines[0][0] - datetime.utcnow()).total_seconds(), 0)
+			try:
+				await asyncio.wait_for(self._wake.wait(), timeout)
+			except asyncio.TimeoutError:
+				pass
+			self._breach_due(datetime.utcnow())
+
+	async def _run_writer(self) -> None:
+		stopping = False
+		while not stopping:
+			item = await self._writes.get()
+			breaches: List[Tuple[int, datetime]] = []
+			while item is not None:
+				breaches.append(item)
+				try:
+					item = self._writes.get_nowait()
+				except asyncio.QueueEmpty:
+					break
+			stopping = item is None
+			if not breaches:
+				continue
+			try:
+				async with AsyncSessionLocal() as db:
+					# Another worker may have advanced the step since this one
+					# loaded it; only a step still waiting on that deadline breaches.
+					for step_id, due_at in breaches:
+						await db.execute(
+							update(ProcessStepInstance)
+							.where(ProcessStepInstance.id == step_id, ProcessStepInstance.status == "waiting", ProcessStepInstance.due_at == due_at)
+							.values(status="breached")
+						)
+					await db.commit()
+			except Exception:
+				logger.exception("Failed to persist process breaches")
+
+
+process_engine = ProcessEngine()
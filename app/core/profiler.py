@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from app.core.config import settings
+
+
+# Stack sampler for a single request: a daemon thread snapshots the event
+# loop thread's frames every interval and counts them as folded stacks
+# ("outer;inner;leaf count"), ready for flamegraph.pl or speedscope. The
+# loop is shared, so concurrent requests show up in the samples too.
+class SamplingProfiler:
+	def __init__(self, interval: float):
+		self.id = uuid.uuid4().hex
+		self.interval = interval
+		self.samples: Counter = Counter()
+		self._target = threading.get_ident()
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id[:8]}", daemon=True)
+
+	def start(self) -> "SamplingProfiler":
+		self._thread.start()
+		return self
+
+	def stop(self) -> None:
+		self._stop.set()
+		self._thread.join()
+
+	def _run(self) -> None:
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self._target)
+			stack = []
+			while frame is not None:
+				code = frame.f_code
+				stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+				frame = frame.f_back
+			if stack:
+				self.samples[";".join(reversed(stack))] += 1
+
+	def write(self, label: str) -> str:
+		os.makedirs(settings.profiling_dir, exist_ok=True)
+		path = os.path.join(settings.profiling_dir, f"{int(time.time())}-{self.id}.folded")
+		with open(path, "w", encoding="utf-8") as handle:
+			handle.write(f"# {label} interval={self.interval * 1000:g}ms samples={sum(self.samples.values())}\n")
+			for stack, count in self.samples.most_common():
+				handle.write(f"{stack} {count}\n")
+		return path
+
+
+def requested_profiler(headers: list) -> Optional[SamplingProfiler]:
+	# Only consulted when PROFILING_ENABLED; PROFILING_TOKEN, if set, must be the header value.
+	wanted = settings.profiling_header.lower().encode("latin-1")
+	for name, value in headers:
+		if name == wanted:
+			if settings.profiling_token is not None and value.decode("latin-1") != settings.profiling_token:
+				return None
+			return SamplingProfiler(settings.profiling_interval_ms / 1000)
+	return None
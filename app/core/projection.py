@@ -0,0 +1,40 @@
+from collections import namedtuple
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import orjson
+from fastapi import Response
+from sqlalchemy import Select, select
+
+from app.models.action import Action
+from app.schemas.action import ActionRead
+
+
+# Column projection of ActionRead: rows are selected as plain tuples and
+# encoded straight to JSON, skipping ORM identity-map bookkeeping and
+# pydantic validation. Field order matches ActionRead, so the bytes are the
+# same as ActionRead.model_dump_json() for values read back from the database.
+ACTION_READ_FIELDS = tuple(ActionRead.model_fields)
+ACTION_READ_COLUMNS = tuple(getattr(Action, field) for field in ACTION_READ_FIELDS)
+
+# Rows read back from archive segments take the same shape as selected rows.
+ActionRow = namedtuple("ActionRow", ACTION_READ_FIELDS)
+
+
+def select_action_rows() -> Select:
+	return select(*ACTION_READ_COLUMNS)
+
+
+def project_action_row(row: Dict[str, Any]) -> ActionRow:
+	return ActionRow(*(row[field] for field in ACTION_READ_FIELDS))
+
+
+def encode_action_rows(rows: Iterable[Sequence]) -> bytes:
+	return orjson.dumps([dict(zip(ACTION_READ_FIELDS, row)) for row in rows])
+
+
+def encode_action_lines(rows: Iterable[Sequence]) -> bytes:
+	return b"".join(orjson.dumps(dict(zip(ACTION_READ_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def action_rows_response(rows: Iterable[Sequence], headers: Optional[dict] = None) -> Response:
+	return Response(content=encode_action_rows(rows), media_type="application/json", headers=headers)
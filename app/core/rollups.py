@@ -0,0 +1,86 @@
+import asyncio
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.archive import archive
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+from app.models.stats import ActionRollup
+
+
+RollupKey = Tuple[date, int, str, bool]
+
+
+def rollup_key(created_at: datetime, department_id: Optional[int], action_type: str, voided: bool) -> RollupKey:
+	return created_at.date(), department_id or 0, action_type, voided
+
+
+async def apply_rollup_deltas(db: AsyncSession, deltas: Dict[RollupKey, int]) -> None:
+	# Upserts counter deltas inside the caller's transaction.
+	rows = [
+		{"day": day, "department_id": department_id, "action_type": action_type, "voided": voided, "count": delta}
+		for (day, department_id, action_type, voided), delta in deltas.items()
+		if delta
+	]
+	if not rows:
+		return
+	dialect = db.bind.dialect.name
+	if dialect == "postgresql":
+		stmt = postgresql.insert(ActionRollup)
+	elif dialect == "sqlite":
+		stmt = sqlite.insert(ActionRollup)
+	else:
+		await _apply_portable(db, rows)
+		return
+	stmt = stmt.on_conflict_do_update(
+		index_elements=["day", "department_id", "action_type", "voided"],
+		set_={"count": ActionRollup.count + stmt.excluded.count},
+	)
+	await db.execute(stmt, rows)
+
+
+async def _apply_portable(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+	# Update-then-insert for dialects without ON CONFLICT; a row inserted
+	# concurrently fails only the savepoint, and the update is retried.
+	for row in rows:
+		key = (
+			ActionRollup.day == row["day"],
+			ActionRollup.department_id == row["department_id"],
+			ActionRollup.action_type == row["action_type"],
+			ActionRollup.voided == row["voided"],
+		)
+		increment = update(ActionRollup).where(*key).values(count=ActionRollup.count + row["count"])
+		if (await db.execute(increment)).rowcount:
+			continue
+		try:
+			async with db.begin_nested():
+				await db.execute(insert(ActionRollup), [row])
+		except IntegrityError:
+			await db.execute(increment)
+
+
+async def rebuild_rollups() -> int:
+	# Run with writers paused; the rollups are recomputed from the ledger in one transaction.
+	day = func.date(Action.created_at)
+	department = func.coalesce(Action.department_id, 0)
+	source = select(day, department, Action.action_type, Action.voided, func.count()).group_by(day, department, Action.action_type, Action.voided)
+	async with AsyncSessionLocal() as db:
+		await db.execute(delete(ActionRollup))
+		await db.execute(
+			insert(ActionRollup).from_select(["day", "department_id", "action_type", "voided", "count"], source)
+		)
+		async for rows in archive.iter_rows(db):
+			await apply_rollup_deltas(db, Counter(rollup_key(row["created_at"], row["department_id"], row["action_type"], row["voided"]) for row in rows))
+		total = (await db.execute(select(func.count()).select_from(ActionRollup))).scalar_one()
+		await db.commit()
+	return total
+
+
+if __name__ == "__main__":
+	print(f"Rebuilt {asyncio.run(rebuild_rollups())} rollup rows")
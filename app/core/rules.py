@@ -0,0 +1,190 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+from app.models.rule import EscalationEvent, Rule
+
+
+class CompiledRule(NamedTuple):
+	id: int
+	name: str
+	action_type: Optional[str]
+	reference_prefix: Optional[str]
+	department_id: Optional[int]
+	threshold: timedelta
+	channel: str
+	sent_to: Optional[str]
+
+
+class _PrefixTrie:
+	__slots__ = ("rules", "children")
+
+	def __init__(self):
+		self.rules: List[CompiledRule] = []
+		self.children: Dict[str, "_PrefixTrie"] = {}
+
+	def insert(self, prefix: str, rule: CompiledRule) -> None:
+		node = self
+		for char in prefix:
+			node = node.children.setdefault(char, _PrefixTrie())
+		node.rules.append(rule)
+
+	def match(self, key: str) -> Iterator[CompiledRule]:
+		node = self
+		yield from node.rules
+		for char in key:
+			node = node.children.get(char)
+			if node is None:
+				return
+			yield from node.rules
+
+
+# Immutable snapshot of the active rules. Rules are bucketed by
+# (action_type, department_id), with None acting as a wildcard, and each
+# bucket holds a prefix trie over reference_prefix.
+class CompiledRules:
+	def __init__(self, rules: List[CompiledRule]):
+		self.count = len(rules)
+		self.min_threshold = min((rule.threshold for rule in rules), default=None)
+		self._index: Dict[Tuple[Optional[str], Optional[int]], _PrefixTrie] = {}
+		for rule in rules:
+			trie = self._index.setdefault((rule.action_type, rule.department_id), _PrefixTrie())
+			trie.insert(rule.reference_prefix or "", rule)
+
+	def match(self, action_type: Optional[str], department_id: Optional[int], reference_key: Optional[str]) -> List[CompiledRule]:
+		matched = []
+		for key in {(action_type, department_id), (action_type, None), (None, department_id), (None, None)}:
+			trie = self._index.get(key)
+			if trie is None:
+				continue
+			if reference_key is None:
+				matched.extend(trie.rules)
+			else:
+				matched.extend(trie.match(reference_key))
+		return matched
+
+
+def _compile(rule: Rule) -> CompiledRule:
+	sent_to = str(rule.notify_user_id) if rule.notify_user_id is not None else rule.notify_role
+	return CompiledRule(
+		id=rule.id,
+		name=rule.name,
+		action_type=rule.action_type,
+		reference_prefix=rule.reference_prefix,
+		department_id=rule.department_id,
+		threshold=timedelta(hours=rule.threshold_hours),
+		channel=rule.channel,
+		sent_to=sent_to,
+	)
+
+
+class RuleEngine:
+	def __init__(self):
+		self.rules = CompiledRules([])
+		self.loaded_at: Optional[float] = None
+		self._lock = asyncio.Lock()
+
+	async def reload(self) -> CompiledRules:
+		async with self._lock:
+			async with AsyncSessionLocal() as db:
+				result = await db.execute(select(Rule).where(Rule.active.is_(True)))
+				compiled = CompiledRules([_compile(rule) for rule in result.scalars()])
+			self.rules = compiled
+			self.loaded_at = time.monotonic()
+		return compiled
+
+	async def current(self) -> CompiledRules:
+		if self.loaded_at is None or time.monotonic() - self.loaded_at > settings.rule_reload_seconds:
+			return await self.reload()
+		return self.rules
+
+	def match(self, action_type: Optional[str], department_id: Optional[int], reference_key: Optional[str]) -> List[CompiledRule]:
+		return self.rules.match(action_type, department_id, reference_key)
+
+
+rule_engine = RuleEngine()
+
+
+async def _write_escalations(pending: List[Tuple[CompiledRule, Any]], now: datetime) -> int:
+	# The (rule_id, action_id) unique constraint makes concurrent schedulers
+	# in other workers skip pairs already escalated.
+	events = [
+		{
+			"rule_id": rule.id,
+			"reference_key": action.reference_key,
+			"action_id": action.id,
+			"message": f"{rule.name}: no activity on {action.reference_key} since {action.created_at.isoformat()}",
+			"channel": rule.channel,
+			"sent_to": rule.sent_to,
+			"created_at": now,
+		}
+		for rule, action in pending
+	]
+	async with AsyncSessionLocal() as db:
+		dialect = db.bind.dialect.name
+		if dialect == "postgresql":
+			stmt = postgresql.insert(EscalationEvent).on_conflict_do_nothing(index_elements=["rule_id", "action_id"])
+		elif dialect == "sqlite":
+			stmt = sqlite.insert(EscalationEvent).on_conflict_do_nothing(index_elements=["rule_id", "action_id"])
+		else:
+			existing = await db.execute(
+				select(EscalationEvent.rule_id, EscalationEvent.action_id).where(
+					tuple_(EscalationEvent.rule_id, EscalationEvent.action_id).in_([(event["rule_id"], event["action_id"]) for event in events])
+				)
+			)
+			seen = set(existing.tuples())
+			events = [event for event in events if (event["rule_id"], event["action_id"]) not in seen]
+			stmt = insert(EscalationEvent)
+		if not events:
+			return 0
+		result = await db.execute(stmt.returning(EscalationEvent.id), events)
+		written = len(result.all())
+		await db.commit()
+	return written
+
+
+async def run_escalations(now: Optional[datetime] = None) -> int:
+	# A reference is overdue for a rule when its latest non-voided action
+	# matches the rule and is older than the rule's threshold. Each
+	# (rule, action) pair escalates once.
+	now = now or datetime.utcnow()
+	rules = await rule_engine.current()
+	if rules.min_threshold is None:
+		return 0
+	latest = (
+		select(func.max(Action.sequence).label("sequence"))
+		.where(Action.voided.is_(False), Action.reference_key.is_not(None))
+		.group_by(Action.reference_key)
+		.subquery()
+	)
+	stmt = (
+		select(Action.id, Action.reference_key, Action.action_type, Action.department_id, Action.created_at)
+		.join(latest, Action.sequence == latest.c.sequence)
+		.where(Action.created_at < now - rules.min_threshold)
+		.execution_options(yield_per=settings.escalation_batch_size)
+	)
+	# Candidates are streamed and each batch is written as soon as it fills,
+	# in its own short transaction, so neither memory nor the write lock grows
+	# with the backlog.
+	written = 0
+	pending: List[Tuple[CompiledRule, Any]] = []
+	async with AsyncSessionLocal() as db:
+		result = await db.stream(stmt)
+		async for partition in result.partitions():
+			for action in partition:
+				for rule in rules.match(action.action_type, action.department_id, action.reference_key):
+					if action.created_at < now - rule.threshold:
+						pending.append((rule, action))
+			if len(pending) >= settings.escalation_batch_size:
+				written += await _write_escalations(pending, now)
+				pending = []
+	if pending:
+		written += await _write_escalations(pending, now)
+	return written
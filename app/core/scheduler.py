@@ -0,0 +1,17 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.core.anchors import create_anchor
+from app.core.archive import archive_cold_segments
+from app.core.config import settings
+from app.core.rules import run_escalations
+from app.core.snapshots import snapshotter
+
+
+scheduler = AsyncIOScheduler(timezone=settings.scheduler_timezone)
+scheduler.add_job(run_escalations, "interval", seconds=settings.escalation_interval_seconds, id="escalations", max_instances=1, coalesce=True)
+if settings.chain_anchor_interval_seconds > 0:
+	scheduler.add_job(create_anchor, "interval", seconds=settings.chain_anchor_interval_seconds, id="chain_anchor", max_instances=1, coalesce=True)
+if settings.archive_enabled and settings.archive_interval_seconds > 0:
+	scheduler.add_job(archive_cold_segments, "interval", seconds=settings.archive_interval_seconds, id="archive", max_instances=1, coalesce=True)
+if settings.state_snapshot_interval_seconds > 0:
+	scheduler.add_job(snapshotter.run, "interval", seconds=settings.state_snapshot_interval_seconds, id="state_snapshots", max_instances=1, coalesce=True)
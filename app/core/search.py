@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.archive import archive
+from app.db.session import AsyncSessionLocal, engine
+from app.models.action import Action
+
+
+_SQLITE_SCHEMA = [
+	"CREATE VIRTUAL TABLE IF NOT EXISTS action_search USING fts5(label, tags, state, voided UNINDEXED, tokenize='unicode61')",
+]
+_POSTGRES_SCHEMA = [
+	"CREATE TABLE IF NOT EXISTS action_search (action_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL, voided BOOLEAN NOT NULL DEFAULT FALSE)",
+	"CREATE INDEX IF NOT EXISTS ix_action_search_document ON action_search USING GIN (document)",
+]
+_TERM = re.compile(r"\w+\*?", re.UNICODE)
+# FTS5 operator keywords; typed as words they would only be matched literally,
+# so they are dropped and every remaining term is required on both dialects.
+_OPERATORS = frozenset({"AND", "OR", "NOT", "NEAR"})
+
+
+def _flatten(value: Any) -> Iterator[str]:
+	# JSON state becomes "key value" tokens so both field names and values match.
+	if isinstance(value, dict):
+		for key, item in value.items():
+			yield str(key)
+			yield from _flatten(item)
+	elif isinstance(value, (list, tuple)):
+		for item in value:
+			yield from _flatten(item)
+	elif value is not None and not isinstance(value, bool):
+		yield str(value)
+
+
+def search_document(values: Dict[str, Any]) -> Dict[str, str]:
+	return {
+		"label": values.get("target_label") or "",
+		"tags": " ".join(_flatten(values.get("context_tags"))),
+		"state": " ".join(_flatten([values.get("pre_state"), values.get("post_state")])),
+	}
+
+
+async def ensure_search_schema(conn: AsyncConnection) -> None:
+	statements = _POSTGRES_SCHEMA if conn.dialect.name == "postgresql" else _SQLITE_SCHEMA
+	for statement in statements:
+		await conn.execute(text(statement))
+
+
+async def index_actions(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+	# rows carry the action "id" plus the source columns; runs in the caller's transaction.
+	if not rows:
+		return
+	params = []
+	for row in rows:
+		document = search_document(row)
+		params.append({"id": row["id"], "voided": bool(row.get("voided")), **document})
+	if db.bind.dialect.name == "postgresql":
+		await db.execute(
+			text(
+				"INSERT INTO action_search (action_id, document, voided) VALUES "
+				"(:id, setweight(to_tsvector('simple', :label), 'A') || setweight(to_tsvector('simple', :tags), 'B') || to_tsvector('simple', :state), :voided) "
+				"ON CONFLICT (action_id) DO NOTHING"
+			),
+			params,
+		)
+	else:
+		await db.execute(
+			text("INSERT INTO action_search (rowid, label, tags, state, voided) VALUES (:id, :label, :tags, :state, :voided)"),
+			params,
+		)
+
+
+async def mark_voided(db: AsyncSession, action_id: int) -> None:
+	if db.bind.dialect.name == "postgresql":
+		await db.execute(text("UPDATE action_search SET voided = TRUE WHERE action_id = :id"), {"id": action_id})
+	else:
+		await db.execute(text("UPDATE action_search SET voided = 1 WHERE rowid = :id"), {"id": action_id})
+
+
+def encode_cursor(rank: float, action_id: int) -> str:
+	return base64.urlsafe_b64encode(f"{rank!r}|{action_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+	rank, action_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+	return float(rank), int(action_id)
+
+
+def _fts_query(query: str) -> Optional[str]:
+	terms = [term for term in _TERM.findall(query) if term not in _OPERATORS]
+	if not terms:
+		return None
+	return " ".join(f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms)
+
+
+async def search_action_ids(db: AsyncSession, query: str, limit: int, cursor: Optional[str] = None, include_voided: bool = False) -> List[Tuple[int, float]]:
+	# Returns (action_id, rank) ordered best match first; lower rank is better.
+	after = decode_cursor(cursor) if cursor else None
+	params: Dict[str, Any] = {"limit": limit}
+	if db.bind.dialect.name == "postgresql":
+		params["query"] = " ".join(word for word in query.split() if word not in _OPERATORS)
+		sql = (
+			"SELECT action_id, rank FROM (SELECT action_id, -ts_rank(document, plainto_tsquery('simple', :query)) AS rank FROM action_search "
+			"WHERE document @@ plainto_tsquery('simple', :query)" + ("" if include_voided else " AND NOT voided") + ") ranked"
+		)
+	else:
+		fts_query = _fts_query(query)
+		if fts_query is None:
+			return []
+		params["query"] = fts_query
+		sql = (
+			"SELECT action_id, rank FROM (SELECT rowid AS action_id, bm25(action_search, 10.0, 5.0, 1.0) AS rank FROM action_search "
+			"WHERE action_search MATCH :query" + ("" if include_voided else " AND voided = 0") + ") ranked"
+		)
+	if after is not None:
+		sql += " WHERE rank > :after_rank OR (rank = :after_rank AND action_id > :after_id)"
+		params.update(after_rank=after[0], after_id=after[1])
+	sql += " ORDER BY rank, action_id LIMIT :limit"
+	result = await db.execute(text(sql), params)
+	return [(row[0], row[1]) for row in result]
+
+
+async def rebuild_search_index(batch_size: int = 5000) -> int:
+	async with engine.begin() as conn:
+		await ensure_search_schema(conn)
+		await conn.execute(text("DELETE FROM action_search"))
+	indexed = 0
+	columns = [Action.id, Action.target_label, Action.context_tags, Action.pre_state, Action.post_state, Action.voided]
+	async with AsyncSessionLocal() as db:
+		last_id = 0
+		while True:
+			result = await db.execute(select(*columns).where(Action.id > last_id).order_by(Action.id).limit(batch_size))
+			rows = [dict(row) for row in result.mappings()]
+			if not rows:
+				break
+			await index_actions(db, rows)
+			await db.commit()
+			indexed += len(rows)
+			last_id = rows[-1]["id"]
+		async for rows in archive.iter_rows(db):
+			await index_actions(db, rows)
+			await db.commit()
+			indexed += len(rows)
+	return indexed
+
+
+if __name__ == "__main__":
+	print(f"Indexed {asyncio.run(rebuild_search_index())} actions")
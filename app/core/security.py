@@ -1,16 +1,29 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from jose import jwt
 from passlib.context import CryptContext
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 
 from .config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.user import RevokedToken
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
 
 
+class PasswordHasherBusy(Exception):
+	pass
+
+
 def hash_password(password: str) -> str:
 	return pwd_context.hash(password)
 
@@ -19,10 +32,110 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 	return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop.
+# Work beyond max_pending is rejected instead of queueing without bound.
+class PasswordHasher:
+	def __init__(self, workers: int, max_pending: int):
+		self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+		self._max_pending = max_pending
+		self._pending = 0
+
+	async def _run(self, func, *args):
+		if self._pending >= self._max_pending:
+			raise PasswordHasherBusy()
+		self._pending += 1
+		try:
+			return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+		finally:
+			self._pending -= 1
+
+	async def hash(self, password: str) -> str:
+		return await self._run(hash_password, password)
+
+	async def verify(self, plain_password: str, hashed_password: str) -> bool:
+		return await self._run(verify_password, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
+
+
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
 	if expires_delta is None:
 		expires_delta = timedelta(minutes=settings.access_token_expire_minutes)
 	expire = datetime.now(tz=timezone.utc) + expires_delta
-	to_encode = {"sub": subject, "exp": expire}
+	to_encode = {"sub": subject, "exp": expire, "jti": uuid.uuid4().hex}
 	encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
-	return encoded_jwt
\ No newline at end of file
+	return encoded_jwt
+
+
+# Validated tokens, keyed by the raw token. Entries expire at the earlier of
+# the token's exp and the cache TTL.
+class TokenCache:
+	def __init__(self, maxsize: int, ttl_seconds: int):
+		self.maxsize = maxsize
+		self.ttl_seconds = ttl_seconds
+		self._entries: "OrderedDict[str, Tuple[str, Optional[str], float]]" = OrderedDict()
+
+	def get(self, token: str) -> Optional[Tuple[str, Optional[str]]]:
+		entry = self._entries.get(token)
+		if entry is None:
+			return None
+		subject, jti, expires_at = entry
+		if expires_at <= time.time():
+			del self._entries[token]
+			return None
+		self._entries.move_to_end(token)
+		return subject, jti
+
+	def put(self, token: str, subject: str, jti: Optional[str], exp: Optional[float]) -> None:
+		expires_at = time.time() + self.ttl_seconds
+		if exp is not None:
+			expires_at = min(expires_at, exp)
+		self._entries[token] = (subject, jti, expires_at)
+		self._entries.move_to_end(token)
+		while len(self._entries) > self.maxsize:
+			self._entries.popitem(last=False)
+
+
+# Opt-in deny list of token ids, kept only until the token would expire anyway.
+# revoked_tokens is shared by every worker and checked whenever a token misses
+# the TokenCache; ids seen revoked are also remembered here, so cached tokens
+# are refused at once in the revoking process and within the cache TTL elsewhere.
+class RevocationList:
+	def __init__(self):
+		self._revoked: Dict[str, float] = {}
+
+	def _remember(self, jti: str, exp: float) -> None:
+		self._revoked[jti] = exp
+		if len(self._revoked) % 1024 == 0:
+			now = time.time()
+			self._revoked = {key: value for key, value in self._revoked.items() if value > now}
+
+	async def revoke(self, jti: str, exp: float) -> None:
+		self._remember(jti, exp)
+		async with AsyncSessionLocal() as db:
+			await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+			db.add(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(exp, tz=timezone.utc).replace(tzinfo=None)))
+			try:
+				await db.commit()
+			except IntegrityError:
+				# Already revoked.
+				await db.rollback()
+
+	def is_revoked(self, jti: Optional[str]) -> bool:
+		return jti is not None and jti in self._revoked
+
+	async def check(self, jti: Optional[str], exp: float) -> bool:
+		if jti is None:
+			return False
+		if jti in self._revoked:
+			return True
+		async with AsyncSessionLocal() as db:
+			revoked = (await db.execute(select(RevokedToken.jti).where(RevokedToken.jti == jti))).scalar_one_or_none() is not None
+		if revoked:
+			self._remember(jti, exp)
+		return revoked
+
+
+token_cache = TokenCache(settings.token_cache_size, settings.token_cache_ttl_seconds)
+revocation_list = RevocationList()
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core import metrics
+from app.core.batching import drain_batches
+from app.core.config import settings
+from app.core.idempotency import idempotency, idempotency_key
+from app.core.ledger import HASH_VERSION, chain_partition, compute_chain_hashes, entry_payload, to_naive_utc
+from app.core.merkle import MerkleAccumulator
+from app.core.process import process_engine
+from app.core.rollups import apply_rollup_deltas, rollup_key
+from app.core.search import index_actions
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action, IdempotencyKey
+from app.models.ledger import MerkleRoot
+from app.schemas.action import ActionRead
+
+
+logger = logging.getLogger(__name__)
+
+_Pending = Tuple[Dict[str, Any], asyncio.Future, float]
+
+
+class SequencerBusy(Exception):
+	pass
+
+
+# Single writer for one chain partition: appends are queued, linked against
+# the partition's in-memory head in arrival order and written in size/time
+# bounded group commits. Partitions run as independent tasks, so unrelated
+# chains never wait on each other's head.
+class ChainWriter:
+	def __init__(self, owner: "AppendSequencer", partition: int):
+		self.owner = owner
+		self.partition = partition
+		self.head_hash: Optional[str] = None
+		self.head_sequence: int = 0
+		self._head_loaded = False
+		self.merkle = MerkleAccumulator(settings.merkle_block_size, partition)
+		self.queue: asyncio.Queue = asyncio.Queue(owner.max_queue)
+		self._task = asyncio.create_task(drain_batches(self.queue, self.owner.max_batch, self.owner.max_wait, self._flush))
+
+	async def stop(self) -> None:
+		await self.queue.put(None)
+		await self._task
+
+	async def _load_head(self) -> None:
+		async with AsyncSessionLocal() as db:
+			result = await db.execute(
+				select(Action.partition_sequence, Action.entry_hash)
+				.where(Action.chain_partition == self.partition)
+				.order_by(desc(Action.partition_sequence))
+				.limit(1)
+			)
+			row = result.first()
+			self.head_sequence, self.head_hash = (row[0], row[1]) if row else (0, None)
+			await self.merkle.load(db, self.head_sequence)
+		self._head_loaded = True
+
+	async def _flush(self, batch: List[_Pending]) -> None:
+		try:
+			await self._write(batch)
+			return
+		except Exception as exc:
+			self._head_loaded = False
+			if len(batch) == 1:
+				await self._fail_or_replay(batch[0], exc)
+				return
+		# Retry one by one against a fresh head so a single bad row does not
+		# fail the rest of the group.
+		for pending in batch:
+			try:
+				await self._write([pending])
+			except Exception as exc:
+				self._head_loaded = False
+				await self._fail_or_replay(pending, exc)
+
+	async def _write(self, batch: List[_Pending]) -> None:
+		if not self._head_loaded:
+			await self._load_head()
+		# The global sequence and created_at are taken and committed under one
+		# lock across partitions, so sequence order is commit order and readers
+		# resuming after a sequence (follow, export, timeline cursors) never
+		# find a lower one committed later.
+		async with self.owner._commit_lock:
+			await self.owner._load_sequence()
+			sequence = self.owner._allocate(len(batch))
+			prev_hash, partition_sequence = self.head_hash, self.head_sequence
+			rows = []
+			keys = []
+			for values, _, _ in batch:
+				partition_sequence += 1
+				row = dict(values)
+				keys.append(row.pop("idempotency_key", None))
+				row["local_timestamp"] = to_naive_utc(row.get("local_timestamp"))
+				row["created_at"] = datetime.utcnow()
+				row["sequence"] = sequence
+				row["chain_partition"] = self.partition
+				row["partition_sequence"] = partition_sequence
+				row["hash_version"] = HASH_VERSION
+				rows.append(row)
+				sequence += 1
+			try:
+				hash_started = time.perf_counter()
+				hashes = compute_chain_hashes([entry_payload(row) for row in rows], prev_hash)
+				metrics.LEDGER_HASH_SECONDS.observe(time.perf_counter() - hash_started)
+				for row, entry_hash in zip(rows, hashes):
+					row["prev_hash"], row["entry_hash"] = prev_hash, entry_hash
+					prev_hash = entry_hash
+				leaves, sealed = self.merkle.plan([(row["partition_sequence"], row["entry_hash"]) for row in rows])
+				async with AsyncSessionLocal() as db:
+					result = await db.execute(insert(Action).returning(Action.id, sort_by_parameter_order=True), rows)
+					ids = list(result.scalars())
+					keyed = [{"key": key, "action_id": action_id} for key, action_id in zip(keys, ids) if key is not None]
+					if keyed:
+						await db.execute(insert(IdempotencyKey), keyed)
+					inserted = [{**row, "id": action_id} for row, action_id in zip(rows, ids)]
+					await index_actions(db, inserted)
+					advanced = await process_engine.advance(db, inserted)
+					if sealed:
+						await db.execute(insert(MerkleRoot), sealed)
+					await apply_rollup_deltas(db, Counter(rollup_key(row["created_at"], row["department_id"], row["action_type"], False) for row in rows))
+					await db.commit()
+			except Exception:
+				self.owner._release()
+				raise
+			self.head_hash, self.head_sequence = prev_hash, partition_sequence
+			self.merkle.leaves = leaves
+			process_engine.applied(advanced)
+			actions = [ActionRead(id=action_id, voided=False, **row) for row, action_id in zip(rows, ids)]
+			# Listeners see batches in sequence order too.
+			for listener in self.owner._listeners:
+				try:
+					listener(actions)
+				except Exception:
+					logger.exception("Append listener %r failed", listener)
+		committed_at = time.perf_counter()
+		metrics.LEDGER_APPENDS.inc(len(rows))
+		metrics.LEDGER_BATCHES.observe(len(rows))
+		for _, _, enqueued_at in batch:
+			metrics.LEDGER_HEAD_LAG.observe(committed_at - enqueued_at)
+		idempotency.remember((key, action) for key, action in zip(keys, actions) if key is not None)
+		for (_, future, _), action in zip(batch, actions):
+			if not future.done():
+				future.set_result(action)
+
+	async def _fail_or_replay(self, pending: _Pending, exc: Exception) -> None:
+		# A key taken by another process since it was checked: answer with the
+		# action that won instead of failing the retry.
+		key = pending[0].get("idempotency_key")
+		if key is not None and isinstance(exc, IntegrityError):
+			try:
+				existing = (await idempotency.fetch([key])).get(key)
+			except Exception:
+				logger.exception("Idempotency lookup for %s failed", key)
+				existing = None
+			if existing is not None:
+				metrics.IDEMPOTENT_REPLAYS.inc(labels=("conflict",))
+				if not pending[1].done():
+					pending[1].set_result(existing)
+				return
+		self._fail([pending], exc)
+
+	@staticmethod
+	def _fail(batch: List[_Pending], exc: Exception) -> None:
+		metrics.LEDGER_APPEND_FAILURES.inc(len(batch))
+		for _, future, _ in batch:
+			if not future.done():
+				future.set_exception(exc)
+
+
+# Routes appends to per-partition chain writers (CHAIN_PARTITIONING) and hands
+# out the global sequence, which orders actions across partitions.
+class AppendSequencer:
+	def __init__(self, max_batch: int, max_wait_ms: float, partitioning: str = "none", partitions: int = 1, max_queue: int = 0):
+		self.max_batch = max_batch
+		self.max_wait = max_wait_ms / 1000
+		self.max_queue = max_queue
+		self.partitioning = partitioning
+		self.partitions = partitions
+		self._writers: Dict[int, ChainWriter] = {}
+		self._listeners: List[Callable[[List[ActionRead]], None]] = []
+		self._inflight: Dict[str, asyncio.Future] = {}
+		self._next_sequence: Optional[int] = None
+		self._commit_lock: Optional[asyncio.Lock] = None
+		self._running = False
+
+	@property
+	def running(self) -> bool:
+		return self._running
+
+	@property
+	def pending(self) -> int:
+		return sum(writer.queue.qsize() for writer in self._writers.values())
+
+	def heads(self) -> Dict[int, int]:
+		return {partition: writer.head_sequence for partition, writer in self._writers.items()}
+
+	async def start(self) -> None:
+		if self._running:
+			return
+		self._commit_lock = asyncio.Lock()
+		self._running = True
+
+	async def stop(self) -> None:
+		if not self._running:
+			return
+		self._running = False
+		writers, self._writers = list(self._writers.values()), {}
+		await asyncio.gather(*(writer.stop() for writer in writers))
+		self._next_sequence = None
+
+	def add_listener(self, listener: Callable[[List[ActionRead]], None]) -> None:
+		# Listeners run on the writer tasks after each commit and must not block.
+		self._listeners.append(listener)
+
+	def partition_of(self, values: Dict[str, Any]) -> int:
+		return chain_partition(values, self.partitioning, self.partitions)
+
+	async def append(self, values: Dict[str, Any]) -> ActionRead:
+		return (await self.append_many([values]))[0]
+
+	async def append_many(self, rows: List[Dict[str, Any]], return_exceptions: bool = False) -> List[ActionRead | BaseException]:
+		await self.start()
+		loop = asyncio.get_running_loop()
+		keys = [idempotency_key(values) for values in rows]
+		replays = await idempotency.resolve([key for key in keys if key is not None]) if any(keys) else {}
+		futures = []
+		enqueued_at = time.perf_counter()
+		for values, key in zip(rows, keys):
+			if key is not None:
+				# Retries of an append still in flight share its future.
+				future = self._inflight.get(key)
+				if future is None and key in replays:
+					future = loop.create_future()
+					future.set_result(replays[key])
+				elif future is not None:
+					metrics.IDEMPOTENT_REPLAYS.inc(labels=("inflight",))
+					future = asyncio.shield(future)
+				if future is not None:
+					futures.append(future)
+					continue
+			partition = self.partition_of(values)
+			writer = self._writers.get(partition)
+			if writer is None:
+				writer = self._writers[partition] = ChainWriter(self, partition)
+			future = loop.create_future()
+			if key is not None:
+				self._inflight[key] = future
+				future.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+			try:
+				writer.queue.put_nowait(({**values, "idempotency_key": key}, future, enqueued_at))
+			except asyncio.QueueFull:
+				# Backpressure: callers answer 503 rather than queueing without bound.
+				metrics.LEDGER_APPENDS_BUSY.inc()
+				future.set_exception(SequencerBusy())
+			futures.append(future)
+		return list(await asyncio.gather(*futures, return_exceptions=return_exceptions))
+
+	async def _load_sequence(self) -> None:
+		# Called with _commit_lock held.
+		if self._next_sequence is None:
+			async with AsyncSessionLocal() as db:
+				head = (await db.execute(select(func.max(Action.sequence)))).scalar_one_or_none() or 0
+			self._next_sequence = head + 1
+
+	def _allocate(self, count: int) -> int:
+		first = self._next_sequence
+		self._next_sequence += count
+		return first
+
+	def _release(self) -> None:
+		# Nothing else is allocated while a write holds the commit lock, so a
+		# failed write's sequences are simply reloaded from the database like
+		# the head is: the failure may be a sequence taken by another process.
+		self._next_sequence = None
+
+
+sequencer = AppendSequencer(settings.ledger_batch_max_size, settings.ledger_batch_max_wait_ms, settings.chain_partitioning, settings.chain_partitions, settings.ledger_queue_max_size)
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import logging
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, desc, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.archive import archive
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models import user  # noqa: F401  (resolves Action relationships when run standalone)
+from app.models.action import Action, TargetSnapshot, TargetSnapshotCursor
+from app.models.ledger import ArchivedVoid
+
+logger = logging.getLogger(__name__)
+
+# (id, sequence, created_at, pre_state, post_state, voided, archived)
+TailRow = Tuple[int, int, datetime, Optional[dict], Optional[dict], bool, bool]
+
+
+def apply_state(state: Dict[str, Any], pre_state: Optional[dict], post_state: Optional[dict]) -> None:
+	# post_state carries the new values of the fields an action changed;
+	# fields listed in pre_state but left out of post_state were removed.
+	if post_state is None:
+		return
+	for field in pre_state or ():
+		if field not in post_state:
+			state.pop(field, None)
+	state.update(post_state)
+
+
+async def _tail(db: AsyncSession, target_type: str, target_id: str, after_sequence: int, sequence: Optional[int] = None, at: Optional[datetime] = None) -> AsyncIterator[TailRow]:
+	# Every action on the target after after_sequence in sequence order, voided
+	# ones included, archived segments first. One session keeps the archive
+	# watermark and the hot rows consistent.
+	segments = await archive.segments(db)
+	if segments and after_sequence < segments[-1].last_sequence:
+		for row in await archive.target_rows(db, target_type, target_id, after_sequence, sequence):
+			if at is None or row["created_at"] <= at:
+				yield row["id"], row["sequence"], row["created_at"], row["pre_state"], row["post_state"], row["voided"], True
+		after_sequence = max(after_sequence, segments[-1].last_sequence)
+	stmt = (
+		select(Action.id, Action.sequence, Action.created_at, Action.pre_state, Action.post_state, Action.voided)
+		.where(Action.target_type == target_type, Action.target_id == target_id, Action.sequence > after_sequence)
+		.order_by(Action.sequence)
+	)
+	if sequence is not None:
+		stmt = stmt.where(Action.sequence <= sequence)
+	if at is not None:
+		stmt = stmt.where(Action.created_at <= at)
+	result = await db.stream(stmt.execution_options(yield_per=1000))
+	async for row in result:
+		yield (*row, False)
+
+
+async def _latest_snapshot(db: AsyncSession, target_type: str, target_id: str, sequence: Optional[int] = None, at: Optional[datetime] = None) -> Optional[TargetSnapshot]:
+	stmt = (
+		select(TargetSnapshot)
+		.where(TargetSnapshot.target_type == target_type, TargetSnapshot.target_id == target_id)
+		.order_by(desc(TargetSnapshot.sequence))
+		.limit(1)
+	)
+	if sequence is not None:
+		stmt = stmt.where(TargetSnapshot.sequence <= sequence)
+	if at is not None:
+		# Every action folded into the snapshot must precede at, and the tail
+		# picks up the rest; created_at is not strictly monotonic in sequence.
+		stmt = stmt.where(TargetSnapshot.last_created_at <= at)
+	return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def state_as_of(db: AsyncSession, target_type: str, target_id: str, at: Optional[datetime] = None, sequence: Optional[int] = None) -> Dict[str, Any]:
+	# Folds the non-voided actions up to at / sequence on top of the nearest snapshot.
+	snapshot = await _latest_snapshot(db, target_type, target_id, sequence, at)
+	state = dict(snapshot.state) if snapshot is not None else {}
+	last_sequence = snapshot.sequence if snapshot is not None else None
+	replayed = 0
+	async with aclosing(_tail(db, target_type, target_id, last_sequence or 0, sequence, at)) as rows:
+		async for _, action_sequence, _, pre_state, post_state, voided, _ in rows:
+			if voided:
+				continue
+			apply_state(state, pre_state, post_state)
+			last_sequence = action_sequence
+			replayed += 1
+	return {
+		"target_type": target_type,
+		"target_id": target_id,
+		"at": at,
+		"sequence": last_sequence,
+		"state": state,
+		"actions_applied": (snapshot.action_count if snapshot is not None else 0) + replayed,
+		"replayed": replayed,
+		"snapshot_sequence": snapshot.sequence if snapshot is not None else None,
+	}
+
+
+async def invalidate_snapshots(db: AsyncSession, target_type: Optional[str], target_id: Optional[str], sequence: int) -> int:
+	# A void changes every fold that included the action; runs in the void's transaction.
+	if target_type is None or target_id is None:
+		return 0
+	result = await db.execute(
+		delete(TargetSnapshot).where(TargetSnapshot.target_type == target_type, TargetSnapshot.target_id == target_id, TargetSnapshot.sequence >= sequence)
+	)
+	return result.rowcount
+
+
+async def snapshot_target(target_type: str, target_id: str) -> int:
+	# Extends the target's snapshots from its latest one, one every
+	# STATE_SNAPSHOT_EVERY non-voided actions.
+	every = settings.state_snapshot_every
+	snapshots: List[Dict[str, Any]] = []
+	async with AsyncSessionLocal() as db:
+		snapshot = await _latest_snapshot(db, target_type, target_id)
+		after_sequence = snapshot.sequence if snapshot is not None else 0
+		state = dict(snapshot.state) if snapshot is not None else {}
+		count = snapshot.action_count if snapshot is not None else 0
+		last_created_at = snapshot.last_created_at if snapshot is not None else None
+		pending = voided_seen = 0
+		archived_ids = []
+		archived_voided = set()
+		last_sequence = after_sequence
+		async with aclosing(_tail(db, target_type, target_id, after_sequence)) as rows:
+			async for action_id, action_sequence, created_at, pre_state, post_state, voided, archived in rows:
+				last_sequence = action_sequence
+				if archived:
+					archived_ids.append(action_id)
+				if voided:
+					if archived:
+						archived_voided.add(action_id)
+					else:
+						voided_seen += 1
+					continue
+				apply_state(state, pre_state, post_state)
+				count += 1
+				pending += 1
+				last_created_at = created_at if last_created_at is None else max(last_created_at, created_at)
+				if pending >= every:
+					snapshots.append({
+						"target_type": target_type,
+						"target_id": target_id,
+						"sequence": action_sequence,
+						"last_created_at": last_created_at,
+						"action_count": count,
+						"state": dict(state),
+					})
+					pending = 0
+	if not snapshots:
+		return 0
+	async with AsyncSessionLocal() as db:
+		try:
+			await db.execute(insert(TargetSnapshot), snapshots)
+		except IntegrityError:
+			# Another worker snapshotted the same target first.
+			await db.rollback()
+			return 0
+		# Voids only ever add up, so a changed count means one landed while
+		# the actions were being folded. Checked after the insert, which holds
+		# the write lock on SQLite.
+		voided_now = (await db.execute(
+			select(func.count()).select_from(Action).where(
+				Action.target_type == target_type, Action.target_id == target_id, Action.sequence > after_sequence, Action.sequence <= last_sequence, Action.voided.is_(True)
+			)
+		)).scalar_one()
+		changed = voided_now != voided_seen
+		if archived_ids and not changed:
+			result = await db.execute(select(ArchivedVoid.action_id).where(ArchivedVoid.action_id.in_(archived_ids)))
+			changed = not set(result.scalars()) <= archived_voided
+		if changed:
+			await db.rollback()
+			logger.info("Target %s/%s changed while snapshotting; skipped", target_type, target_id)
+			return 0
+		await db.commit()
+	return len(snapshots)
+
+
+class TargetSnapshotter:
+	async def run(self) -> int:
+		# Extends snapshots for the targets touched since the previous run; the
+		# scanned watermark is stored with the snapshots, so restarts resume.
+		async with AsyncSessionLocal() as db:
+			cursor = await db.get(TargetSnapshotCursor, 1)
+			scanned_through = cursor.scanned_through if cursor is not None else 0
+			head = (await db.execute(select(func.max(Action.sequence)))).scalar_one_or_none() or 0
+			result = await db.execute(
+				select(Action.target_type, Action.target_id)
+				.where(Action.sequence > scanned_through, Action.sequence <= head, Action.target_type.is_not(None), Action.target_id.is_not(None))
+				.group_by(Action.target_type, Action.target_id)
+			)
+			targets = result.tuples().all()
+		written = 0
+		for target_type, target_id in targets:
+			written += await snapshot_target(target_type, target_id)
+		async with AsyncSessionLocal() as db:
+			cursor = await db.get(TargetSnapshotCursor, 1)
+			if cursor is None:
+				db.add(TargetSnapshotCursor(id=1, scanned_through=head))
+			elif cursor.scanned_through < head:
+				cursor.scanned_through = head
+			try:
+				await db.commit()
+			except IntegrityError:
+				# Another worker stored the first cursor; the next run moves it.
+				await db.rollback()
+		if written:
+			logger.info("Wrote %s target snapshots for %s targets", written, len(targets))
+		return written
+
+
+snapshotter = TargetSnapshotter()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Write periodic state snapshots for action targets")
+	parser.add_argument("--target", nargs=2, metavar=("TARGET_TYPE", "TARGET_ID"), default=None, help="only snapshot this target")
+	args = parser.parse_args()
+	if args.target:
+		written = asyncio.run(snapshot_target(*args.target))
+	else:
+		written = asyncio.run(snapshotter.run())
+	print(f"Wrote {written} snapshots")
+
+
+if __name__ == "__main__":
+	main()
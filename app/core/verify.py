@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine, make_url
+
+from app.core.anchors import verify_anchors
+from app.core.archive import archive, verify_archive_segment
+from app.core.config import settings
+from app.core.ledger import HASHED_FIELDS, compute_entry_hash, entry_payload
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+from app.models.ledger import ArchiveSegment, ChainCheckpoint
+
+
+_VERIFY_COLUMNS = [Action.id, Action.partition_sequence, Action.prev_hash, Action.entry_hash, Action.hash_version] + [getattr(Action, field) for field in HASHED_FIELDS]
+_engines: Dict[str, Engine] = {}
+# Sync drivers shipped in requirements.txt; psycopg 3 also serves the async
+# engine as postgresql+psycopg.
+_SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql+psycopg"}
+
+
+def _sync_engine(database_url: str) -> Engine:
+	# Segments run in worker processes, so they use a plain sync driver.
+	if database_url not in _engines:
+		url = make_url(database_url)
+		backend = url.get_backend_name()
+		if backend not in _SYNC_DRIVERS:
+			raise ValueError(f"Chain verification does not support {backend} databases")
+		_engines[database_url] = create_engine(url.set(drivername=_SYNC_DRIVERS[backend]))
+	return _engines[database_url]
+
+
+def _broken(partition: int, row: Any, sequence: int, reason: str) -> Dict[str, Any]:
+	return {"partition": partition, "sequence": sequence, "action_id": row["id"] if row is not None else None, "reason": reason}
+
+
+def verify_segment(database_url: str, partition: int, start: int, end: int, check_anchor: bool, anchor: Optional[str] = None) -> Dict[str, Any]:
+	# Verifies partition_sequence start..end of one chain partition. Without
+	# check_anchor the first row's prev_hash is trusted and returned as
+	# first_prev_hash so the caller can stitch it to the previous segment.
+	segment = {"partition": partition, "start": start, "end": end, "count": 0, "first_prev_hash": None, "last_hash": anchor, "broken": None}
+	expected_sequence = start
+	prev_hash = anchor
+	stmt = (
+		select(*_VERIFY_COLUMNS)
+		.where(Action.chain_partition == partition, Action.partition_sequence.between(start, end))
+		.order_by(Action.partition_sequence)
+	)
+	with _sync_engine(database_url).connect() as conn:
+		result = conn.execution_options(yield_per=5000).execute(stmt)
+		for row in result.mappings():
+			if row["partition_sequence"] != expected_sequence:
+				segment["broken"] = _broken(partition, row, expected_sequence, "missing sequence")
+				return segment
+			if segment["count"] == 0:
+				segment["first_prev_hash"] = row["prev_hash"]
+				if not check_anchor:
+					prev_hash = row["prev_hash"]
+			if row["prev_hash"] != prev_hash:
+				segment["broken"] = _broken(partition, row, expected_sequence, "prev_hash mismatch")
+				return segment
+			version = row["hash_version"]
+			if compute_entry_hash(entry_payload(row, version), prev_hash, version) != row["entry_hash"]:
+				segment["broken"] = _broken(partition, row, expected_sequence, "entry_hash mismatch")
+				return segment
+			prev_hash = row["entry_hash"]
+			segment["count"] += 1
+			expected_sequence += 1
+	segment["last_hash"] = prev_hash
+	if expected_sequence <= end:
+		segment["broken"] = _broken(partition, None, expected_sequence, "missing sequence")
+	return segment
+
+
+def _stitch(segments: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+	# segments belong to one partition, in order.
+	previous = None
+	for segment in segments:
+		if segment["broken"] is not None:
+			return segment["broken"]
+		if previous is not None and segment["first_prev_hash"] != previous["last_hash"]:
+			return {"partition": segment["partition"], "sequence": segment["start"], "action_id": None, "reason": "prev_hash mismatch at segment boundary"}
+		previous = segment
+	return None
+
+
+def _stitch_archive(segments: List[ArchiveSegment]) -> tuple:
+	# Archive segments must continue each partition's chain where the previous
+	# segment left it; returns the archived tail per partition, or the break.
+	tails: Dict[int, tuple] = {}
+	for segment in segments:
+		for key, (first, first_prev_hash, last, last_hash) in segment.boundaries.items():
+			partition = int(key)
+			through, entry_hash = tails.get(partition, (0, None))
+			if first != through + 1 or first_prev_hash != entry_hash:
+				broken = {"partition": partition, "sequence": first, "action_id": None, "reason": "prev_hash mismatch at archive boundary", "segment": segment.name}
+				return tails, broken
+			tails[partition] = (last, last_hash)
+	return tails, None
+
+
+async def _run_segments(ranges: List[tuple], archived: List[tuple], workers: Optional[int]) -> tuple:
+	# ranges are (partition, start, end, check_anchor, anchor) and archived are
+	# verify_archive_segment arguments; everything shares one pool, so
+	# partitions and archive files are verified in parallel.
+	loop = asyncio.get_running_loop()
+	if len(ranges) + len(archived) == 1:
+		if ranges:
+			return [await asyncio.to_thread(verify_segment, settings.database_url, *ranges[0])], []
+		return [], [await asyncio.to_thread(verify_archive_segment, *archived[0])]
+	workers = workers or settings.verify_workers or os.cpu_count() or 1
+	with ProcessPoolExecutor(max_workers=min(workers, len(ranges) + len(archived)), mp_context=multiprocessing.get_context("spawn")) as pool:
+		futures = [loop.run_in_executor(pool, verify_segment, settings.database_url, *segment) for segment in ranges]
+		archive_futures = [loop.run_in_executor(pool, verify_archive_segment, *segment) for segment in archived]
+		return list(await asyncio.gather(*futures)), list(await asyncio.gather(*archive_futures))
+
+
+async def _latest_checkpoints(db) -> Dict[int, ChainCheckpoint]:
+	latest = select(ChainCheckpoint.chain_partition, func.max(ChainCheckpoint.id).label("id")).group_by(ChainCheckpoint.chain_partition).subquery()
+	result = await db.execute(select(ChainCheckpoint).join(latest, ChainCheckpoint.id == latest.c.id))
+	return {checkpoint.chain_partition: checkpoint for checkpoint in result.scalars()}
+
+
+async def verify_chain(full: bool = False, workers: Optional[int] = None, segment_size: Optional[int] = None, record: bool = True) -> Dict[str, Any]:
+	# Without record the run is read-only: nothing is checkpointed, so the next
+	# run starts from the same place.
+	segment_size = segment_size or settings.verify_segment_size
+	async with AsyncSessionLocal() as db:
+		result = await db.execute(select(Action.chain_partition, func.max(Action.partition_sequence)).group_by(Action.chain_partition).order_by(Action.chain_partition))
+		heads = dict(result.tuples().all())
+		checkpoints = {} if full else await _latest_checkpoints(db)
+		report: Dict[str, Any] = {"mode": "full" if full else "incremental", "ok": True, "rows_checked": 0, "broken": None, "partitions": {}}
+		# Archived rows are verified from their segment files on full audits;
+		# hot rows then continue from each partition's archived tail.
+		segments = await archive.segments(db)
+		tails, broken = _stitch_archive(segments)
+		if broken is not None:
+			report.update(ok=False, broken=broken)
+			return report
+		archived = [
+			(segment.name, segment.digest, segment.first_sequence, segment.last_sequence, segment.boundaries)
+			for segment in segments
+		] if full else []
+		ranges = []
+		for partition, head in heads.items():
+			start, anchor = tails.get(partition, (0, None))
+			start += 1
+			checkpoint = checkpoints.get(partition)
+			if checkpoint is not None:
+				stored = (
+					await db.execute(select(Action.id, Action.entry_hash).where(Action.chain_partition == partition, Action.partition_sequence == checkpoint.sequence))
+				).first()
+				if stored is None or stored.entry_hash != checkpoint.entry_hash:
+					broken = {"partition": partition, "sequence": checkpoint.sequence, "action_id": stored.id if stored else None, "reason": "checkpoint mismatch"}
+					report.update(ok=False, broken=broken)
+					return report
+				start, anchor = checkpoint.sequence + 1, checkpoint.entry_hash
+			report["partitions"][partition] = {"verified_through": start - 1, "entry_hash": anchor}
+			ranges.extend(
+				(partition, lo, min(lo + segment_size - 1, head), lo == start, anchor)
+				for lo in range(start, head + 1, segment_size)
+			)
+
+		segments, archive_segments = await _run_segments(ranges, archived, workers) if ranges or archived else ([], [])
+		report["rows_checked"] = sum(segment["count"] for segment in segments) + sum(segment["count"] for segment in archive_segments)
+		if archived:
+			report["archived_segments"] = len(archive_segments)
+		for segment in archive_segments:
+			if segment["broken"] is not None:
+				report.update(ok=False, broken=segment["broken"])
+				return report
+		by_partition: Dict[int, List[Dict[str, Any]]] = {}
+		for segment in segments:
+			by_partition.setdefault(segment["partition"], []).append(segment)
+		for partition, partition_segments in sorted(by_partition.items()):
+			broken = _stitch(partition_segments)
+			if broken is not None:
+				report.update(ok=False, broken=broken)
+				return report
+			report["partitions"][partition] = {"verified_through": heads[partition], "entry_hash": partition_segments[-1]["last_hash"]}
+			if not record:
+				continue
+			db.add(
+				ChainCheckpoint(
+					chain_partition=partition,
+					sequence=heads[partition],
+					entry_hash=partition_segments[-1]["last_hash"],
+					rows_checked=sum(segment["count"] for segment in partition_segments),
+					full_audit=full,
+				)
+			)
+
+		anchors = await verify_anchors(db, full)
+		report["anchors"] = {key: value for key, value in anchors.items() if key != "broken"}
+		if anchors["broken"] is not None:
+			report.update(ok=False, broken=anchors["broken"])
+			return report
+		if record:
+			await db.commit()
+	return report
+
+
+# Read-only verification served to any user: one run at a time, and its
+# report is reused for VERIFY_REPORT_CACHE_SECONDS, so repeated requests cannot
+# keep the process pool rehashing.
+class VerifyReportCache:
+	def __init__(self, ttl_seconds: int):
+		self.ttl_seconds = ttl_seconds
+		self._report: Optional[Dict[str, Any]] = None
+		self._expires_at = 0.0
+		self._lock: Optional[asyncio.Lock] = None
+
+	async def report(self) -> Dict[str, Any]:
+		if self._report is not None and time.monotonic() < self._expires_at:
+			return self._report
+		if self._lock is None:
+			self._lock = asyncio.Lock()
+		async with self._lock:
+			if self._report is None or time.monotonic() >= self._expires_at:
+				report = await verify_chain(record=False)
+				report["verified_at"] = datetime.utcnow()
+				self._report, self._expires_at = report, time.monotonic() + self.ttl_seconds
+		return self._report
+
+
+verify_reports = VerifyReportCache(settings.verify_report_cache_seconds)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Verify the action hash chain")
+	parser.add_argument("--full", action="store_true", help="re-verify from genesis instead of the last checkpoint")
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--segment-size", type=int, default=None)
+	args = parser.parse_args()
+	report = asyncio.run(verify_chain(full=args.full, workers=args.workers, segment_size=args.segment_size))
+	print(json.dumps(report, indent=2))
+	raise SystemExit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+	main()
@@ -3,12 +3,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import engine, Base, AsyncSessionLocal
 from app.models.user import User, Role, Department
+from app.models import action, blueprint, ledger, rule, stats  # noqa: F401  (register tables)
+from app.core.search import ensure_search_schema
 from app.core.security import hash_password
 
 
 async def init_models():
 	async with engine.begin() as conn:
 		await conn.run_sync(Base.metadata.create_all)
+		await ensure_search_schema(conn)
 
 
 async def seed_admin():
@@ -1,14 +1,166 @@
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
 
-engine: AsyncEngine = create_async_engine(settings.database_url, future=True, echo=False)
+class PoolMetrics:
+	def __init__(self, name: str):
+		self.name = name
+		self.connects = 0
+		self.checkouts = 0
+		self.checked_out = 0
+		self.wait_seconds_total = 0.0
+		self.wait_seconds_max = 0.0
+		self.engine: Optional[AsyncEngine] = None
+
+	def observe_wait(self, seconds: float) -> None:
+		self.wait_seconds_total += seconds
+		if seconds > self.wait_seconds_max:
+			self.wait_seconds_max = seconds
+
+	def snapshot(self) -> dict:
+		pool = self.engine.pool if self.engine is not None else None
+		return {
+			"engine": self.name,
+			"pool_size": pool.size() if hasattr(pool, "size") else None,
+			"overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+			"connects": self.connects,
+			"checkouts": self.checkouts,
+			"checked_out": self.checked_out,
+			"wait_seconds_total": round(self.wait_seconds_total, 6),
+			"wait_seconds_max": round(self.wait_seconds_max, 6),
+		}
+
+
+def _sqlite_file(url: str) -> Optional[bool]:
+	parsed = make_url(url)
+	if parsed.get_backend_name() != "sqlite":
+		return None
+	return parsed.database not in (None, "", ":memory:")
+
+
+def json_loads(value: str) -> Any:
+	try:
+		return orjson.loads(value)
+	except orjson.JSONDecodeError:
+		# json.dumps writes NaN/Infinity and arbitrarily large ints, which orjson rejects.
+		return json.loads(value)
+
+
+def _engine_options(url: str) -> dict:
+	options = {"future": True, "echo": False, "json_deserializer": json_loads}
+	sqlite_file = _sqlite_file(url)
+	if sqlite_file is not None:
+		if not sqlite_file:
+			return options
+		# aiosqlite defaults to NullPool, which opens the file (and a thread) per session.
+		options["poolclass"] = AsyncAdaptedQueuePool
+	options.update(
+		pool_size=settings.db_pool_size,
+		max_overflow=settings.db_max_overflow,
+		pool_timeout=settings.db_pool_timeout,
+		pool_recycle=settings.db_pool_recycle,
+		pool_pre_ping=settings.db_pool_pre_ping,
+	)
+	return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+	# WAL lets readers run alongside the single writer; NORMAL sync is durable
+	# across application crashes and only risks the last commits on power loss.
+	cursor = dbapi_connection.cursor()
+	cursor.execute("PRAGMA journal_mode=WAL")
+	cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+	cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+	cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+	cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+	cursor.execute("PRAGMA temp_store=MEMORY")
+	cursor.close()
+
+
+def _create_engine(url: str, metrics: PoolMetrics) -> AsyncEngine:
+	created = create_async_engine(url, **_engine_options(url))
+	metrics.engine = created
+	sync_engine = created.sync_engine
+	if _sqlite_file(url):
+		event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+	@event.listens_for(sync_engine, "connect")
+	def _on_connect(dbapi_connection, connection_record):
+		metrics.connects += 1
+
+	@event.listens_for(sync_engine, "checkout")
+	def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+		metrics.checkouts += 1
+		metrics.checked_out += 1
+
+	@event.listens_for(sync_engine, "checkin")
+	def _on_checkin(dbapi_connection, connection_record):
+		metrics.checked_out -= 1
+
+	return created
+
+
+write_metrics = PoolMetrics("write")
+engine: AsyncEngine = _create_engine(settings.database_url, write_metrics)
+# GET endpoints read through read_engine; it is the primary unless a replica is configured.
+if settings.database_read_url:
+	read_metrics = PoolMetrics("read")
+	read_engine: AsyncEngine = _create_engine(settings.database_read_url, read_metrics)
+else:
+	read_metrics, read_engine = write_metrics, engine
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 
-async def get_session() -> AsyncSession:
-	async with AsyncSessionLocal() as session:
-		yield session
\ No newline at end of file
+@asynccontextmanager
+async def _session_scope(factory: async_sessionmaker, metrics: PoolMetrics) -> AsyncIterator[AsyncSession]:
+	# Closing the session rolls back anything uncommitted and returns the
+	# connection to the pool, whether or not the request raised.
+	async with factory() as session:
+		# Acquire eagerly so time spent waiting on the pool is measured.
+		started = time.perf_counter()
+		await session.connection()
+		metrics.observe_wait(time.perf_counter() - started)
+		yield session
+
+
+def session_scope():
+	return _session_scope(AsyncSessionLocal, write_metrics)
+
+
+def read_session_scope():
+	return _session_scope(ReadSessionLocal, read_metrics)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+	async with session_scope() as session:
+		yield session
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+	async with read_session_scope() as session:
+		yield session
+
+
+def pool_metrics() -> list:
+	if read_metrics is write_metrics:
+		return [write_metrics.snapshot()]
+	return [write_metrics.snapshot(), read_metrics.snapshot()]
+
+
+async def dispose_engines() -> None:
+	await engine.dispose()
+	if read_engine is not engine:
+		await read_engine.dispose()
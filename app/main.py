@@ -1,11 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 from starlette.responses import RedirectResponse
 from app.core.config import settings
+from app.api.metrics import router as metrics_router
+from app.api.middleware import AccessLogMiddleware, MetricsMiddleware
 from app.api.routes import api_router
+from app.core.access_log import access_log_writer
+from app.core.archive import archive
+from app.core.events import event_hub
+from app.core.graph import link_graph
+from app.core.metrics import instrument_engine
+from app.core.process import process_engine
+from app.core.rules import rule_engine
+from app.core.search import ensure_search_schema
+from app.core.scheduler import scheduler
+from app.core.sequencer import sequencer
+from app.db.session import dispose_engines, engine, read_engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	async with engine.begin() as conn:
+		await ensure_search_schema(conn)
+	await sequencer.start()
+	await process_engine.start()
+	await event_hub.start()
+	await access_log_writer.start()
+	sequencer.add_listener(event_hub.on_actions)
+	await rule_engine.reload()
+	# Lineage queries use the recursive CTE until the adjacency index is warm.
+	warm_up = asyncio.create_task(link_graph.warm_up())
+	scheduler.start()
+	yield
+	warm_up.cancel()
+	scheduler.shutdown(wait=False)
+	await sequencer.stop()
+	await process_engine.stop()
+	await event_hub.stop()
+	await access_log_writer.stop()
+	await dispose_engines()
+	archive.close()
 
-app = FastAPI(title=settings.app_name, docs_url="/docs" if settings.enable_docs else None, redoc_url=None)
+
+app = FastAPI(title=settings.app_name, docs_url="/docs" if settings.enable_docs else None, redoc_url=None, lifespan=lifespan)
 
 app.add_middleware(
 	CORSMiddleware,
@@ -15,6 +56,14 @@ app.add_middleware(
 	allow_headers=["*"],
 )
 
+if settings.access_log_enabled:
+	app.add_middleware(AccessLogMiddleware)
+if settings.metrics_enabled:
+	app.add_middleware(MetricsMiddleware)
+	instrument_engine(engine, "write")
+	if read_engine is not engine:
+		instrument_engine(read_engine, "read")
+
 
 @app.get("/")
 async def root():
@@ -27,6 +76,8 @@ async def health():
 
 
 app.include_router(api_router, prefix="/api")
+if settings.metrics_enabled:
+	app.include_router(metrics_router)
 
 # Placeholder mounts for future UI assets
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, Boolean, ForeignKey, DateTime, Text, JSON, UniqueConstraint
+from sqlalchemy import String, Integer, Boolean, ForeignKey, DateTime, Text, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -9,6 +9,9 @@ class Action(Base):
 	__tablename__ = "actions"
 	__table_args__ = (
 		UniqueConstraint("sequence", name="uq_actions_sequence"),
+		UniqueConstraint("chain_partition", "partition_sequence", name="uq_actions_partition_sequence"),
+		Index("ix_actions_reference_timeline", "reference_key", "created_at", "sequence"),
+		Index("ix_actions_target_sequence", "target_type", "target_id", "sequence"),
 	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -30,6 +33,9 @@ class Action(Base):
 
 	prev_hash: Mapped[str | None] = mapped_column(String(128), index=True)
 	entry_hash: Mapped[str | None] = mapped_column(String(128), index=True)
+	hash_version: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+	chain_partition: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+	partition_sequence: Mapped[int] = mapped_column(Integer, nullable=False)
 
 	is_offline_capture: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 	device_id: Mapped[str | None] = mapped_column(String(128))
@@ -44,6 +50,43 @@ class Action(Base):
 	voided_by_user = relationship("User", foreign_keys=[voided_by_user_id])
 
 
+# Dedup keys of appended actions. No foreign key: the action may since have
+# moved into the cold archive, and the key must keep resolving to it.
+class IdempotencyKey(Base):
+	__tablename__ = "idempotency_keys"
+
+	key: Mapped[str] = mapped_column(String(32), primary_key=True)
+	action_id: Mapped[int] = mapped_column(Integer, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Folded state of a target after every STATE_SNAPSHOT_EVERY non-voided actions,
+# so a state-as-of lookup only replays the actions after the nearest one.
+class TargetSnapshot(Base):
+	__tablename__ = "target_snapshots"
+	__table_args__ = (
+		UniqueConstraint("target_type", "target_id", "sequence", name="uq_target_snapshots_target_sequence"),
+	)
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	target_type: Mapped[str] = mapped_column(String(100), nullable=False)
+	target_id: Mapped[str] = mapped_column(String(255), nullable=False)
+	sequence: Mapped[int] = mapped_column(Integer, nullable=False)  # last action folded in
+	last_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # latest created_at folded in
+	action_count: Mapped[int] = mapped_column(Integer, nullable=False)
+	state: Mapped[dict] = mapped_column(JSON, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Highest action sequence the snapshot job has scanned for touched targets.
+class TargetSnapshotCursor(Base):
+	__tablename__ = "target_snapshot_cursor"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	scanned_through: Mapped[int] = mapped_column(Integer, nullable=False)
+	updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class ActionLink(Base):
 	__tablename__ = "action_links"
 	__table_args__ = (
@@ -51,13 +94,13 @@ class ActionLink(Base):
 	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True)
-	source_action_id: Mapped[int] = mapped_column(ForeignKey("actions.id"), nullable=False, index=True)
-	target_action_id: Mapped[int] = mapped_column(ForeignKey("actions.id"), nullable=False, index=True)
+	source_action_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # actions.id, hot or archived
+	target_action_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # actions.id, hot or archived
 	link_type: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
 	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
-	source_action = relationship("Action", foreign_keys=[source_action_id])
-	target_action = relationship("Action", foreign_keys=[target_action_id])
+	source_action = relationship("Action", primaryjoin="foreign(ActionLink.source_action_id) == Action.id", viewonly=True)
+	target_action = relationship("Action", primaryjoin="foreign(ActionLink.target_action_id) == Action.id", viewonly=True)
 
 
 class FollowSubscription(Base):
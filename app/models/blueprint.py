@@ -52,6 +52,6 @@ class ProcessStepInstance(Base):
 	blueprint_step_id: Mapped[int] = mapped_column(ForeignKey("blueprint_steps.id"), nullable=False)
 	status: Mapped[str] = mapped_column(String(20), default="waiting")
 	due_at: Mapped[datetime | None] = mapped_column(DateTime)
-	completed_action_id: Mapped[int | None] = mapped_column(ForeignKey("actions.id"))
+	completed_action_id: Mapped[int | None] = mapped_column(Integer)  # actions.id, hot or archived
 
 	process = relationship("ProcessInstance", back_populates="steps")
\ No newline at end of file
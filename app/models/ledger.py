@@ -0,0 +1,78 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, JSON, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class ChainCheckpoint(Base):
+	__tablename__ = "chain_checkpoints"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	chain_partition: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False, index=True)
+	sequence: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # partition_sequence
+	entry_hash: Mapped[str] = mapped_column(String(128), nullable=False)
+	rows_checked: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+	full_audit: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class MerkleRoot(Base):
+	__tablename__ = "merkle_roots"
+	__table_args__ = (
+		UniqueConstraint("chain_partition", "block_index", name="uq_merkle_roots_partition_block"),
+	)
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	chain_partition: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+	block_index: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+	first_sequence: Mapped[int] = mapped_column(Integer, nullable=False)
+	last_sequence: Mapped[int] = mapped_column(Integer, nullable=False)
+	root: Mapped[str] = mapped_column(String(64), nullable=False)
+	signature: Mapped[str] = mapped_column(String(128), nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Commits the heads of every chain partition into one root; anchors are
+# themselves hash-linked so partitions cannot be rewritten independently.
+class ChainAnchor(Base):
+	__tablename__ = "chain_anchors"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	anchor_index: Mapped[int] = mapped_column(Integer, nullable=False, unique=True, index=True)
+	heads: Mapped[list] = mapped_column(JSON, nullable=False)  # [[partition, partition_sequence, entry_hash], ...]
+	root: Mapped[str] = mapped_column(String(64), nullable=False)
+	prev_anchor_hash: Mapped[str | None] = mapped_column(String(64))
+	anchor_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+	signature: Mapped[str] = mapped_column(String(128), nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# One compressed, append-only segment file holding actions first_sequence ..
+# last_sequence that were moved out of the hot table.
+class ArchiveSegment(Base):
+	__tablename__ = "archive_segments"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	name: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+	first_sequence: Mapped[int] = mapped_column(Integer, nullable=False, unique=True, index=True)
+	last_sequence: Mapped[int] = mapped_column(Integer, nullable=False, unique=True, index=True)
+	min_id: Mapped[int] = mapped_column(Integer, nullable=False)
+	max_id: Mapped[int] = mapped_column(Integer, nullable=False)
+	row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+	min_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+	max_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+	boundaries: Mapped[dict] = mapped_column(JSON, nullable=False)  # {partition: [first_ps, first_prev_hash, last_ps, last_hash]}
+	digest: Mapped[str] = mapped_column(String(64), nullable=False)  # sha256 of the segment file
+	size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Void metadata for actions voided after they were archived; segment files are never rewritten.
+class ArchivedVoid(Base):
+	__tablename__ = "archived_voids"
+
+	action_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	void_reason: Mapped[str | None] = mapped_column(Text)
+	voided_by_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
+	voided_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import String, Integer, Boolean, ForeignKey, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -26,11 +26,14 @@ class Rule(Base):
 
 class EscalationEvent(Base):
 	__tablename__ = "escalation_events"
+	__table_args__ = (
+		UniqueConstraint("rule_id", "action_id", name="uq_escalation_rule_action"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True)
 	rule_id: Mapped[int] = mapped_column(ForeignKey("rules.id"), nullable=False)
 	reference_key: Mapped[str | None] = mapped_column(String(255), index=True)
-	action_id: Mapped[int | None] = mapped_column(ForeignKey("actions.id"), index=True)
+	action_id: Mapped[int | None] = mapped_column(Integer, index=True)  # actions.id, hot or archived
 	message: Mapped[str] = mapped_column(Text)
 	channel: Mapped[str] = mapped_column(String(20))
 	sent_to: Mapped[str | None] = mapped_column(String(255))
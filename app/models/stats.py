@@ -0,0 +1,19 @@
+from datetime import date
+from sqlalchemy import String, Integer, Boolean, Date, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class ActionRollup(Base):
+	__tablename__ = "action_rollups"
+	__table_args__ = (
+		UniqueConstraint("day", "department_id", "action_type", "voided", name="uq_action_rollup_key"),
+	)
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+	department_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 0 = no department
+	action_type: Mapped[str] = mapped_column(String(50), nullable=False)
+	voided: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+	count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -51,4 +51,12 @@ class AccessLog(Base):
 	target: Mapped[str] = mapped_column(String(512), nullable=False)
 	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 	ip_address: Mapped[str | None] = mapped_column(String(64))
-	user_agent: Mapped[str | None] = mapped_column(String(256))
\ No newline at end of file
+	user_agent: Mapped[str | None] = mapped_column(String(256))
+
+
+class RevokedToken(Base):
+	__tablename__ = "revoked_tokens"
+
+	jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+	expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
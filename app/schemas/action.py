@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class ActionBase(BaseModel):
@@ -19,7 +19,7 @@ class ActionBase(BaseModel):
 
 
 class ActionCreate(ActionBase):
-	pass
+	idempotency_key: Optional[str] = None
 
 
 class ActionRead(ActionBase):
@@ -29,6 +29,9 @@ class ActionRead(ActionBase):
 	created_by_user_id: int
 	prev_hash: Optional[str] = None
 	entry_hash: Optional[str] = None
+	hash_version: Optional[int] = None
+	chain_partition: Optional[int] = None
+	partition_sequence: Optional[int] = None
 	voided: bool
 	void_reason: Optional[str] = None
 	voided_by_user_id: Optional[int] = None
@@ -38,7 +41,46 @@ class ActionRead(ActionBase):
 		from_attributes = True
 
 
+class TargetStateRead(BaseModel):
+	target_type: str
+	target_id: str
+	at: Optional[datetime] = None
+	sequence: Optional[int] = None  # last action folded in
+	state: Dict[str, Any]
+	actions_applied: int
+	replayed: int
+	snapshot_sequence: Optional[int] = None
+
+
 class ActionLinkCreate(BaseModel):
 	source_action_id: int
 	target_action_id: int
-	link_type: str
\ No newline at end of file
+	link_type: str
+
+
+class LineageNode(BaseModel):
+	action_id: int
+	depth: int
+
+
+class LineageEdge(BaseModel):
+	source_action_id: int
+	target_action_id: int
+	link_type: str
+
+
+class LineageRead(BaseModel):
+	root: int
+	nodes: List[LineageNode]
+	edges: List[LineageEdge]
+	actions: Optional[List[ActionRead]] = None
+
+
+class FollowRead(BaseModel):
+	id: int
+	user_id: int
+	reference_key: str
+	created_at: datetime
+
+	class Config:
+		from_attributes = True
@@ -0,0 +1,64 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class BlueprintStepBase(BaseModel):
+	order_index: int
+	step_name: str
+	expected_action_type: Optional[str] = None
+	sla_hours: Optional[int] = None
+
+
+class BlueprintStepRead(BlueprintStepBase):
+	id: int
+
+	class Config:
+		from_attributes = True
+
+
+class BlueprintCreate(BaseModel):
+	name: str
+	description: Optional[str] = None
+	steps: List[BlueprintStepBase] = []
+
+
+class BlueprintRead(BaseModel):
+	id: int
+	name: str
+	description: Optional[str] = None
+	owner_user_id: Optional[int] = None
+	created_at: datetime
+	steps: List[BlueprintStepRead] = []
+
+	class Config:
+		from_attributes = True
+
+
+class ProcessStart(BaseModel):
+	blueprint_id: int
+	reference_key: str
+
+
+class ProcessStepStatus(BaseModel):
+	id: int
+	step_name: str
+	order_index: int
+	expected_action_type: Optional[str] = None
+	status: str
+	due_at: Optional[datetime] = None
+	completed_action_id: Optional[int] = None
+
+
+class ProcessStatus(BaseModel):
+	process_id: int
+	blueprint_id: int
+	blueprint_name: str
+	reference_key: str
+	status: str
+	total_steps: int
+	completed_steps: int
+	current_step: Optional[str] = None
+	is_overdue: bool
+	estimated_completion: Optional[datetime] = None
+	steps: List[ProcessStepStatus]
@@ -0,0 +1,55 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+
+
+class RuleBase(BaseModel):
+	name: str
+	description: Optional[str] = None
+	action_type: Optional[str] = None
+	reference_prefix: Optional[str] = None
+	department_id: Optional[int] = None
+	threshold_hours: int = 48
+	notify_role: Optional[str] = None
+	notify_user_id: Optional[int] = None
+	channel: str = "email"
+	active: bool = True
+
+
+class RuleCreate(RuleBase):
+	pass
+
+
+class RuleUpdate(BaseModel):
+	name: Optional[str] = None
+	description: Optional[str] = None
+	action_type: Optional[str] = None
+	reference_prefix: Optional[str] = None
+	department_id: Optional[int] = None
+	threshold_hours: Optional[int] = None
+	notify_role: Optional[str] = None
+	notify_user_id: Optional[int] = None
+	channel: Optional[str] = None
+	active: Optional[bool] = None
+
+
+class RuleRead(RuleBase):
+	id: int
+	created_at: datetime
+
+	class Config:
+		from_attributes = True
+
+
+class EscalationEventRead(BaseModel):
+	id: int
+	rule_id: int
+	reference_key: Optional[str] = None
+	action_id: Optional[int] = None
+	message: str
+	channel: str
+	sent_to: Optional[str] = None
+	created_at: datetime
+
+	class Config:
+		from_attributes = True
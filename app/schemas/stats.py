@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+
+class DashboardStats(BaseModel):
+	total_actions: int
+	voided_actions: int
+	actions_today: int
+	department_breakdown: Dict[str, int]
+	action_type_breakdown: Dict[str, int]
+
+
+class PoolStats(BaseModel):
+	engine: str
+	pool_size: Optional[int] = None
+	overflow: Optional[int] = None
+	connects: int
+	checkouts: int
+	checked_out: int
+	wait_seconds_total: float
+	wait_seconds_max: float
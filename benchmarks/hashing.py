@@ -0,0 +1,55 @@
+import argparse
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+from app.core.ledger import HASH_VERSION, canonical_encode, compute_chain_hashes, compute_entry_hash, entry_payload
+
+
+def _values(state_keys: int) -> dict:
+	state = {f"field_{i}": {"value": i, "label": f"item {i}", "tags": ["a", "b", "c"], "ratio": i / 7} for i in range(state_keys)}
+	return {
+		"action_type": "Approve",
+		"reference_key": "PO-1023",
+		"target_type": "purchase_order",
+		"target_id": "1023",
+		"target_label": "Purchase order 1023",
+		"context_tags": {"project": "alpha", "priority": 2, "amount": Decimal("1200.50")},
+		"pre_state": {"status": "pending", **state},
+		"post_state": {"status": "approved", **state},
+		"local_timestamp": datetime(2024, 1, 1, 10, 0, 0),
+		"department_id": 3,
+		"is_offline_capture": False,
+		"device_id": None,
+		"created_by_user_id": 7,
+		"created_at": datetime(2024, 1, 1, 10, 0, 0, 123456),
+	}
+
+
+def _per_entry(func, number: int) -> float:
+	return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def run(batch: int) -> None:
+	prev_hash = "ab" * 32
+	print(f"{'payload':<10}{'version':>8}{'encode us':>12}{'hash us':>12}{f'chain x{batch} us/entry':>24}")
+	for name, state_keys, number in (("typical", 3, 20000), ("large", 500, 200)):
+		values = _values(state_keys)
+		for version in sorted({1, HASH_VERSION}):
+			payload = entry_payload(values, version)
+			if version == 1:
+				payload["context_tags"] = {**payload["context_tags"], "amount": "1200.5"}
+				encode = "-"
+			else:
+				encode = f"{_per_entry(lambda: canonical_encode(payload), number):.2f}"
+			hashed = _per_entry(lambda: compute_entry_hash(payload, prev_hash, version), number)
+			payloads = [payload] * batch
+			chained = _per_entry(lambda: compute_chain_hashes(payloads, prev_hash, version), max(number // batch, 1)) / batch
+			print(f"{name:<10}{version:>8}{encode:>12}{hashed:>12.2f}{chained:>24.2f}")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Micro-benchmark ledger entry encoding and hashing")
+	parser.add_argument("--batch", type=int, default=256)
+	args = parser.parse_args()
+	run(args.batch)
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Load generator for the full app: runs the FastAPI app in-process (httpx
+# ASGI transport, lifespan included) against a throwaway SQLite database,
+# seeds it, drives a weighted mix of requests and reports throughput,
+# latency percentiles and peak RSS. Results can be saved as JSON and
+# compared against a stored baseline.
+
+DEFAULT_MIX = "create=4,timeline=3,search=1,stats=1,lineage=1,login=0.2"
+PASSWORD = "bench-password"
+WORDS = ("invoice", "approval", "shipment", "contract", "refund", "audit", "renewal", "escalation")
+ACTION_TYPES = ("Create", "Approve", "Update", "Close")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+	weights = {}
+	for part in mix.split(","):
+		name, _, weight = part.partition("=")
+		if name.strip() not in OPERATIONS:
+			raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+		weights[name.strip()] = float(weight or 1)
+	return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+	if not sorted_values:
+		return 0.0
+	index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+	return sorted_values[index]
+
+
+def peak_rss_mib() -> float:
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is KiB on Linux and bytes on macOS.
+	return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _action(rng: random.Random, references: List[str]) -> dict:
+	word = rng.choice(WORDS)
+	return {
+		"action_type": rng.choice(ACTION_TYPES),
+		"reference_key": rng.choice(references),
+		"target_type": "document",
+		"target_id": str(rng.randrange(1_000_000)),
+		"target_label": f"{word.title()} {rng.randrange(10_000)}",
+		"context_tags": {"topic": word, "priority": rng.randrange(5)},
+		"pre_state": {"status": "open"},
+		"post_state": {"status": rng.choice(("open", "approved", "closed"))},
+		"department_id": None,
+		"is_offline_capture": False,
+		"device_id": None,
+		"local_timestamp": None,
+	}
+
+
+class State:
+	def __init__(self, args, rng: random.Random):
+		self.rng = rng
+		self.references = [f"REF-{i}" for i in range(args.references)]
+		self.emails: List[str] = []
+		self.tokens: List[str] = []
+		self.linked_ids: List[int] = []
+		self.max_action_id = 0
+
+
+async def seed(args, state: State) -> Dict[str, float]:
+	from sqlalchemy import insert
+
+	from app.core.rules import rule_engine
+	from app.core.security import create_access_token, hash_password
+	from app.core.sequencer import sequencer
+	from app.db.session import AsyncSessionLocal
+	from app.models.action import ActionLink
+	from app.models.rule import Rule
+	from app.models.user import User
+
+	timings = {}
+	rng = state.rng
+	started = time.perf_counter()
+	hashed = hash_password(PASSWORD)
+	state.emails = [f"bench{i}@example.com" for i in range(args.users)]
+	async with AsyncSessionLocal() as db:
+		result = await db.execute(
+			insert(User).returning(User.id),
+			[{"email": email, "hashed_password": hashed, "is_active": True} for email in state.emails],
+		)
+		user_ids = list(result.scalars())
+		if args.rules:
+			await db.execute(
+				insert(Rule),
+				[
+					{
+						"name": f"rule {i}",
+						"action_type": rng.choice(ACTION_TYPES + (None,)),
+						"reference_prefix": rng.choice(("REF-", "REF-1", None)),
+						"threshold_hours": rng.choice((1, 24, 48)),
+						"channel": "email",
+						"active": True,
+					}
+					for i in range(args.rules)
+				],
+			)
+		await db.commit()
+	state.tokens = [create_access_token(str(user_id)) for user_id in user_ids]
+	await rule_engine.reload()
+	timings["users_rules_s"] = time.perf_counter() - started
+
+	started = time.perf_counter()
+	for offset in range(0, args.actions, 1000):
+		rows = [_action(rng, state.references) for _ in range(min(1000, args.actions - offset))]
+		for row in rows:
+			row["created_by_user_id"] = rng.choice(user_ids)
+		appended = await sequencer.append_many(rows)
+		state.max_action_id = max(state.max_action_id, appended[-1].id)
+	timings["actions_s"] = time.perf_counter() - started
+
+	started = time.perf_counter()
+	if args.links and state.max_action_id > 1:
+		pairs = set()
+		while len(pairs) < min(args.links, state.max_action_id * (state.max_action_id - 1) // 2):
+			source, target = sorted(rng.sample(range(1, state.max_action_id + 1), 2))
+			pairs.add((source, target))
+		async with AsyncSessionLocal() as db:
+			await db.execute(insert(ActionLink), [{"source_action_id": source, "target_action_id": target, "link_type": "depends_on"} for source, target in pairs])
+			await db.commit()
+		state.linked_ids = sorted({action_id for pair in pairs for action_id in pair})
+	timings["links_s"] = time.perf_counter() - started
+	return timings
+
+
+def _auth(state: State) -> dict:
+	return {"Authorization": f"Bearer {state.rng.choice(state.tokens)}"}
+
+
+async def op_create(client, state: State):
+	return await client.post("/api/actions/", json=_action(state.rng, state.references), headers=_auth(state))
+
+
+async def op_timeline(client, state: State):
+	return await client.get(f"/api/actions/timeline/{state.rng.choice(state.references)}", params={"limit": 100}, headers=_auth(state))
+
+
+async def op_search(client, state: State):
+	return await client.get("/api/actions/search", params={"q": state.rng.choice(WORDS), "limit": 50}, headers=_auth(state))
+
+
+async def op_stats(client, state: State):
+	return await client.get("/api/stats", headers=_auth(state))
+
+
+async def op_lineage(client, state: State):
+	action_id = state.rng.choice(state.linked_ids) if state.linked_ids else 1
+	return await client.get(f"/api/actions/{action_id}/lineage", params={"depth": 5}, headers=_auth(state))
+
+
+async def op_login(client, state: State):
+	return await client.post("/api/auth/token", data={"username": state.rng.choice(state.emails), "password": PASSWORD})
+
+
+OPERATIONS = {
+	"create": op_create,
+	"timeline": op_timeline,
+	"search": op_search,
+	"stats": op_stats,
+	"lineage": op_lineage,
+	"login": op_login,
+}
+
+
+async def drive(client, state: State, weights: Dict[str, float], concurrency: int, duration: float, max_requests: Optional[int]) -> dict:
+	names = list(weights)
+	relative_weights = list(weights.values())
+	latencies: Dict[str, List[float]] = defaultdict(list)
+	errors: Dict[str, int] = defaultdict(int)
+	issued = 0
+	deadline = time.perf_counter() + duration
+
+	async def worker():
+		nonlocal issued
+		while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+			issued += 1
+			name = state.rng.choices(names, relative_weights)[0]
+			started = time.perf_counter()
+			try:
+				response = await OPERATIONS[name](client, state)
+				failed = response.status_code >= 400
+			except Exception:
+				failed = True
+			latencies[name].append(time.perf_counter() - started)
+			if failed:
+				errors[name] += 1
+
+	started = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	elapsed = time.perf_counter() - started
+	operations = {}
+	for name in names:
+		values = sorted(latencies[name])
+		operations[name] = {
+			"count": len(values),
+			"errors": errors[name],
+			"throughput_rps": len(values) / elapsed,
+			"p50_ms": percentile(values, 50) * 1000,
+			"p95_ms": percentile(values, 95) * 1000,
+			"p99_ms": percentile(values, 99) * 1000,
+		}
+	total = sorted(value for values in latencies.values() for value in values)
+	return {
+		"duration_s": elapsed,
+		"requests": len(total),
+		"errors": sum(errors.values()),
+		"throughput_rps": len(total) / elapsed,
+		"p50_ms": percentile(total, 50) * 1000,
+		"p95_ms": percentile(total, 95) * 1000,
+		"p99_ms": percentile(total, 99) * 1000,
+		"operations": operations,
+	}
+
+
+async def run(args) -> dict:
+	import httpx
+
+	from app.db.init_db import init_models
+	from app.main import app
+
+	rng = random.Random(args.seed)
+	state = State(args, rng)
+	await init_models()
+	async with app.router.lifespan_context(app):
+		seed_timings = await seed(args, state)
+		transport = httpx.ASGITransport(app=app)
+		async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+			if args.warmup:
+				await drive(client, state, parse_mix(args.mix), args.concurrency, args.warmup, None)
+			results = await drive(client, state, parse_mix(args.mix), args.concurrency, args.duration, args.requests)
+	return {
+		"config": {
+			"users": args.users,
+			"actions": args.actions,
+			"links": args.links,
+			"rules": args.rules,
+			"references": args.references,
+			"mix": args.mix,
+			"concurrency": args.concurrency,
+			"duration": args.duration,
+			"requests": args.requests,
+			"seed": args.seed,
+		},
+		"environment": {"python": platform.python_version(), "platform": platform.platform()},
+		"seeding": seed_timings,
+		**results,
+		"peak_rss_mib": peak_rss_mib(),
+	}
+
+
+def compare(current: dict, baseline: dict, throughput_threshold: float, latency_threshold: float) -> List[str]:
+	regressions = []
+	changed = sorted(key for key, value in current["config"].items() if baseline.get("config", {}).get(key) != value)
+	if changed:
+		print(f"\nwarning: baseline was recorded with different settings ({', '.join(changed)})")
+	rows = [("total", current, baseline)] + [
+		(name, current["operations"][name], baseline.get("operations", {}).get(name))
+		for name in current["operations"]
+	]
+	print(f"\n{'vs baseline':<12}{'rps':>10}{'base':>10}{'Δ%':>8}{'p95 ms':>10}{'base':>10}{'Δ%':>8}")
+	for name, now, then in rows:
+		if not then or not then.get("throughput_rps"):
+			continue
+		rps_delta = now["throughput_rps"] / then["throughput_rps"] - 1
+		p95_delta = now["p95_ms"] / then["p95_ms"] - 1 if then["p95_ms"] else 0.0
+		print(f"{name:<12}{now['throughput_rps']:>10.1f}{then['throughput_rps']:>10.1f}{rps_delta * 100:>8.1f}{now['p95_ms']:>10.2f}{then['p95_ms']:>10.2f}{p95_delta * 100:>8.1f}")
+		if rps_delta < -throughput_threshold:
+			regressions.append(f"{name}: throughput {rps_delta * 100:.1f}% (limit -{throughput_threshold * 100:.0f}%)")
+		if p95_delta > latency_threshold:
+			regressions.append(f"{name}: p95 latency +{p95_delta * 100:.1f}% (limit +{latency_threshold * 100:.0f}%)")
+	return regressions
+
+
+def report(results: dict) -> None:
+	print(f"seeded in {sum(results['seeding'].values()):.1f}s {results['seeding']}")
+	print(f"{'operation':<12}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+	for name, op in list(results["operations"].items()) + [("total", results)]:
+		print(f"{name:<12}{op['count'] if 'count' in op else op['requests']:>8}{op['errors']:>8}{op['throughput_rps']:>10.1f}{op['p50_ms']:>10.2f}{op['p95_ms']:>10.2f}{op['p99_ms']:>10.2f}")
+	print(f"peak RSS {results['peak_rss_mib']:.1f} MiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description="Offline load test: in-process app, temp SQLite database, mixed workload")
+	parser.add_argument("--users", type=int, default=20)
+	parser.add_argument("--actions", type=int, default=10_000)
+	parser.add_argument("--links", type=int, default=2_000)
+	parser.add_argument("--rules", type=int, default=100)
+	parser.add_argument("--references", type=int, default=200)
+	parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations, default {DEFAULT_MIX}")
+	parser.add_argument("--concurrency", type=int, default=32)
+	parser.add_argument("--duration", type=float, default=20.0, help="seconds to drive load")
+	parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+	parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+	parser.add_argument("--output", help="write results JSON here")
+	parser.add_argument("--baseline", help="compare against this results JSON")
+	parser.add_argument("--save-baseline", help="also write results JSON here as the new baseline")
+	parser.add_argument("--max-throughput-drop", type=float, default=0.10)
+	parser.add_argument("--max-latency-increase", type=float, default=0.20)
+	args = parser.parse_args(argv)
+	parse_mix(args.mix)
+
+	with tempfile.TemporaryDirectory() as directory:
+		# Settings are read at import time, so the app is imported only after this.
+		os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+		results = asyncio.run(run(args))
+
+	report(results)
+	for path in filter(None, (args.output, args.save_baseline)):
+		with open(path, "w", encoding="utf-8") as handle:
+			json.dump(results, handle, indent=2)
+	if args.baseline:
+		with open(args.baseline, encoding="utf-8") as handle:
+			regressions = compare(results, json.load(handle), args.max_throughput_drop, args.max_latency_increase)
+		if regressions:
+			print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+			return 1
+		print("\nno regressions")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
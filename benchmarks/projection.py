@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.projection import encode_action_rows, select_action_rows
+from app.db.session import Base, json_loads
+from app.models import action, blueprint, ledger, rule, stats, user  # noqa: F401  (register tables)
+from app.models.action import Action
+from app.models.user import User
+from app.schemas.action import ActionRead
+
+_ACTION_LIST = TypeAdapter(list[ActionRead])
+
+
+def _rows(count: int) -> list:
+	started = datetime(2024, 1, 1)
+	return [
+		{
+			"action_type": "Approve" if i % 2 else "Update",
+			"reference_key": "PO-1",
+			"target_type": "purchase_order",
+			"target_id": str(i),
+			"target_label": f"Purchase order {i}",
+			"context_tags": {"project": "alpha", "priority": i % 5},
+			"pre_state": {"status": "pending", "amount": i * 1.5},
+			"post_state": {"status": "approved", "amount": i * 1.5},
+			"department_id": i % 7,
+			"is_offline_capture": False,
+			"created_by_user_id": 1,
+			"created_at": started + timedelta(seconds=i),
+			"sequence": i + 1,
+			"partition_sequence": i + 1,
+			"entry_hash": f"{i:064x}",
+			"hash_version": 2,
+		}
+		for i in range(count)
+	]
+
+
+async def _orm(db: AsyncSession, limit: int) -> bytes:
+	result = await db.execute(select(Action).where(Action.reference_key == "PO-1").order_by(Action.created_at, Action.sequence).limit(limit))
+	return _ACTION_LIST.dump_json([ActionRead.model_validate(row) for row in result.scalars()])
+
+
+async def _projection(db: AsyncSession, limit: int) -> bytes:
+	result = await db.execute(select_action_rows().where(Action.reference_key == "PO-1").order_by(Action.created_at, Action.sequence).limit(limit))
+	return encode_action_rows(result.all())
+
+
+async def _measure(sessions: async_sessionmaker, func, limit: int, repeat: int) -> tuple:
+	best = float("inf")
+	for _ in range(repeat):
+		async with sessions() as db:
+			started = time.perf_counter()
+			body = await func(db, limit)
+			best = min(best, time.perf_counter() - started)
+	async with sessions() as db:
+		tracemalloc.start()
+		await func(db, limit)
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return body, limit / best, peak
+
+
+async def run(rows: int, repeat: int) -> None:
+	with tempfile.TemporaryDirectory() as directory:
+		engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}", json_deserializer=json_loads)
+		async with engine.begin() as conn:
+			await conn.run_sync(Base.metadata.create_all)
+			await conn.execute(insert(User), [{"id": 1, "email": "bench@example.com", "hashed_password": "-"}])
+			await conn.execute(insert(Action), _rows(rows))
+		sessions = async_sessionmaker(engine, expire_on_commit=False)
+		print(f"{'path':<12}{'rows/s':>14}{'peak MiB':>12}")
+		bodies = []
+		for name, func in (("orm", _orm), ("projection", _projection)):
+			body, rate, peak = await _measure(sessions, func, rows, repeat)
+			bodies.append(body)
+			print(f"{name:<12}{rate:>14,.0f}{peak / 2**20:>12.1f}")
+		print(f"identical output: {bodies[0] == bodies[1]}")
+		await engine.dispose()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Compare ORM and projection serialization of ActionRead lists")
+	parser.add_argument("--rows", type=int, default=10_000)
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+	asyncio.run(run(args.rows, args.repeat))
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="ual-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_DATA_DIR}/ual.db")
+os.environ.setdefault("ARCHIVE_DIR", f"{_DATA_DIR}/archive")
+
+import pytest
+from sqlalchemy import text
+
+from app.core.idempotency import idempotency
+from app.core.search import ensure_search_schema
+from app.db.session import Base, engine
+from app.models import action, blueprint, ledger, rule, stats, user  # noqa: F401  (register tables)
+
+
+@pytest.fixture
+def anyio_backend():
+	return "asyncio"
+
+
+@pytest.fixture
+async def db_schema():
+	# A fresh schema per test; pooled connections belong to the test's event loop.
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+		await conn.execute(text("DROP TABLE IF EXISTS action_search"))
+		await conn.run_sync(Base.metadata.create_all)
+		await ensure_search_schema(conn)
+	idempotency.bloom = None
+	idempotency._lock = None
+	yield
+	await engine.dispose()
+
+
+@pytest.fixture
+async def client(db_schema):
+	import httpx
+
+	from app.core.sequencer import sequencer
+	from app.main import app
+
+	async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+		response = await client.post("/api/auth/register", json={"email": "user@example.com", "password": "secret"})
+		assert response.status_code == 200, response.text
+		response = await client.post("/api/auth/token", data={"username": "user@example.com", "password": "secret"})
+		client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+		yield client
+	await sequencer.stop()
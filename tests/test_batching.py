@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.core.batching import drain_batches
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batches_close_at_size_and_flush_on_stop():
+	queue: asyncio.Queue = asyncio.Queue()
+	batches = []
+
+	async def flush(batch):
+		batches.append(batch)
+
+	for item in range(5):
+		queue.put_nowait(item)
+	queue.put_nowait(None)
+	await drain_batches(queue, 2, 1.0, flush)
+	assert batches == [[0, 1], [2, 3], [4]]
+
+
+async def test_batch_closes_after_max_wait():
+	queue: asyncio.Queue = asyncio.Queue()
+	batches = []
+
+	async def flush(batch):
+		batches.append(batch)
+
+	task = asyncio.create_task(drain_batches(queue, 10, 0.01, flush))
+	queue.put_nowait(1)
+	await asyncio.sleep(0.1)
+	queue.put_nowait(2)
+	queue.put_nowait(None)
+	await task
+	assert batches == [[1], [2]]
@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy import update
+
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_replay_reflects_a_void_made_elsewhere(client):
+	payload = {"action_type": "request", "reference_key": "PO-1", "idempotency_key": "capture-1"}
+	first = (await client.post("/api/actions/", json=payload)).json()
+	# Voided by another worker, whose LRU this process never hears about.
+	async with AsyncSessionLocal() as db:
+		await db.execute(update(Action).where(Action.id == first["id"]).values(voided=True, void_reason="duplicate"))
+		await db.commit()
+	replay = (await client.post("/api/actions/", json=payload)).json()
+	assert replay["id"] == first["id"]
+	assert replay["voided"] is True and replay["void_reason"] == "duplicate"
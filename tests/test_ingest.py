@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_results_follow_input_order(client, monkeypatch):
+	monkeypatch.setattr(settings, "ingest_chunk_size", 2)
+	rows = [
+		{"action_type": "request", "reference_key": "PO-1"},
+		{"reference_key": "PO-1"},
+		{"action_type": "approve", "reference_key": "PO-1"},
+		{"action_type": "pay", "reference_key": "PO-1"},
+		{"action_type": "close", "reference_key": "PO-1"},
+	]
+	body = "[" + ", ".join(json.dumps(row) for row in rows[:3]) + ', {"action_type": }, ' + ", ".join(json.dumps(row) for row in rows[3:]) + "]"
+	response = await client.post("/api/actions/ingest", content=body)
+	results = [json.loads(line) for line in response.text.splitlines()]
+	assert [result["index"] for result in results] == list(range(6))
+	assert ["error" in result for result in results] == [False, True, False, True, False, False]
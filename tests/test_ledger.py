@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app.core.anchors import create_anchor
+from app.core.ledger import compute_chain_hashes, compute_entry_hash, entry_payload
+from app.core.sequencer import AppendSequencer
+from app.core.verify import verify_chain
+from app.db.session import AsyncSessionLocal
+from app.models.action import Action
+from app.models.ledger import ChainAnchor
+from app.schemas.action import ActionCreate
+
+
+def _values(index: int) -> dict:
+	# Shaped like the API's append: every ActionCreate field is present.
+	action = ActionCreate(
+		action_type="update",
+		reference_key=f"PO-{index % 3}",
+		target_type="order",
+		target_id=str(index),
+		context_tags={"site": "north", "tags": ["a", "b"]},
+		post_state={"amount": index * 10, "ok": True},
+		department_id=index % 2 + 1,
+	)
+	return {**action.model_dump(), "created_by_user_id": 1}
+
+
+def _hashed(index: int) -> dict:
+	return {**_values(index), "created_at": datetime(2026, 1, 1, 12, 0, 0, 123456) + timedelta(seconds=index)}
+
+
+async def _append(count: int, partitioning: str = "none") -> list:
+	sequencer = AppendSequencer(max_batch=4, max_wait_ms=1, partitioning=partitioning, partitions=2)
+	try:
+		return await sequencer.append_many([_values(index) for index in range(count)])
+	finally:
+		await sequencer.stop()
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_chain_hashes_round_trip(version):
+	rows = [_hashed(index) for index in range(5)]
+	hashes = compute_chain_hashes([entry_payload(row, version) for row in rows], None, version)
+	prev_hash = None
+	for row, entry_hash in zip(rows, hashes):
+		assert compute_entry_hash(entry_payload(row, version), prev_hash, version) == entry_hash
+		prev_hash = entry_hash
+	# The same instant given with a time zone hashes the same.
+	aware = {**rows[0], "created_at": rows[0]["created_at"].replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))}
+	assert compute_entry_hash(entry_payload(aware, version), None, version) == hashes[0]
+
+
+def test_hash_versions_differ():
+	values = _hashed(0)
+	assert compute_entry_hash(entry_payload(values, 1), None, 1) != compute_entry_hash(entry_payload(values, 2), None, 2)
+
+
+@pytest.mark.anyio
+async def test_verify_accepts_v1_rows_followed_by_v2_rows(db_schema):
+	# Rehash the first rows as v1, as if written before the upgrade.
+	actions = await _append(3)
+	async with AsyncSessionLocal() as db:
+		rows = (await db.execute(select(Action).order_by(Action.sequence))).scalars().all()
+		prev_hash = None
+		for row in rows:
+			row.hash_version = 1
+			row.prev_hash = prev_hash
+			row.entry_hash = prev_hash = compute_entry_hash(entry_payload(row.__dict__, 1), prev_hash, 1)
+		await db.commit()
+	actions += await _append(3)
+	report = await verify_chain(full=True, record=False)
+	assert report["ok"], report["broken"]
+	assert report["rows_checked"] == len(actions) == 6
+	async with AsyncSessionLocal() as db:
+		versions = (await db.execute(select(Action.hash_version).order_by(Action.sequence))).scalars().all()
+	assert versions == [1, 1, 1, 2, 2, 2]
+
+
+@pytest.mark.anyio
+async def test_verify_detects_a_tampered_row(db_schema):
+	actions = await _append(6)
+	tampered = actions[3]
+	async with AsyncSessionLocal() as db:
+		await db.execute(update(Action).where(Action.id == tampered.id).values(post_state={"amount": 1}))
+		await db.commit()
+	report = await verify_chain(full=True, record=False, segment_size=2)
+	assert not report["ok"]
+	assert report["broken"]["action_id"] == tampered.id
+	assert report["broken"]["reason"] == "entry_hash mismatch"
+
+
+@pytest.mark.anyio
+async def test_verify_checks_each_partition_and_the_anchor(db_schema):
+	actions = await _append(8, partitioning="department")
+	assert await create_anchor() is not None
+	report = await verify_chain(full=True, record=False, segment_size=3)
+	assert report["ok"], report["broken"]
+	assert report["rows_checked"] == 8
+	assert {partition: state["verified_through"] for partition, state in report["partitions"].items()} == {1: 4, 2: 4}
+	assert report["anchors"]["anchors_checked"] == 1
+
+	# Dropping a partition's head keeps its chain valid but breaks the anchor.
+	head = max((action for action in actions if action.chain_partition == 2), key=lambda action: action.partition_sequence)
+	async with AsyncSessionLocal() as db:
+		await db.execute(delete(Action).where(Action.id == head.id))
+		await db.commit()
+	report = await verify_chain(full=True, record=False)
+	assert not report["ok"]
+	assert report["broken"]["reason"] == "anchored head mismatch"
+	assert report["broken"]["partition"] == 2
+
+
+@pytest.mark.anyio
+async def test_verify_detects_a_forged_anchor(db_schema):
+	await _append(4, partitioning="department")
+	anchor = await create_anchor()
+	async with AsyncSessionLocal() as db:
+		await db.execute(update(ChainAnchor).where(ChainAnchor.id == anchor.id).values(signature="0" * 64))
+		await db.commit()
+	report = await verify_chain(full=True, record=False)
+	assert not report["ok"]
+	assert report["broken"] == {"anchor_index": 0, "reason": "anchor signature mismatch"}
@@ -0,0 +1,18 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_step_without_expected_action_type_takes_any_action(client):
+	response = await client.post("/api/process/blueprints", json={"name": "PO", "steps": [
+		{"order_index": 0, "step_name": "request", "expected_action_type": "Request"},
+		{"order_index": 1, "step_name": "approve", "expected_action_type": "Approve"},
+		{"order_index": 2, "step_name": "follow up"},
+	]})
+	blueprint_id = response.json()["id"]
+	assert (await client.post("/api/process/", json={"blueprint_id": blueprint_id, "reference_key": "PO-1"})).status_code == 200
+	for action_type in ("Request", "Approve", "Comment"):
+		await client.post("/api/actions/", json={"action_type": action_type, "reference_key": "PO-1"})
+	status = (await client.get(f"/api/process/{blueprint_id}/status/PO-1")).json()
+	assert status["status"] == "completed"
+	assert [step["status"] for step in status["steps"]] == ["completed", "completed", "completed"]
@@ -0,0 +1,33 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.core.rollups import _apply_portable
+from app.db.session import AsyncSessionLocal
+from app.models.stats import ActionRollup
+
+pytestmark = pytest.mark.anyio
+
+
+async def _rollups() -> dict:
+	async with AsyncSessionLocal() as db:
+		result = await db.execute(select(ActionRollup.action_type, ActionRollup.voided, ActionRollup.count))
+		return {(action_type, voided): count for action_type, voided, count in result.tuples()}
+
+
+async def test_void_moves_one_count_once(client):
+	response = await client.post("/api/actions/", json={"action_type": "approve", "reference_key": "PO-1"})
+	action_id = response.json()["id"]
+	assert (await client.post(f"/api/actions/{action_id}/void", params={"reason": "duplicate"})).status_code == 200
+	assert (await client.post(f"/api/actions/{action_id}/void", params={"reason": "again"})).status_code == 400
+	assert await _rollups() == {("approve", False): 0, ("approve", True): 1}
+
+
+async def test_portable_upsert_inserts_then_increments(db_schema):
+	row = {"day": date(2026, 1, 1), "department_id": 0, "action_type": "approve", "voided": False, "count": 2}
+	async with AsyncSessionLocal() as db:
+		await _apply_portable(db, [row])
+		await _apply_portable(db, [{**row, "count": -1}])
+		await db.commit()
+	assert await _rollups() == {("approve", False): 1}
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.rules import rule_engine, run_escalations
+from app.db.session import AsyncSessionLocal
+from app.models.rule import EscalationEvent, Rule
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_escalations_are_written_once_per_rule_and_action(client, monkeypatch):
+	monkeypatch.setattr(settings, "escalation_batch_size", 3)
+	async with AsyncSessionLocal() as db:
+		db.add(Rule(name="stale", threshold_hours=1, channel="email"))
+		await db.commit()
+	await rule_engine.reload()
+	for index in range(7):
+		await client.post("/api/actions/", json={"action_type": "request", "reference_key": f"PO-{index}"})
+	later = datetime.utcnow() + timedelta(hours=2)
+	assert await run_escalations(later) == 7
+	assert await run_escalations(later) == 0
+	async with AsyncSessionLocal() as db:
+		assert (await db.execute(select(func.count()).select_from(EscalationEvent))).scalar_one() == 7
@@ -0,0 +1,12 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_operator_words_are_not_searched_literally(client):
+	for label in ("pump", "pump and valve"):
+		await client.post("/api/actions/", json={"action_type": "inspect", "reference_key": "WO-1", "target_label": label})
+	response = await client.get("/api/actions/search", params={"q": "pump OR valve"})
+	assert [action["target_label"] for action in response.json()] == ["pump and valve"]
+	response = await client.get("/api/actions/search", params={"q": "NOT"})
+	assert response.json() == []
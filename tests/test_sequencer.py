@@ -0,0 +1,123 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from app.api.follow import _sse
+from app.core import sequencer as sequencer_module
+from app.core.events import event_hub
+from app.core.export import export_batches
+from app.core.sequencer import AppendSequencer
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db_schema")]
+
+
+def _action(department_id: int, reference_key: str = "PO-1") -> dict:
+	return {
+		"action_type": "update",
+		"reference_key": reference_key,
+		"department_id": department_id,
+		"created_by_user_id": 1,
+	}
+
+
+async def _exported_sequences(after_sequence: int = 0) -> list:
+	return [row.sequence async for batch in export_batches(after_sequence) for row in batch]
+
+
+@pytest.fixture
+async def paused_partition(monkeypatch):
+	# Holds department 1's group commit just before its insert, after its
+	# sequences are taken, until released.
+	paused, release = asyncio.Event(), asyncio.Event()
+	session_factory = sequencer_module.AsyncSessionLocal
+
+	def sessions():
+		session = session_factory()
+		execute = session.execute
+
+		async def paused_execute(statement, params=None, *args, **kwargs):
+			if isinstance(params, list) and any(row.get("department_id") == 1 for row in params):
+				paused.set()
+				await release.wait()
+			return await execute(statement, params, *args, **kwargs)
+
+		session.execute = paused_execute
+		return session
+
+	monkeypatch.setattr(sequencer_module, "AsyncSessionLocal", sessions)
+	return paused, release
+
+
+async def test_group_commit_links_each_partition(db_schema):
+	sequencer = AppendSequencer(max_batch=50, max_wait_ms=5, partitioning="department", partitions=2)
+	try:
+		actions = await sequencer.append_many([_action(department % 2) for department in range(20)])
+	finally:
+		await sequencer.stop()
+	assert sorted(action.sequence for action in actions) == list(range(1, 21))
+	for partition in (0, 1):
+		chain = sorted((action for action in actions if action.chain_partition == partition), key=lambda action: action.partition_sequence)
+		assert [action.partition_sequence for action in chain] == list(range(1, 11))
+		assert chain[0].prev_hash is None
+		assert all(later.prev_hash == earlier.entry_hash for earlier, later in zip(chain, chain[1:]))
+
+
+async def test_export_resume_misses_nothing_across_partitions(paused_partition):
+	paused, release = paused_partition
+	sequencer = AppendSequencer(max_batch=10, max_wait_ms=1, partitioning="department", partitions=2)
+	try:
+		slow = asyncio.create_task(sequencer.append(_action(1)))
+		await paused.wait()
+		fast = asyncio.create_task(sequencer.append(_action(2)))
+		await asyncio.sleep(0.1)
+		# A reader resuming after the newest sequence it has seen.
+		seen = await _exported_sequences()
+		release.set()
+		actions = await asyncio.gather(slow, fast)
+		seen += await _exported_sequences(max(seen, default=0))
+	finally:
+		await sequencer.stop()
+	assert sorted(seen) == sorted(action.sequence for action in actions)
+
+
+async def test_follow_replay_misses_nothing_across_partitions(paused_partition):
+	paused, release = paused_partition
+	sequencer = AppendSequencer(max_batch=10, max_wait_ms=1, partitioning="department", partitions=2)
+	sequencer.add_listener(event_hub.on_actions)
+	await event_hub.start()
+	received = []
+	try:
+		slow = asyncio.create_task(sequencer.append(_action(1)))
+		await paused.wait()
+		fast = asyncio.create_task(sequencer.append(_action(2)))
+		await asyncio.sleep(0.1)
+		async with aclosing(_sse({"PO-1"}, 0)) as stream:
+
+			async def receive() -> bytes:
+				chunk = await asyncio.wait_for(anext(stream), 5)
+				if chunk.startswith(b"id: "):
+					received.append(int(chunk.split(b"\n", 1)[0][4:]))
+				return chunk
+
+			# Replay what is committed, then release the paused partition live.
+			while await receive() != b": connected\n\n":
+				pass
+			release.set()
+			while len(received) < 2:
+				await receive()
+		actions = await asyncio.gather(slow, fast)
+	finally:
+		await sequencer.stop()
+		await event_hub.stop()
+	assert received == sorted(action.sequence for action in actions)
+
+
+async def test_full_writer_queue_refuses_appends(client, monkeypatch):
+	from app.core.sequencer import sequencer
+
+	monkeypatch.setattr(sequencer, "max_queue", 1)
+	monkeypatch.setattr(sequencer, "max_wait", 0.2)
+	monkeypatch.setattr(sequencer, "max_batch", 100)
+	appended = await sequencer.append_many([_action(0), _action(0), _action(0)], return_exceptions=True)
+	assert [type(result).__name__ for result in appended] == ["ActionRead", "SequencerBusy", "SequencerBusy"]
@@ -0,0 +1,16 @@
+import pytest
+
+from app.core.verify import verify_reports
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_read_only_verify_is_shared_until_it_expires(client, monkeypatch):
+	monkeypatch.setattr(verify_reports, "_report", None)
+	await client.post("/api/actions/", json={"action_type": "request", "reference_key": "PO-1"})
+	first = (await client.get("/api/ledger/verify")).json()
+	await client.post("/api/actions/", json={"action_type": "approve", "reference_key": "PO-1"})
+	assert (await client.get("/api/ledger/verify")).json() == first
+	assert first["ok"] and first["rows_checked"] == 1
+	monkeypatch.setattr(verify_reports, "_expires_at", 0.0)
+	assert (await client.get("/api/ledger/verify")).json()["rows_checked"] == 2